@@ -0,0 +1,57 @@
+"""
+Агент без веб-интерфейса: запускает включённые в конфиге сборщики и
+отправляет замеры пачками на центральный сервер (run.py, POST /api/ingest).
+
+    python agent.py --server http://central:11111
+    python agent.py --server http://central:11111 --host db-17 --batch-interval 30
+
+Параметры берутся из раздела "agent" конфига (storage/configs/config.json):
+server, host, batch_interval, spool_dir, spool_max_bytes, timeout, token;
+аргументы командной строки их переопределяют.
+"""
+import argparse
+import logging
+import signal
+import threading
+
+from core.agent import AgentPusher
+from core.system_manager import SystemManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", help="адрес центрального сервера")
+    parser.add_argument("--host", help="имя узла (по умолчанию — имя хоста)")
+    parser.add_argument("--batch-interval", type=float, help="секунд между пачками")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    manager = SystemManager()
+    config = dict(manager.config_manager.get_config().get("agent", {}))
+    for key in ("server", "host", "batch_interval"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    if not config.get("server"):
+        parser.error("не задан адрес сервера: --server или agent.server в конфиге")
+
+    pusher = AgentPusher(manager, **config)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    pusher.start()
+    manager.start_sampling()
+    logging.info("Агент %s: сборщики %s -> %s", pusher.host, ", ".join(manager.get_enabled_collectors()), pusher.url)
+    try:
+        stop.wait()
+    finally:
+        # Сначала останавливаем сбор, чтобы последние замеры попали в последнюю пачку
+        manager.stop_sampling()
+        pusher.stop()
+        manager.close()
+        logging.info("Агент остановлен: %s", pusher.stats)
+
+
+if __name__ == "__main__":
+    main()
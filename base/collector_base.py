@@ -1,5 +1,47 @@
+import math
+import time
 from abc import ABC, abstractmethod
-import pandas as pd
+
+from core.metrics import REGISTRY
+from core.registry import LazyModule
+
+pd = LazyModule("pandas")
+
+
+class Sample:
+    """
+    Один замер: кортеж имён полей (общий для всех замеров сборщика) и кортеж значений.
+    DataFrame из замеров строится только по запросу — пачкой (samples_to_frame).
+    """
+    __slots__ = ("fields", "values")
+
+    def __init__(self, fields, values):
+        self.fields = fields
+        self.values = values
+
+    def __getitem__(self, name):
+        return self.values[self.fields.index(name)]
+
+    def get(self, name, default=None):
+        return self[name] if name in self.fields else default
+
+    def as_dict(self):
+        """Словарь поле -> значение; NaN -> None (для JSON)"""
+        return {f: (None if isinstance(v, float) and math.isnan(v) else v) for f, v in zip(self.fields, self.values)}
+
+    def to_frame(self):
+        return samples_to_frame([self])
+
+
+def samples_to_frame(samples):
+    """Пачка замеров -> DataFrame (строка на замер)"""
+    if not samples:
+        return pd.DataFrame()
+    fields = samples[0].fields
+    if all(s.fields is fields for s in samples):
+        return pd.DataFrame.from_records([s.values for s in samples], columns=list(fields))
+    return pd.DataFrame.from_records([dict(zip(s.fields, s.values)) for s in samples])
+
 
 class AbstractDataCollector(ABC):
     """Базовый класс для всех сборщиков данных"""
@@ -12,7 +54,38 @@ class AbstractDataCollector(ABC):
         """Найти доступные объекты для мониторинга (например, устройства или клиентов)"""
         pass
 
-    @abstractmethod
-    def collect(self, objects=None) -> pd.DataFrame:
-        """Собрать данные по выбранным объектам"""
-        pass
+    def sample(self, objects=None) -> Sample:
+        """
+        Собрать один замер по выбранным объектам. По умолчанию — из DataFrame, который
+        возвращает collect(): сборщики, реализующие только collect(), работают как прежде.
+        """
+        if type(self).collect is AbstractDataCollector.collect:
+            raise NotImplementedError(f"{self.__class__.__name__}: нужно реализовать sample() или collect()")
+        frame = self.collect(objects)
+        if frame is None or frame.empty:
+            raise ValueError(f"{self.__class__.__name__}.collect() вернул пустой замер")
+        # to_dict отдаёт значения как int/float/str Python, а не скаляры numpy
+        row = frame.tail(1).to_dict("records")[0]
+        return Sample(tuple(row), tuple(row.values()))
+
+    def _probe(self, probe, *args):
+        """Вызвать опрос источника (_get_*) с замером времени"""
+        started = time.perf_counter()
+        try:
+            return probe(*args)
+        except Exception:
+            REGISTRY.inc("collector_probe_failures_total", collector=self.__class__.__name__, probe=probe.__name__)
+            raise
+        finally:
+            REGISTRY.observe("collector_probe_seconds", time.perf_counter() - started,
+                             collector=self.__class__.__name__, probe=probe.__name__)
+
+    def _probe_failed(self, probe):
+        """Учесть проглоченное исключение опроса probe (имя метода _get_*, в котором оно случилось)"""
+        REGISTRY.inc("collector_probe_failures_total", collector=self.__class__.__name__, probe=probe)
+
+    def collect(self, objects=None) -> "pd.DataFrame":
+        """Замер в виде DataFrame из одной строки (для совместимости; дороже, чем sample)"""
+        if type(self).sample is AbstractDataCollector.sample:
+            raise NotImplementedError(f"{self.__class__.__name__}: нужно реализовать sample() или collect()")
+        return self.sample(objects).to_frame()
@@ -1,15 +1,24 @@
 from abc import ABC, abstractmethod
-import pandas as pd
+from core.registry import LazyModule
+
+pd = LazyModule("pandas")
 
 class AbstractModel(ABC):
     """Базовый класс для ML-моделей (в т.ч. survival)"""
+    # Модель умеет дообучаться на новых строках (partial_fit) без полного fit по всей истории;
+    # остальные модели переобучаются целиком по расписанию (model_store.refit_interval)
+    supports_partial_fit = False
 
     @abstractmethod
-    def fit(self, data: pd.DataFrame):
+    def fit(self, data: "pd.DataFrame"):
         """Обучить модель (если нужно)"""
         pass
 
     @abstractmethod
-    def predict(self, data: pd.DataFrame):
+    def predict(self, data: "pd.DataFrame"):
         """Сделать прогноз (например, функция выживания, риск)"""
         pass
+
+    def partial_fit(self, data: "pd.DataFrame"):
+        """Дообучить модель на новых строках (только при supports_partial_fit)"""
+        raise NotImplementedError(f"{self.__class__.__name__} не поддерживает дообучение")
@@ -0,0 +1,85 @@
+from base.collector_base import Sample
+from core.data_storage import INT_NA, BufferedWriter, TieredStore
+from core.ring_buffer import RingBuffer
+
+
+class StoredCollectorMixin:
+    """
+    Общее для сборщиков, которые пишут историю в storage/data/<Class>: параметры
+    хранения в конфиге, буферизованные хранилища, кольцевой буфер свежих замеров,
+    flush/close, последний замер и список признаков.
+
+    Основная история — self._store (BufferedWriter поверх TieredStore), свежие
+    замеры — self._recent. STORES — имена атрибутов всех хранилищ сборщика,
+    OBJECT_STORES — хранилищ длинных таблиц по объектам (колонка OBJECT_COLUMN).
+    """
+    STORES = ("_store",)
+    OBJECT_STORES = ()
+    OBJECT_COLUMN = None
+
+    def _update_storage_config(self, config):
+        # Сколько хранить исходные данные и агрегаты: {"raw": "30d", "1m": "365d", ...}
+        self.retention = config.get("retention")
+        # Буфер записи: {"max_rows": 64, "max_delay": 5, "fsync": "interval", "fsync_interval": 30}
+        self.write_buffer = config.get("write_buffer", {})
+        # Каждый замер печатается в stdout; quiet=true — только в debug-лог
+        self.quiet = config.get("quiet", False)
+        # Сколько последних замеров держать в памяти (0 — не держать)
+        self.ring_buffer = config.get("ring_buffer", 3600)
+
+    def _open_storage(self):
+        """Каталог хранилища — по имени класса; основное хранилище и кольцевой буфер"""
+        self._data_path = f"storage/data/{self.__class__.__name__}"
+        self._store = self._open_store()
+        # Свежие замеры в памяти: недавние диапазоны читаются без обращения к диску
+        self._recent = RingBuffer(self.ring_buffer)
+
+    def _open_store(self, suffix="", **kwargs):
+        """BufferedWriter поверх TieredStore storage/data/<Class><suffix> (kwargs — для TieredStore)"""
+        return BufferedWriter(TieredStore(f"{self._data_path}{suffix}", retention=self.retention, **kwargs),
+                              **self.write_buffer)
+
+    def flush(self):
+        """Записать буферизованные замеры в хранилище"""
+        for name in self.STORES:
+            store = getattr(self, name)
+            if isinstance(store, BufferedWriter):
+                store.flush()
+
+    def flush_due(self):
+        """Записать буферы, чей самый старый замер ждёт дольше max_delay (вызывает планировщик)"""
+        for name in self.STORES:
+            store = getattr(self, name)
+            if isinstance(store, BufferedWriter):
+                store.flush_due()
+
+    def close(self):
+        for name in self.STORES:
+            getattr(self, name).close()
+
+    def get_last_timestamp(self):
+        """Время последнего сохранённого замера (None — истории нет)"""
+        if len(self._recent):
+            return self._recent.last_timestamp()
+        return self._store.last_timestamp()
+
+    def _last_row(self):
+        """Последняя строка основной истории: {колонка: значение} (None — истории нет)"""
+        last = self._store.last_timestamp()
+        if last is None:
+            return None
+        row = {}
+        for name, values in self._store.read(start=last).items():
+            row[name] = None if values.dtype.kind == "i" and values[-1] == INT_NA else values[-1].item()
+        return row
+
+    def get_last_sample(self):
+        """Последний сохранённый замер (None — истории нет); без pandas"""
+        row = self._last_row()
+        return Sample(tuple(row), tuple(row.values())) if row is not None else None
+
+    def get_features(self, objects=False):
+        """Числовые признаки, которые есть в истории (без timestamp); objects=True — признаки по объектам"""
+        stores = self.OBJECT_STORES if objects else ("_store",)
+        columns = dict.fromkeys(c for name in stores for c in getattr(self, name).columns)
+        return [c for c in columns if c not in ("timestamp", self.OBJECT_COLUMN)]
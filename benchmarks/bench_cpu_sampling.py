@@ -0,0 +1,61 @@
+"""
+Сравнение задержки одного замера CpuCollectorLinux в режимах
+"subprocess" (ps/nproc) и "procfs" (только /proc и /sys).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_cpu_sampling.py --samples 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collectors.cpu_collector import CpuCollectorLinux
+
+
+def measure(sampling, samples, tmpdir):
+    # Хранилище сборщика создаётся относительно текущего каталога
+    workdir = os.path.join(tmpdir, sampling)
+    os.makedirs(workdir)
+    os.chdir(workdir)
+    collector = CpuCollectorLinux({"sampling": sampling})
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        collector.sample()  # прогрев: первый замер только запоминает счётчики
+        for _ in range(samples):
+            start = time.perf_counter()
+            collector.sample()
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        try:
+            results = {mode: measure(mode, args.samples, tmpdir) for mode in ("subprocess", "procfs")}
+        finally:
+            os.chdir(cwd)
+
+    for mode, r in results.items():
+        print(f"{mode:>10}: mean {r['mean_ms']:8.2f} ms  p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms")
+    print(f"speedup (mean): {results['subprocess']['mean_ms'] / results['procfs']['mean_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
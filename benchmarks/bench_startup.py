@@ -0,0 +1,129 @@
+"""
+Время старта процессов в новом интерпретаторе:
+
+- agent: SystemManager() и первый замер включённых сборщиков (без Flask);
+- web: import run и первый ответ /system_status.
+
+Каждый прогон — отдельный процесс python в рабочем каталоге с конфигом
+(storage/configs/config.json); печатаются медианы и какие тяжёлые модули
+оказались загружены. Результаты — в JSON, как у bench_suite.py.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --repo /path/to/other/checkout  # сравнить с другой версией
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["pandas", "plotly", "flask", "numpy"]
+
+# Код, выполняемый в новом процессе; печатает отметки времени (мс от начала) в JSON
+SCENARIOS = {
+    "agent": """
+from core.system_manager import SystemManager
+mark("import")
+manager = SystemManager()
+mark("manager")
+for name in manager.get_enabled_collectors():
+    manager.collect_data(name)
+mark("first_sample")
+""",
+    "web": """
+import run
+mark("import")
+client = run.app.test_client()
+assert client.get("/system_status").status_code == 200
+mark("first_response")
+""",
+}
+
+PRELUDE = """
+import json, sys, time
+_start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+_marks = {{}}
+def mark(name):
+    _marks[name] = (time.perf_counter() - _start) * 1000
+"""
+
+EPILOGUE = """
+_marks["modules"] = [m for m in {heavy!r} if m in sys.modules]
+print("RESULT " + json.dumps(_marks))
+"""
+
+
+def run_scenario(name, repo, workdir):
+    code = PRELUDE.format(repo=repo) + SCENARIOS[name] + EPILOGUE.format(heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], cwd=workdir, capture_output=True, text=True, check=True)
+    total = (time.perf_counter() - started) * 1000
+    line = next(l for l in out.stdout.splitlines() if l.startswith("RESULT "))
+    marks = json.loads(line[len("RESULT "):])
+    marks["process_ms"] = total
+    return marks
+
+
+def make_workdir(path):
+    os.makedirs(os.path.join(path, "storage", "configs"), exist_ok=True)
+    config = {"system": platform.system(), "enabled_collectors": ["cpu"], "collectors": {"cpu": {}},
+              "models": ["tree"]}
+    with open(os.path.join(path, "storage", "configs", "config.json"), "w") as f:
+        json.dump(config, f)
+
+
+def git_commit(repo):
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=repo).decode().strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--repo", default=REPO, help="каталог проверяемой версии (по умолчанию — этот)")
+    parser.add_argument("--output", help="файл результатов JSON")
+    args = parser.parse_args()
+    repo = os.path.abspath(args.repo)
+    commit = git_commit(repo)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        make_workdir(workdir)
+        for name in SCENARIOS:
+            run_scenario(name, repo, workdir)  # прогрев: хранилище создано, файлы в кэше ОС
+            runs = [run_scenario(name, repo, workdir) for _ in range(args.runs)]
+            marks = [k for k in runs[0] if k != "modules"]
+            result = {"name": f"startup.{name}", "params": {"runs": args.runs},
+                      "modules": runs[0]["modules"]}
+            for mark in marks:
+                result[f"{mark}_ms"] = statistics.median(r[mark] for r in runs)
+            # Для сравнения прогонов (bench_suite.py --compare) основная метрика — mean_ms
+            result["mean_ms"] = statistics.mean(r["process_ms"] for r in runs)
+            results.append(result)
+            timings = "  ".join(f"{m} {result[f'{m}_ms']:7.1f} мс" for m in marks)
+            print(f"{name:<6} {timings}  загружены: {', '.join(result['modules']) or '-'}")
+
+    report = {
+        "meta": {"commit": commit, "time": time.time(), "host": platform.node(), "platform": platform.platform(),
+                 "python": platform.python_version(), "args": vars(args)},
+        "results": results,
+    }
+    output = args.output or os.path.join(REPO, "benchmarks", "results", f"startup-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nРезультаты: {output}")
+
+
+if __name__ == "__main__":
+    main()
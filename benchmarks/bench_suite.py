@@ -0,0 +1,347 @@
+"""
+Набор бенчмарков сборщика и чтения истории на синтетических данных.
+
+- collect: CpuCollectorLinux.sample() и collect() на сгенерированном дереве
+  /proc и /sys (fs_root) для 1, 64 и 512 ядер и 10k процессов;
+- drive: DriveCollectorLinux.sample() для 8, 128 и 512 дисков;
+- history: get_history() на истории из 10k, 1M и 10M строк;
+- feature_monitor: отрисовка страницы /feature_monitor на той же истории;
+- features: матрица скользящих признаков (FeatureBuilder) — полный расчёт
+  и дорасчёт по одному новому замеру.
+
+Результаты пишутся в JSON (по умолчанию benchmarks/results/<commit>.json);
+--compare old.json печатает отношение к прошлому прогону.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --rows 10000,1000000 --cores 1,64 --compare benchmarks/results/abc123.json
+    python benchmarks/bench_suite.py --workdir /tmp/bench  # сгенерированная история переиспользуется
+"""
+import argparse
+import atexit
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import numpy as np
+import pandas as pd
+
+from procfs_fixture import FakeProcFS
+from collectors.cpu_collector import CpuCollectorLinux
+from collectors.drive_collector import DriveCollectorLinux
+from core.data_storage import TieredStore
+from core.features import FeatureBuilder
+
+HISTORY_CHUNK = 1 << 20
+HISTORY_END = 1760000000.0  # фиксированное время последнего замера — прогоны сравнимы между собой
+
+
+def timings_stats(timings):
+    timings = sorted(timings)
+    return {
+        "n": len(timings),
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "min_ms": timings[0],
+    }
+
+
+def measure(fn, repeat, before=None):
+    timings = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings_stats(timings)
+
+
+@contextlib.contextmanager
+def workdir(path):
+    """Хранилище сборщика и конфиг ищутся относительно текущего каталога"""
+    cwd = os.getcwd()
+    os.makedirs(path, exist_ok=True)
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
+
+
+def bench_collect(base, cores_list, processes, samples):
+    results = []
+    for cores in cores_list:
+        with workdir(os.path.join(base, f"collect_{cores}")):
+            fixture = FakeProcFS(os.path.abspath("root"), cores=cores, processes=processes).build()
+            collector = CpuCollectorLinux({"fs_root": fixture.root, "quiet": True, "write_buffer": {"fsync": "never"}})
+            collector.sample()  # прогрев: первый замер только запоминает счётчики
+            params = {"cores": cores, "processes": processes}
+            for method in ("sample", "collect"):
+                stats = measure(getattr(collector, method), samples, before=fixture.tick)
+                results.append({"name": f"collect.{method}", "params": params, **stats})
+                print(f"collect.{method:<8} cores={cores:<4} mean {stats['mean_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms")
+            collector.close()
+    return results
+
+
+def bench_drive(base, disks_list, samples):
+    results = []
+    for disks in disks_list:
+        with workdir(os.path.join(base, f"drive_{disks}")):
+            fixture = FakeProcFS(os.path.abspath("root"), cores=1, processes=1, disks=disks).build()
+            collector = DriveCollectorLinux({"fs_root": fixture.root, "quiet": True, "write_buffer": {"fsync": "never"}})
+            collector.sample()
+            stats = measure(collector.sample, samples, before=fixture.tick)
+            results.append({"name": "drive.sample", "params": {"disks": disks}, **stats})
+            print(f"drive.sample     disks={disks:<4} mean {stats['mean_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms")
+            collector.close()
+    return results
+
+
+def write_history(path, rows, boot_time, interval=1.0):
+    """Синтетическая история CPU-сборщика из rows строк (пачками, сразу в хранилище)"""
+    rng = np.random.default_rng(0)
+    store = TieredStore(path, retention={"raw": None})
+    start = HISTORY_END - (rows - 1) * interval
+    for pos in range(0, rows, HISTORY_CHUNK):
+        n = min(HISTORY_CHUNK, rows - pos)
+        ts = start + (pos + np.arange(n)) * interval
+        usage = np.clip(50 + np.cumsum(rng.normal(0, 2, n)) % 50, 0, 100)
+        load1 = usage / 25
+        store.append({
+            "timestamp": ts,
+            "boot_time": np.full(n, boot_time, dtype=np.int64),
+            "cpu_usage_percent": usage,
+            "cpu_idle_percent": 100 - usage,
+            "cpu_freq_current_ghz": rng.uniform(2.0, 3.5, n),
+            "load_1m": load1,
+            "load_5m": load1 * 0.9,
+            "load_15m": load1 * 0.8,
+            "load_1m_per_core": load1 / 4,
+            "uptime_sec": ts - boot_time,
+            "cpu_temp_celsius": rng.uniform(40, 80, n),
+            "total_interrupts": (pos + np.arange(n, dtype=np.int64)) * 4000,
+            "processes_total": rng.integers(300, 400, n),
+            "cpu_temperature_c": rng.uniform(40, 80, n),
+            "context_switches": (pos + np.arange(n, dtype=np.int64)) * 9000,
+        })
+    store.close()
+
+
+def prepare_history(rows):
+    """Каталог с историей из rows строк и конфигом (в текущем каталоге); готовая история не пересоздаётся"""
+    fixture = FakeProcFS(os.path.abspath("root"), cores=4, processes=10)
+    if not os.path.exists(fixture.root):
+        fixture.build()
+    config = {"system": "Linux", "enabled_collectors": ["cpu"],
+              "collectors": {"cpu": {"fs_root": fixture.root, "quiet": True, "retention": {"raw": None}}}, "models": [],
+              "sampling": False}
+    os.makedirs("storage/configs", exist_ok=True)
+    with open("storage/configs/config.json", "w") as f:
+        json.dump(config, f)
+    path = "storage/data/CpuCollectorLinux"
+    with open_store(path) as store:
+        existing = len(store)
+    if existing != rows:
+        shutil.rmtree(path, ignore_errors=True)
+        write_history(path, rows, fixture.btime)
+    return config["collectors"]["cpu"]
+
+
+@contextlib.contextmanager
+def open_store(path):
+    store = TieredStore(path, retention={"raw": None})
+    try:
+        yield store
+    finally:
+        store.close()
+
+
+def history_queries():
+    """Запросы как у /feature_monitor: пресеты диапазона с max_points=1000 и весь ряд одной колонки"""
+    return {
+        "15m": dict(start=HISTORY_END - 900, max_points=1000, columns=["cpu_usage_percent"]),
+        "24h": dict(start=HISTORY_END - 86400, max_points=1000, columns=["cpu_usage_percent"]),
+        "all": dict(max_points=1000, columns=["cpu_usage_percent"]),
+        "all_columns": dict(max_points=1000),
+        "all_raw": dict(columns=["cpu_usage_percent"]),
+    }
+
+
+def bench_history(base, rows_list, repeat):
+    results = []
+    for rows in rows_list:
+        with workdir(os.path.join(base, f"history_{rows}")):
+            started = time.perf_counter()
+            config = prepare_history(rows)
+            print(f"history rows={rows}: данные готовы за {time.perf_counter() - started:.1f} с")
+            collector = CpuCollectorLinux(config)
+            for name, kwargs in history_queries().items():
+                # Первый вызов — с открытием файлов (memmap), дальше — повторные
+                start = time.perf_counter()
+                df = collector.get_history(**kwargs)
+                cold_ms = (time.perf_counter() - start) * 1000
+                stats = measure(lambda: collector.get_history(**kwargs), repeat)
+                results.append({"name": f"history.{name}", "params": {"rows": rows},
+                                "cold_ms": cold_ms, "result_rows": len(df), **stats})
+                print(f"history.{name:<12} rows={rows:<9} cold {cold_ms:9.2f} ms  mean {stats['mean_ms']:9.2f} ms"
+                      f"  ({len(df)} строк)")
+            collector.close()
+    return results
+
+
+def bench_feature_monitor(base, rows_list, repeat):
+    results = []
+    run = None
+    for rows in rows_list:
+        with workdir(os.path.join(base, f"history_{rows}")):
+            prepare_history(rows)
+            if run is None:
+                import run
+            # SystemManager создаётся при первом запросе — по конфигу текущего каталога
+            client = run.app.test_client()
+            # История кончается в HISTORY_END, поэтому сутки задаются явным start, а не пресетом от текущего времени
+            for preset, query in (("24h", f"range=custom&start={HISTORY_END - 86400}"), ("all", "range=all")):
+                url = f"/feature_monitor?collector=cpu&feature=cpu_usage_percent&{query}&max_points=1000"
+                response = client.get(url)
+                assert response.status_code == 200, response.status_code
+                stats = measure(lambda: client.get(url), repeat)
+                results.append({"name": f"feature_monitor.{preset}", "params": {"rows": rows}, **stats})
+                print(f"feature_monitor.{preset:<4} rows={rows:<9} mean {stats['mean_ms']:9.2f} ms")
+            # Менеджер закрывается здесь, пока текущий каталог — его: в atexit он уже не нужен
+            manager = run.get_manager()
+            manager.close()
+            atexit.unregister(manager.close)
+            run._manager = None
+    return results
+
+
+class GrowingHistory:
+    """История сборщика в окне (first, end]: сдвигая end, имитируем приход новых замеров"""
+    def __init__(self, collector, first, end):
+        self.collector = collector
+        self.first = first
+        self.end = end
+
+    def get_history(self, start=None, columns=None, objects=None):
+        start = self.first if start is None else max(start, self.first)
+        return self.collector.get_history(start=start, end=self.end, columns=columns, objects=objects)
+
+
+def bench_features(base, rows_list, repeat):
+    results = []
+    columns = ["cpu_usage_percent", "load_1m", "cpu_temp_celsius", "cpu_freq_current_ghz"]
+    for rows in rows_list:
+        with workdir(os.path.join(base, f"history_{rows}")):
+            config = prepare_history(rows)
+            collector = CpuCollectorLinux(config)
+            # Не больше 100k последних строк — как max_rows по умолчанию
+            n = min(rows, 100000) - repeat
+            source = GrowingHistory(collector, HISTORY_END - n - repeat, HISTORY_END - repeat)
+            stats = measure(lambda: FeatureBuilder().build("cpu", source, columns=columns), repeat)
+            results.append({"name": "features.full", "params": {"rows": n}, **stats})
+            print(f"features.full        rows={n:<9} mean {stats['mean_ms']:9.2f} ms")
+
+            builder = FeatureBuilder()
+            builder.build("cpu", source, columns=columns)
+
+            def advance():
+                source.end += 1.0
+
+            stats = measure(lambda: builder.build("cpu", source, columns=columns), repeat, before=advance)
+            results.append({"name": "features.incremental", "params": {"rows": n}, **stats})
+            print(f"features.incremental rows={n:<9} mean {stats['mean_ms']:9.2f} ms")
+            collector.close()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(results, old_path):
+    with open(old_path) as f:
+        old = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in json.load(f)["results"]}
+    print(f"\nСравнение с {old_path} (mean, новое / старое):")
+    for r in results:
+        prev = old.get((r["name"], json.dumps(r["params"], sort_keys=True)))
+        if prev:
+            print(f"  {r['name']:<24} {json.dumps(r['params']):<36} {r['mean_ms'] / prev['mean_ms']:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cores", default="1,64,512")
+    parser.add_argument("--processes", type=int, default=10000)
+    parser.add_argument("--disks", default="8,128,512")
+    parser.add_argument("--rows", default="10000,1000000,10000000")
+    parser.add_argument("--samples", type=int, default=50, help="замеров на случай в collect")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов запроса в history и feature_monitor")
+    parser.add_argument("--only", choices=["collect", "drive", "history", "feature_monitor", "features"],
+                        action="append")
+    parser.add_argument("--workdir", help="каталог для сгенерированных данных (по умолчанию временный)")
+    parser.add_argument("--output", help="файл результатов JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    cores_list = [int(x) for x in args.cores.split(",")]
+    rows_list = [int(x) for x in args.rows.split(",")]
+    disks_list = [int(x) for x in args.disks.split(",")]
+    only = set(args.only or ["collect", "drive", "history", "feature_monitor", "features"])
+    commit = git_commit()
+
+    results = []
+    with contextlib.ExitStack() as stack:
+        base = args.workdir or stack.enter_context(tempfile.TemporaryDirectory())
+        base = os.path.abspath(base)
+        if "collect" in only:
+            results += bench_collect(base, cores_list, args.processes, args.samples)
+        if "drive" in only:
+            results += bench_drive(base, disks_list, args.samples)
+        if "history" in only:
+            results += bench_history(base, rows_list, args.repeat)
+        if "feature_monitor" in only:
+            results += bench_feature_monitor(base, rows_list, args.repeat)
+        if "features" in only:
+            results += bench_features(base, rows_list, args.repeat)
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "time": time.time(),
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(REPO, "benchmarks", "results", f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nРезультаты: {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Синтетическое дерево /proc и /sys для CpuCollectorLinux и DriveCollectorLinux
+(config={"fs_root": root}).
+
+Содержит всё, что читают сборщики: /proc/stat, cpuinfo, loadavg, uptime,
+каталоги процессов, cpufreq и topology по ядрам, thermal zone и coretemp;
+при disks > 0 — /proc/diskstats, /sys/block/<dev> с hwmon и журналы
+атрибутов smartd. tick() продвигает счётчики /proc/stat и diskstats, чтобы
+загрузка считалась по приращениям, как на настоящей системе.
+"""
+import os
+
+import numpy as np
+
+# Поля строки cpu в /proc/stat
+STAT_FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal", "guest", "guest_nice")
+
+
+class FakeProcFS:
+    def __init__(self, root, cores=4, processes=100, sockets=None, btime=1700000000, seed=0, disks=0):
+        self.root = root
+        self.cores = cores
+        self.processes = processes
+        self.disks = disks
+        self.sockets = sockets or (2 if cores >= 64 else 1)
+        self.btime = btime
+        self.uptime = 1000.0
+        self._rng = np.random.default_rng(seed)
+        self._times = np.zeros((cores, len(STAT_FIELDS)), dtype=np.int64)
+        self._intr = 0
+        self._ctxt = 0
+        self._disk_counters = np.zeros((disks, 11), dtype=np.int64)
+
+    def _write(self, path, text):
+        # Запись на месте (тот же inode): открытые сборщиком дескрипторы видят новое содержимое
+        full = os.path.join(self.root, path.lstrip("/"))
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "w") as f:
+            f.write(text)
+
+    def _topology(self, cpu):
+        """(пакет, core_id) логического CPU: по два потока на ядро"""
+        per_socket = max(self.cores // self.sockets, 1)
+        physical = max(per_socket // 2, 1)
+        return cpu // per_socket, (cpu % per_socket) % physical
+
+    def build(self):
+        """Создать дерево целиком"""
+        self._write("/proc/loadavg", "0.52 0.58 0.59 2/%d 12345\n" % self.processes)
+        self._write("/sys/devices/system/cpu/online", f"0-{self.cores - 1}\n" if self.cores > 1 else "0\n")
+        self._write_cpuinfo()
+        for cpu in range(self.cores):
+            base = f"/sys/devices/system/cpu/cpu{cpu}"
+            package, core_id = self._topology(cpu)
+            self._write(f"{base}/cpufreq/scaling_cur_freq", f"{2400000 + cpu % 7 * 100000}\n")
+            self._write(f"{base}/cpufreq/scaling_min_freq", "800000\n")
+            self._write(f"{base}/cpufreq/scaling_max_freq", "3500000\n")
+            self._write(f"{base}/topology/physical_package_id", f"{package}\n")
+            self._write(f"{base}/topology/core_id", f"{core_id}\n")
+        self._write("/sys/class/thermal/thermal_zone0/type", "x86_pkg_temp\n")
+        self._write("/sys/class/thermal/thermal_zone0/temp", "45000\n")
+        self._write("/sys/class/thermal/thermal_zone1/type", "cpu-thermal\n")
+        self._write("/sys/class/thermal/thermal_zone1/temp", "47000\n")
+        physical = max(self.cores // self.sockets // 2, 1)
+        for package in range(self.sockets):
+            base = f"/sys/class/hwmon/hwmon{package}"
+            self._write(f"{base}/name", "coretemp\n")
+            self._write(f"{base}/temp1_label", f"Package id {package}\n")
+            self._write(f"{base}/temp1_input", "50000\n")
+            for core_id in range(physical):
+                self._write(f"{base}/temp{core_id + 2}_label", f"Core {core_id}\n")
+                self._write(f"{base}/temp{core_id + 2}_input", f"{40000 + core_id % 10 * 1000}\n")
+        for pid in range(1, self.processes + 1):
+            os.makedirs(os.path.join(self.root, "proc", str(pid)), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "proc", "self"), exist_ok=True)
+        self._write_disks()
+        self.tick()
+        return self
+
+    def _write_cpuinfo(self):
+        blocks = []
+        for cpu in range(self.cores):
+            package, core_id = self._topology(cpu)
+            blocks.append(
+                f"processor\t: {cpu}\nvendor_id\t: GenuineIntel\nmodel name\t: Synthetic CPU @ 2.40GHz\n"
+                f"cpu MHz\t\t: {2400 + cpu % 7 * 100}.000\ncache size\t: 36608 KB\nphysical id\t: {package}\n"
+                f"core id\t\t: {core_id}\ncpu cores\t: {max(self.cores // self.sockets // 2, 1)}\n"
+            )
+        self._write("/proc/cpuinfo", "\n".join(blocks) + "\n")
+
+    def disk_names(self):
+        """Имена как у ядра: sda..sdz, sdaa, sdab, ..."""
+        return [f"sd{chr(ord('a') + i // 26 - 1) if i >= 26 else ''}{chr(ord('a') + i % 26)}" for i in range(self.disks)]
+
+    def _write_disks(self):
+        """Описание дисков в /sys/block, датчики drivetemp и журналы smartd (по строке на диск)"""
+        for i, name in enumerate(self.disk_names()):
+            base = f"/sys/block/{name}"
+            self._write(f"{base}/size", "7814037168\n")
+            self._write(f"{base}/queue/rotational", "1\n")
+            # sysfs обрезает модель до 16 символов, smartd пишет её целиком
+            self._write(f"{base}/device/model", "SYNTH HDD 4TB 72\n")
+            self._write(f"{base}/device/serial", f"SN{i:06d}\n")
+            self._write(f"{base}/device/hwmon/hwmon{100 + i}/temp1_input", f"{30000 + i % 15 * 1000}\n")
+            self._write(f"{base}/{name}1/stat", "0 0 0 0 0 0 0 0 0 0 0\n")  # раздел: есть в diskstats, но не в /sys/block
+            self._write(f"/var/lib/smartmontools/attrlog.SYNTH_HDD_4TB_7200RPM-SN{i:06d}.ata.csv",
+                        f"2024-01-01 00:00:00;\t5;100;{i % 3};\t9;90;{20000 + i};\t194;64;{30 + i % 15} (Min/Max 20/45);"
+                        f"\t197;100;0;\t199;200;0;\n")
+        for loop in range(2):
+            os.makedirs(os.path.join(self.root, "sys", "block", f"loop{loop}"), exist_ok=True)
+
+    def _tick_disks(self, seconds):
+        if not self.disks:
+            return
+        ios = self._rng.integers(0, int(200 * seconds) + 1, size=(self.disks, 2))
+        step = np.zeros_like(self._disk_counters)
+        step[:, 0], step[:, 4] = ios[:, 0], ios[:, 1]   # чтения, записи
+        step[:, 2], step[:, 6] = ios[:, 0] * 8, ios[:, 1] * 16  # секторы
+        step[:, 3], step[:, 7] = ios[:, 0] * 4, ios[:, 1] * 2  # мс
+        step[:, 9] = np.minimum(ios.sum(axis=1) * 3, int(1000 * seconds))
+        step[:, 10] = ios.sum(axis=1) * 5
+        self._disk_counters += step
+        self._disk_counters[:, 8] = ios[:, 0] % 4
+        lines = [f"   7       {loop} loop{loop} 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0" for loop in range(2)]
+        for i, (name, row) in enumerate(zip(self.disk_names(), self._disk_counters.tolist())):
+            lines.append(f"   8 {i * 16:7d} {name} " + " ".join(map(str, row)) + " 0 0 0 0 0 0")
+            lines.append(f"   8 {i * 16 + 1:7d} {name}1 " + " ".join(map(str, row)) + " 0 0 0 0 0 0")
+        self._write("/proc/diskstats", "\n".join(lines) + "\n")
+
+    def tick(self, seconds=1.0):
+        """Продвинуть счётчики на seconds секунд работы системы"""
+        jiffies = int(100 * seconds)
+        busy = self._rng.integers(0, jiffies + 1, size=self.cores)
+        step = np.zeros_like(self._times)
+        step[:, 0] = busy * 3 // 4   # user
+        step[:, 2] = busy - step[:, 0]  # system
+        step[:, 3] = jiffies - busy  # idle
+        self._times += step
+        self._intr += int(self._rng.integers(1000, 5000)) * self.cores
+        self._ctxt += int(self._rng.integers(2000, 8000)) * self.cores
+        self.uptime += seconds
+        total = self._times.sum(axis=0)
+        lines = ["cpu  " + " ".join(map(str, total))]
+        lines += [f"cpu{i} " + " ".join(map(str, row)) for i, row in enumerate(self._times.tolist())]
+        lines += [f"intr {self._intr} 0 0 0", f"ctxt {self._ctxt}", f"btime {self.btime}",
+                  f"processes {self.processes * 3}", "procs_running 2", "procs_blocked 0"]
+        self._write("/proc/stat", "\n".join(lines) + "\n")
+        self._write("/proc/uptime", f"{self.uptime:.2f} {self.uptime * self.cores * 0.9:.2f}\n")
+        self._tick_disks(seconds)
@@ -1,12 +1,20 @@
-from .cpu_collector import CpuCollectorMacOS, CpuCollectorLinux
+from core.registry import PluginRegistry
+
+# Манифест сборщиков: имя -> "модуль:Класс". Модуль импортируется только при первом
+# обращении к сборщику, поэтому выключенные в конфиге сборщики не загружаются.
+# Сторонние пакеты добавляют сборщики через точки входа группы predict_failure.collectors.
+ENTRY_POINT_GROUP = "predict_failure.collectors"
 
 DICT_COLLECTORS = {
-    "Darwin": {
-        "cpu": CpuCollectorMacOS
-        },
-    "Windows": {
-        },
-    "Linux": {
-        "cpu": CpuCollectorLinux
-        }
-}
\ No newline at end of file
+    "Darwin": PluginRegistry({
+        "cpu": "collectors.cpu_collector:CpuCollectorMacOS",
+        "events": "collectors.event_collector:EventCollector",
+        }, group=ENTRY_POINT_GROUP),
+    "Windows": PluginRegistry({
+        }, group=ENTRY_POINT_GROUP),
+    "Linux": PluginRegistry({
+        "cpu": "collectors.cpu_collector:CpuCollectorLinux",
+        "smart": "collectors.drive_collector:DriveCollectorLinux",
+        "events": "collectors.event_collector:EventCollector",
+        }, group=ENTRY_POINT_GROUP),
+}
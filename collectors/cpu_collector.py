@@ -1,76 +1,272 @@
 import os
+import json
+import logging
+import platform
 import subprocess
 import time
-import pandas as pd
-from typing import List, Dict, Any
+import numpy as np
 
-from base.collector_base import AbstractDataCollector
+from base.collector_base import AbstractDataCollector, Sample
+from base.stored_collector import StoredCollectorMixin
+from collectors.procfs import Snapshot, open_fs
+from core.downsampling import downsample_frame
+from core.metrics import REGISTRY
+from core.registry import LazyModule
 
+pd = LazyModule("pandas")  # только для чтения истории
+logger = logging.getLogger(__name__)
 
-class AbstractCPUDataCollector(AbstractDataCollector):
+# Поля user..steal строки cpu в /proc/stat. guest и guest_nice уже входят в user
+# и nice, поэтому в общее время не суммируются (как в top и procps)
+CPU_TIME_FIELDS = 8
+
+
+def _count_cpu_list(text):
+    """Число CPU в списке формата /sys/devices/system/cpu/online, например "0-3,8,10-11" """
+    count = 0
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            lo, hi = part.split('-')
+            count += int(hi) - int(lo) + 1
+        else:
+            count += 1
+    return count
+
+
+class AbstractCPUDataCollector(StoredCollectorMixin, AbstractDataCollector):
     """Базовый класс для всех CPU сборщиков"""
+    # Характеристики, которые не меняются между замерами: хранятся один раз
+    # на загрузку системы (boot_time), а не в каждой строке истории
+    STATIC_FIELDS = ["cores", "physical_cores", "cpu_model", "cpu_vendor", "cache_size",
+                     "cpu_freq_min_ghz", "cpu_freq_max_ghz"]
+    # Колонка объекта в истории по ядрам (get_history(objects=...))
+    OBJECT_COLUMN = "core"
+    STORES = ("_store", "_core_store")
+    OBJECT_STORES = ("_core_store",)
+    # Накопительные счётчики: в признаках моделей — их скорости, а не значения
+    COUNTER_COLUMNS = ["total_interrupts", "context_switches"]
+    # Растут вместе со временем и признаками не служат
+    NON_FEATURE_COLUMNS = ["boot_time", "uptime_sec"]
+
     def __init__(self, config=None):
         self.update_config(config or {})
-        # Имя файла для сохранения данных — по имени класса
-        self._csv_path = f"storage/data/{self.__class__.__name__}.csv"
-        os.makedirs(os.path.dirname(self._csv_path), exist_ok=True)
+        self._open_storage()
+        # Файл статических данных — рядом с хранилищем
+        self._static_path = f"{self._data_path}_static.json"
+        # Метрики по ядрам — длинная таблица (timestamp, core, ...), агрегаты по каждому ядру
+        self._core_store = self._open_store("_cores", segment_rows=1 << 20, key="core")
+        self._import_legacy_csv()
+        self._static = None
+        self._last_uptime = None
+        self._fields = None  # имена полей замера, общие для всех Sample этого сборщика
+
+    def _import_legacy_csv(self):
+        """Однократно перенести историю из CSV прежних версий в хранилище"""
+        if len(self._store):
+            return
+        for path in (f"{self._data_path}.legacy.csv", f"{self._data_path}.csv"):
+            if os.path.exists(path):
+                self._store.import_csv(path)
+                os.replace(path, path + ".imported")
 
     def update_config(self, config):
         self.interval = config.get("interval", 1)  # сек между замерами
+        self._update_storage_config(config)
+
+    def _now(self):
+        """Время замера (при воспроизведении записи — записанное время)"""
+        return time.time()
+
+    def _snapshot(self):
+        """Снимок источников данных на текущий тик (None — если платформа его не использует)"""
+        return None
+
+    def _get_per_core(self, snap, objects=None):
+        """Метрики по логическим CPU: словарь колонка -> массив с колонкой core (None — недоступно)"""
+        return None
+
+    def _get_boot_time(self, snap, timestamp, uptime):
+        """Время загрузки системы (Unix-время, целые секунды) — ключ статических данных"""
+        if uptime is None:
+            return None
+        return int(round(timestamp - uptime))
+
+    def _get_static_info(self, snap, cores, uptime, boot_time):
+        """
+        Статические характеристики CPU. Считываются один раз за процесс
+        и повторно — только при изменении числа ядер (hotplug) или сбросе uptime.
+        """
+        rebooted = uptime is not None and self._last_uptime is not None and uptime < self._last_uptime
+        self._last_uptime = uptime
+        if self._static is None or rebooted or self._static["cores"] != cores:
+            freq_min, freq_max = self._get_cpu_freq_min_max(snap)
+            cpu_info = self._get_cpu_info(snap)
+            self._static = {
+                "cores": cores,
+                "physical_cores": cpu_info.get('physical_cores'),
+                "cpu_model": cpu_info.get('model'),
+                "cpu_vendor": cpu_info.get('vendor'),
+                "cache_size": cpu_info.get('cache_size'),
+                "cpu_freq_min_ghz": freq_min,
+                "cpu_freq_max_ghz": freq_max,
+            }
+            self._save_static(boot_time)
+        return self._static
+
+    def _load_static_records(self):
+        """Все сохранённые статические записи: {boot_time: {...}}"""
+        if os.path.exists(self._static_path):
+            with open(self._static_path, "r") as f:
+                return json.load(f)
+        return {}
 
-    def collect(self, objects=None) -> pd.DataFrame:
-        timestamp = time.time()
-        load1, load5, load15 = self._get_loadavg()
-        usage = self._get_cpu_usage()
-        idle = self._get_cpu_idle()
-        freq = self._get_cpu_freq()
-        freq_min, freq_max = self._get_cpu_freq_min_max()
-        uptime = self._get_uptime()
-        temp = self._get_cpu_temp()
-        interrupts = self._get_interrupts()
-        cpu_info = self._get_cpu_info()
-        cores = len(self.find_objects())
+    def _save_static(self, boot_time):
+        records = self._load_static_records()
+        key = str(boot_time)
+        record = dict(self._static, host=platform.node())
+        if records.get(key) != record:
+            records[key] = record
+            with open(self._static_path, "w") as f:
+                json.dump(records, f, indent=4)
+
+    def sample(self, objects=None) -> Sample:
+        timestamp = self._now()
+        probe = self._probe
+        snap = probe(self._snapshot)
+        load1, load5, load15 = probe(self._get_loadavg, snap)
+        usage = probe(self._get_cpu_usage, snap)
+        idle = probe(self._get_cpu_idle, snap)
+        freq = probe(self._get_cpu_freq, snap)
+        uptime = probe(self._get_uptime, snap)
+        boot_time = probe(self._get_boot_time, snap, timestamp, uptime)
+        temp = probe(self._get_cpu_temp, snap)
+        interrupts = probe(self._get_interrupts, snap)
+        cores = len(probe(self.find_objects))
+        static = probe(self._get_static_info, snap, cores, uptime, boot_time)
         load_1m_per_core = load1 / cores if cores else None
 
-        processes = self._get_process_count()
-        cpu_temp = self._get_cpu_temperature()
-        context_switches = self._get_context_switches()
+        processes = probe(self._get_process_count, snap)
+        cpu_temp = probe(self._get_cpu_temperature, snap)
+        context_switches = probe(self._get_context_switches, snap)
 
-        data = {
-            "timestamp": [timestamp],
-            "cpu_usage_percent": [usage],
-            "cpu_idle_percent": [idle],
-            "cpu_freq_current_ghz": [freq],
-            "cpu_freq_min_ghz": [freq_min],
-            "cpu_freq_max_ghz": [freq_max],
-            "load_1m": [load1],
-            "load_5m": [load5],
-            "load_15m": [load15],
-            "load_1m_per_core": [load_1m_per_core],
-            "uptime_sec": [uptime],
-            "cores": [cores],
-            "physical_cores": [cpu_info.get('physical_cores')],
-            "cpu_model": [cpu_info.get('model')],
-            "cpu_vendor": [cpu_info.get('vendor')],
-            "cache_size": [cpu_info.get('cache_size')],
-            "cpu_temp_celsius": [temp],
-            "total_interrupts": [interrupts],
-            "processes_total": [processes],
-            "cpu_temperature_c": [cpu_temp],
-            "context_switches": [context_switches],
+        row = {
+            "timestamp": timestamp,
+            "boot_time": boot_time,
+            "cpu_usage_percent": usage,
+            "cpu_idle_percent": idle,
+            "cpu_freq_current_ghz": freq,
+            "load_1m": load1,
+            "load_5m": load5,
+            "load_15m": load15,
+            "load_1m_per_core": load_1m_per_core,
+            "uptime_sec": uptime,
+            "cpu_temp_celsius": temp,
+            "total_interrupts": interrupts,
+            "processes_total": processes,
+            "cpu_temperature_c": cpu_temp,
+            "context_switches": context_switches,
         }
-        df = pd.DataFrame(data)
-        # Сохраняем в CSV (append)
-        write_header = not os.path.exists(self._csv_path) or os.path.getsize(self._csv_path) == 0
-        df.to_csv(self._csv_path, mode='a', header=write_header, index=False)
-        print("Собранные данные:", data)
+        self._store.append(row)
+        self._recent.append(row)
+        per_core = probe(self._get_per_core, snap, objects)
+        if per_core is not None and len(per_core["core"]):
+            per_core["timestamp"] = np.full(len(per_core["core"]), timestamp)
+            # Порог буфера по ядрам — в тиках, как у основного хранилища, а не в строках
+            self._core_store.max_rows = self._store.max_rows * len(per_core["core"])
+            self._core_store.append(per_core)
+        if not self.quiet:
+            print("Собранные данные:", row)
+        logger.debug("sample", extra={"collector": self.__class__.__name__, "sample": row})
+        # Наружу отдаём полную строку вместе со статическими характеристиками
+        if self._fields is None:
+            self._fields = tuple(row) + tuple(self.STATIC_FIELDS)
+        return Sample(self._fields, tuple(row.values()) + tuple(static[f] for f in self.STATIC_FIELDS))
+
+    def get_last_sample(self):
+        """Последний сохранённый замер со статическими характеристиками (None — истории нет); без pandas"""
+        row = self._last_row()
+        if row is None:
+            return None
+        static = {}
+        if row.get("boot_time") is not None:
+            static = self._load_static_records().get(str(row["boot_time"]), {})
+        fields = tuple(row) + tuple(self.STATIC_FIELDS)
+        return Sample(fields, tuple(row.values()) + tuple(static.get(f) for f in self.STATIC_FIELDS))
+
+    def get_features(self, objects=False):
+        """
+        Числовые признаки, которые есть в истории (без timestamp), вместе с числовыми
+        статическими характеристиками (get_history присоединяет их по boot_time);
+        objects=True — признаки по ядрам
+        """
+        if objects:
+            return super().get_features(objects=True)
+        records = list(self._load_static_records().values())
+        static = [f for f in self.STATIC_FIELDS
+                  if any(isinstance(r.get(f), (int, float)) and not isinstance(r.get(f), bool) for r in records)]
+        return super().get_features() + static
+
+    def get_history(self, start=None, end=None, max_points=None, columns=None, static=True, objects=None):
+        """
+        Загрузить исторические данные этого collector из хранилища.
+        start, end — границы по timestamp (включительно), columns — нужные колонки
+        (по умолчанию все), max_points — не больше стольких строк: лишнее
+        прореживается на сервере (см. core.downsampling).
+        static=True — присоединить статические характеристики по boot_time.
+        objects — история по ядрам (["cpu0", "cpu3"]) в длинном формате с колонкой core.
+        """
+        with REGISTRY.timer("collector_history_seconds", collector=self.__class__.__name__):
+            return self._read_history(start, end, max_points, columns, static, objects)
+
+    def _read_history(self, start, end, max_points, columns, static, objects):
+        if objects is not None:
+            return self._get_core_history(start, end, max_points, columns, objects)
+        static_fields = [f for f in self.STATIC_FIELDS if columns is None or f in columns] if static else []
+        store_columns = None
+        if columns is not None:
+            store_columns = [c for c in columns if c not in self.STATIC_FIELDS]
+            if static_fields:
+                store_columns.append("boot_time")
+        if self._recent.covers(start):
+            # Недавний диапазон целиком есть в памяти
+            df = self._recent.to_frame(start, end, store_columns)
+        else:
+            # С ограничением на число точек история читается из агрегатов подходящего уровня
+            df = self._store.query(start, end, store_columns, max_points=max_points)
+        if df.empty:
+            return df
+        # Статические поля присоединяются к уже прореженному ряду: при прореживании их бы
+        # усреднили, а строковые (модель, производитель) отбросили
+        df = downsample_frame(df, max_points)
+        if static_fields and "boot_time" in df.columns:
+            records = self._load_static_records()
+            if records:
+                static_df = pd.DataFrame.from_dict(records, orient="index")
+                static_df.index = static_df.index.astype(np.float64)
+                static_df = static_df[[f for f in static_fields if f in static_df.columns]].sort_index()
+                # В агрегатах boot_time — среднее по корзине, а не точный ключ: берётся ближайшая
+                # загрузка (в корзине на границе перезагрузки — та, чьих замеров больше)
+                boot = df["boot_time"].astype(np.float64).dropna().sort_values(kind="stable")
+                matched = pd.merge_asof(boot.to_frame(), static_df, left_on="boot_time", right_index=True,
+                                        direction="nearest")
+                matched.index = boot.index
+                for field in static_df.columns:
+                    df[field] = matched[field]
+            if columns is not None and "boot_time" not in columns:
+                df = df.drop(columns="boot_time")
         return df
-    
-    def get_history(self):
-        """Загрузить исторические данные этого collector из его CSV"""
-        if os.path.exists(self._csv_path):
-            return pd.read_csv(self._csv_path)
-        return pd.DataFrame()
+
+    def _get_core_history(self, start, end, max_points, columns, objects):
+        keys = [int(obj[3:]) for obj in objects if obj.startswith("cpu") and obj[3:].isdigit()]
+        df = self._core_store.query(start, end, columns, max_points=max_points, keys=keys)
+        if df.empty or max_points is None:
+            return df
+        # Прореживаем каждое ядро отдельно
+        parts = [downsample_frame(group.drop(columns="core"), max_points).assign(core=core)
+                 for core, group in df.groupby("core", sort=True)]
+        return pd.concat(parts, ignore_index=True)[df.columns]
 
 class CpuCollectorMacOS(AbstractCPUDataCollector):
     def find_objects(self):
@@ -79,13 +275,14 @@ class CpuCollectorMacOS(AbstractCPUDataCollector):
             cores = int(subprocess.check_output(["sysctl", "-n", "hw.ncpu"]).decode().strip())
             return [f"cpu{i}" for i in range(cores)]
         except Exception:
+            self._probe_failed("find_objects")
             return []
 
-    def _get_loadavg(self):
+    def _get_loadavg(self, snap=None):
         """Load average за 1, 5, 15 минут"""
         return os.getloadavg()
 
-    def _get_cpu_usage(self):
+    def _get_cpu_usage(self, snap=None):
         """
         Используем `ps -A -o %cpu` для замера загрузки CPU (в процентах).
         Это грубая оценка, но без сторонних библиотек иначе сложно.
@@ -95,9 +292,10 @@ class CpuCollectorMacOS(AbstractCPUDataCollector):
             cpu_usages = [float(x) for x in output if x.strip()]
             return sum(cpu_usages) / os.cpu_count()
         except Exception:
+            self._probe_failed("_get_cpu_usage")
             return None
 
-    def _get_cpu_idle(self):
+    def _get_cpu_idle(self, snap=None):
         try:
             output = subprocess.check_output(["sar", "-u", "1", "1"]).decode()
             for line in output.splitlines():
@@ -105,9 +303,10 @@ class CpuCollectorMacOS(AbstractCPUDataCollector):
                     parts = line.split()
                     return float(parts[-1])  # %idle
         except Exception:
+            self._probe_failed("_get_cpu_idle")
             return None
 
-    def _get_cpu_freq(self):
+    def _get_cpu_freq(self, snap=None):
         """Частота CPU в ГГц (номинальная и текущая)"""
         try:
             # Пробуем получить текущую частоту
@@ -115,30 +314,43 @@ class CpuCollectorMacOS(AbstractCPUDataCollector):
             freq_hz = int(subprocess.check_output(cmd).decode().strip())
             return freq_hz / 1e9  # ГГц
         except Exception:
+            self._probe_failed("_get_cpu_freq")
             return None
 
-    def _get_cpu_freq_min_max(self):
+    def _get_cpu_freq_min_max(self, snap=None):
         # macOS не предоставляет min/max через sysctl, возвращаем None
         return None, None
 
-    def _get_uptime(self):
+    def _get_boot_time(self, snap, timestamp, uptime):
+        """Время загрузки из kern.boottime (за время жизни процесса не меняется)"""
+        if not hasattr(self, '_boot_time'):
+            try:
+                boottime = subprocess.check_output(["sysctl", "-n", "kern.boottime"]).decode()
+                self._boot_time = int(boottime.split("sec =")[1].split(",")[0].strip())
+            except Exception:
+                self._probe_failed("_get_boot_time")
+                return super()._get_boot_time(snap, timestamp, uptime)
+        return self._boot_time
+
+    def _get_uptime(self, snap=None):
         try:
             boottime = subprocess.check_output(["sysctl", "-n", "kern.boottime"]).decode()
             sec = int(boottime.split("sec =")[1].split(",")[0].strip())
             now = int(time.time())
             return now - sec
         except Exception:
+            self._probe_failed("_get_uptime")
             return None
 
-    def _get_cpu_temp(self):
+    def _get_cpu_temp(self, snap=None):
         # Нет стандартного способа без сторонних утилит, возвращаем None
         return None
 
-    def _get_interrupts(self):
+    def _get_interrupts(self, snap=None):
         # Нет стандартного способа без сторонних утилит, возвращаем None
         return None
 
-    def _get_cpu_info(self):
+    def _get_cpu_info(self, snap=None):
         try:
             model = subprocess.check_output(["sysctl", "-n", "machdep.cpu.brand_string"]).decode().strip()
             vendor = subprocess.check_output(["sysctl", "-n", "machdep.cpu.vendor"]).decode().strip()
@@ -151,17 +363,19 @@ class CpuCollectorMacOS(AbstractCPUDataCollector):
                 "cache_size": f"{cache_size} KB"
             }
         except Exception:
+            self._probe_failed("_get_cpu_info")
             return {}
         
-    def _get_process_count(self):
+    def _get_process_count(self, snap=None):
         """Количество запущенных процессов"""
         try:
             output = subprocess.check_output(["ps", "-A"]).decode().strip().split("\n")
             return len(output) - 1  # Минус заголовок
         except Exception:
+            self._probe_failed("_get_process_count")
             return None
 
-    def _get_cpu_temperature(self):
+    def _get_cpu_temperature(self, snap=None):
         """Температура CPU"""
         try:
             # Попробуем получить температуру через powermetrics
@@ -172,10 +386,11 @@ class CpuCollectorMacOS(AbstractCPUDataCollector):
                     temp_str = line.split(':')[1].strip().split(' ')[0]
                     return float(temp_str)
         except Exception:
+            self._probe_failed("_get_cpu_temperature")
             pass
         return None
 
-    def _get_context_switches(self):
+    def _get_context_switches(self, snap=None):
         """Количество переключений контекста"""
         try:
             output = subprocess.check_output(["vm_stat"]).decode()
@@ -183,188 +398,378 @@ class CpuCollectorMacOS(AbstractCPUDataCollector):
                 if 'CPU context switches' in line:
                     return int(line.split(':')[1].strip())
         except Exception:
+            self._probe_failed("_get_context_switches")
             pass
         return None
 
-class CpuCollectorLinux(AbstractCPUDataCollector):        
+class CpuCollectorLinux(AbstractCPUDataCollector):
+    def __init__(self, config=None):
+        self.fs = self._open_fs(config or {})
+        super().__init__(config)
+
+    def _open_fs(self, config):
+        return open_fs(config)
+
+    def update_config(self, config):
+        super().update_config(config)
+        # "procfs" — только /proc и /sys, без запуска внешних процессов;
+        # "subprocess" — прежний путь через ps/nproc (оставлен для сравнения)
+        self.sampling = config.get("sampling", "procfs")
+
+    def close(self):
+        super().close()
+        # Для записи (record) — дописать последний кадр архива
+        self.fs.close()
+
+    def _now(self):
+        return self.fs.tick(time.time())
+
+    def _snapshot(self):
+        return Snapshot(self.fs)
+
     def find_objects(self):
         """На Linux объекты = логические CPU"""
+        cores = self._get_core_count()
+        return [f"cpu{i}" for i in range(cores)] if cores else []
+
+    def _get_core_count(self):
+        """Количество доступных логических CPU (аналог nproc)"""
+        if self.sampling == "subprocess":
+            try:
+                return int(subprocess.check_output(["nproc"]).decode().strip())
+            except Exception:
+                self._probe_failed("_get_core_count")
+                return 0
+        if self.fs.is_host():
+            # Маска привязки процесса есть только у настоящей системы
+            try:
+                return len(os.sched_getaffinity(0))
+            except Exception:
+                self._probe_failed("_get_core_count")
         try:
-            cores = int(subprocess.check_output(["nproc"]).decode().strip())
-            return [f"cpu{i}" for i in range(cores)]
+            return _count_cpu_list(self.fs.read('/sys/devices/system/cpu/online'))
         except Exception:
-            return []
+            self._probe_failed("_get_core_count")
+            return 0
 
-    def _get_loadavg(self):
+    def _get_loadavg(self, snap):
         """Load average за 1, 5, 15 минут"""
         try:
-            with open('/proc/loadavg', 'r') as f:
-                load_data = f.read().split()
+            load_data = snap.read('/proc/loadavg').split()
             return float(load_data[0]), float(load_data[1]), float(load_data[2])
         except Exception:
+            self._probe_failed("_get_loadavg")
             return 0.0, 0.0, 0.0
 
-    def _get_cpu_usage(self):
+    def _cpu_times_delta(self, snap):
+        """
+        Приращения (total, idle, iowait) агрегированной строки cpu из /proc/stat
+        с прошлого тика; None на первом тике. Считается один раз за тик.
+        """
+        if getattr(self, '_delta_snap', None) is snap:
+            return self._delta
+        self._delta_snap = snap
+        self._delta = None
+        times = snap.stat["cpu"]
+        total = sum(times[:CPU_TIME_FIELDS])
+        idle = times[3]
+        iowait = times[4] if len(times) > 4 else 0
+        prev = getattr(self, '_prev_cpu_times', None)
+        self._prev_cpu_times = (total, idle, iowait)
+        if prev is not None:
+            self._delta = (total - prev[0], idle - prev[1], iowait - prev[2])
+        return self._delta
+
+    def _get_per_core(self, snap, objects=None):
+        """
+        Метрики по каждому логическому CPU: загрузка и простой — по строкам cpuN
+        из того же чтения /proc/stat (приращения считаются сразу для всех ядер),
+        частота и температура ядра.
+        """
+        try:
+            cpus = snap.stat["cpus"]
+            ids = np.array(sorted(int(name[3:]) for name in cpus), dtype=np.int64)
+            times = np.array([cpus[f"cpu{i}"] for i in ids], dtype=np.int64)
+        except Exception:
+            self._probe_failed("_get_per_core")
+            return None
+        usage, idle = self._per_core_deltas(ids, times)
+        data = {
+            "core": ids,
+            "cpu_usage_percent": usage,
+            "cpu_idle_percent": idle,
+            "cpu_freq_current_ghz": self._get_per_core_freq(snap, ids),
+            "cpu_temp_celsius": self._get_per_core_temp(snap, ids),
+        }
+        if objects is not None:
+            wanted = [int(obj[3:]) for obj in objects if obj.startswith("cpu") and obj[3:].isdigit()]
+            mask = np.isin(ids, wanted)
+            data = {name: values[mask] for name, values in data.items()}
+        return data
+
+    def _per_core_deltas(self, ids, times):
+        """Загрузка и простой (%) по ядрам; NaN на первом тике и после изменения набора ядер"""
+        usage = np.full(len(ids), np.nan)
+        idle = np.full(len(ids), np.nan)
+        prev = getattr(self, '_prev_core_times', None)
+        self._prev_core_times = (ids, times)
+        if prev is None or not np.array_equal(prev[0], ids) or prev[1].shape != times.shape:
+            return usage, idle
+        delta = times - prev[1]
+        total = delta[:, :CPU_TIME_FIELDS].sum(axis=1).astype(np.float64)
+        idle_diff = delta[:, 3]
+        iowait_diff = delta[:, 4] if delta.shape[1] > 4 else 0
+        valid = total > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            idle = np.where(valid, idle_diff / total * 100, np.nan)
+            usage = np.where(valid, (1 - (idle_diff + iowait_diff) / total) * 100, np.nan)
+        return usage, idle
+
+    def _get_per_core_freq(self, snap, ids):
+        """Частота каждого ядра в ГГц: из /proc/cpuinfo, иначе из cpufreq/scaling_cur_freq"""
+        freq = np.full(len(ids), np.nan)
+        try:
+            mhz = {int(p['processor']): float(p['cpu MHz']) for p in snap.cpuinfo if 'cpu MHz' in p}
+        except Exception:
+            mhz = {}
+        for pos, cpu in enumerate(ids):
+            if cpu in mhz:
+                freq[pos] = mhz[cpu] / 1000
+                continue
+            text = snap.read(f'/sys/devices/system/cpu/cpu{cpu}/cpufreq/scaling_cur_freq')
+            if text is not None:
+                try:
+                    freq[pos] = int(text) / 1e6
+                except ValueError:
+                    pass
+        return freq
+
+    def _core_temp_sensors(self, ids):
+        """
+        Датчик coretemp для каждого логического CPU (по physical_package_id и core_id
+        из topology). Ищется один раз на набор ядер.
+        """
+        key = tuple(ids.tolist())
+        if getattr(self, '_core_temp_key', None) == key:
+            return self._core_temp_paths
+        sensors = {}  # (package, core_id) -> путь к tempN_input
+        try:
+            hwmons = self.fs.listdir('/sys/class/hwmon')
+        except Exception:
+            hwmons = []
+        for hw in hwmons:
+            base = f'/sys/class/hwmon/{hw}'
+            try:
+                if self.fs.read(f'{base}/name').strip() != 'coretemp':
+                    continue
+                package, cores = 0, {}
+                for name in self.fs.listdir(base):
+                    if not (name.startswith('temp') and name.endswith('_label')):
+                        continue
+                    label = self.fs.read(f'{base}/{name}').strip()
+                    path = f"{base}/{name[:-len('_label')]}_input"
+                    if label.startswith('Package id'):
+                        package = int(label.split()[-1])
+                    elif label.startswith('Core'):
+                        cores[int(label.split()[-1])] = path
+                for core_id, path in cores.items():
+                    sensors[(package, core_id)] = path
+            except Exception:
+                continue
+        paths = []
+        for cpu in ids:
+            topology = f'/sys/devices/system/cpu/cpu{cpu}/topology'
+            try:
+                package = int(self.fs.read(f'{topology}/physical_package_id'))
+                core_id = int(self.fs.read(f'{topology}/core_id'))
+                paths.append(sensors.get((package, core_id)))
+            except Exception:
+                paths.append(None)
+        self._core_temp_key, self._core_temp_paths = key, paths
+        return paths
+
+    def _get_per_core_temp(self, snap, ids):
+        """Температура ядра (°C); потоки одного ядра читают общий датчик один раз за тик"""
+        temp = np.full(len(ids), np.nan)
+        for pos, path in enumerate(self._core_temp_sensors(ids)):
+            if path is None:
+                continue
+            text = snap.read(path)
+            if text is not None:
+                try:
+                    temp[pos] = int(text) / 1000.0
+                except ValueError:
+                    pass
+        return temp
+
+    def _get_cpu_usage(self, snap):
+        """Использование CPU в процентах по приращениям счётчиков /proc/stat"""
+        if self.sampling == "subprocess":
+            return self._get_cpu_usage_ps()
+        try:
+            delta = self._cpu_times_delta(snap)
+            if delta is None or delta[0] <= 0:
+                return None
+            total_diff, idle_diff, iowait_diff = delta
+            # idle + iowait — время, когда CPU не был занят
+            return (1 - (idle_diff + iowait_diff) / total_diff) * 100
+        except Exception:
+            self._probe_failed("_get_cpu_usage")
+            return None
+
+    def _get_cpu_usage_ps(self):
         """Использование CPU в процентах через ps"""
         try:
             output = subprocess.check_output(["ps", "-A", "-o", "%cpu"]).decode().strip().split("\n")[1:]
             cpu_usages = [float(x) for x in output if x.strip()]
             return sum(cpu_usages) / len(self.find_objects())
         except Exception:
+            self._probe_failed("_get_cpu_usage_ps")
             return None
-        
-    def _get_cpu_idle(self):
+
+    def _get_cpu_idle(self, snap):
         try:
-            with open('/proc/stat', 'r') as f:
-                line = f.readline()
-            parts = line.split()
-            total = sum(map(int, parts[1:]))
-            idle = int(parts[4])
-            if not hasattr(self, '_prev_total_idle'):
-                self._prev_total_idle = total
-                self._prev_idle_idle = idle
-                return None
-            total_diff = total - self._prev_total_idle
-            idle_diff = idle - self._prev_idle_idle
-            self._prev_total_idle = total
-            self._prev_idle_idle = idle
-            if total_diff == 0:
+            delta = self._cpu_times_delta(snap)
+            if delta is None or delta[0] <= 0:
                 return None
-            idle_percent = (idle_diff / total_diff) * 100
-            return idle_percent
+            return (delta[1] / delta[0]) * 100
         except Exception:
+            self._probe_failed("_get_cpu_idle")
             return None
 
-    def _get_cpu_freq(self):
+    def _get_cpu_freq(self, snap):
         """Средняя частота CPU в ГГц"""
         try:
             # Пробуем получить текущую частоту из /proc/cpuinfo
-            with open('/proc/cpuinfo', 'r') as f:
-                lines = f.readlines()
-            frequencies = [float(line.split(':')[1].strip()) for line in lines if 'cpu mhz' in line.lower()]
+            frequencies = [float(p['cpu MHz']) for p in snap.cpuinfo if 'cpu MHz' in p]
             if frequencies:
                 return sum(frequencies) / len(frequencies) / 1000
             return None
         except Exception:
+            self._probe_failed("_get_cpu_freq")
             return None
 
-    def _get_cpu_freq_min_max(self):
+    def _get_cpu_freq_min_max(self, snap):
         try:
-            cur, minf, maxf = [], [], []
+            minf, maxf = [], []
             for cpu in self.find_objects():
-                num = cpu.replace('cpu', '')
-                try:
-                    with open(f'/sys/devices/system/cpu/cpu{num}/cpufreq/scaling_cur_freq') as f:
-                        cur.append(int(f.read().strip()) / 1e6)
-                    with open(f'/sys/devices/system/cpu/cpu{num}/cpufreq/scaling_min_freq') as f:
-                        minf.append(int(f.read().strip()) / 1e6)
-                    with open(f'/sys/devices/system/cpu/cpu{num}/cpufreq/scaling_max_freq') as f:
-                        maxf.append(int(f.read().strip()) / 1e6)
-                except Exception:
+                base = f'/sys/devices/system/cpu/{cpu}/cpufreq'
+                min_text = snap.read(f'{base}/scaling_min_freq')
+                max_text = snap.read(f'{base}/scaling_max_freq')
+                if min_text is None or max_text is None:
                     continue
-            if cur and minf and maxf:
+                minf.append(int(min_text) / 1e6)
+                maxf.append(int(max_text) / 1e6)
+            if minf and maxf:
                 return sum(minf)/len(minf), sum(maxf)/len(maxf)
             return None, None
         except Exception:
+            self._probe_failed("_get_cpu_freq_min_max")
             return None, None
-    
-    def _get_uptime(self):
+
+    def _get_boot_time(self, snap, timestamp, uptime):
+        """Время загрузки системы — поле btime из /proc/stat"""
+        try:
+            return snap.stat["btime"][0]
+        except Exception:
+            self._probe_failed("_get_boot_time")
+            return super()._get_boot_time(snap, timestamp, uptime)
+
+    def _get_uptime(self, snap):
         """Время работы системы"""
         try:
-            with open('/proc/uptime', 'r') as f:
-                uptime_seconds = float(f.read().split()[0])
-            return uptime_seconds
+            return float(snap.read('/proc/uptime').split()[0])
         except Exception:
+            self._probe_failed("_get_uptime")
             return None
-    
-    def _get_cpu_temp(self):
+
+    def _find_cpu_thermal_zone(self):
+        """Путь к температуре thermal zone с типом *cpu* (ищется один раз)"""
+        if not hasattr(self, '_thermal_zone'):
+            self._thermal_zone = None
+            try:
+                for zone in sorted(self.fs.listdir('/sys/class/thermal')):
+                    if zone.startswith('thermal_zone'):
+                        try:
+                            if 'cpu' in self.fs.read(f'/sys/class/thermal/{zone}/type').lower():
+                                self._thermal_zone = f'/sys/class/thermal/{zone}/temp'
+                                break
+                        except Exception:
+                            continue
+            except Exception:
+                self._probe_failed("_find_cpu_thermal_zone")
+                pass
+        return self._thermal_zone
+
+    def _get_cpu_temp(self, snap):
         try:
-            for zone in os.listdir('/sys/class/thermal'):
-                if zone.startswith('thermal_zone'):
-                    try:
-                        with open(f'/sys/class/thermal/{zone}/type') as f:
-                            if 'cpu' in f.read().lower():
-                                with open(f'/sys/class/thermal/{zone}/temp') as tf:
-                                    return int(tf.read().strip()) / 1000.0
-                    except Exception:
-                        continue
-            return None
+            path = self._find_cpu_thermal_zone()
+            if path is None:
+                return None
+            return int(snap.read(path).strip()) / 1000.0
         except Exception:
+            self._probe_failed("_get_cpu_temp")
             return None
 
-    def _get_interrupts(self):
+    def _get_interrupts(self, snap):
+        """Общее число прерываний по всем CPU (первое поле строки intr в /proc/stat)"""
         try:
-            with open('/proc/interrupts', 'r') as f:
-                lines = f.readlines()
-            total = 0
-            for line in lines[1:]:
-                parts = line.split()
-                if len(parts) > 1:
-                    total += int(parts[1])
-            return total
+            return snap.stat["intr"][0]
         except Exception:
+            self._probe_failed("_get_interrupts")
             return None
 
-    def _get_cpu_info(self):
+    def _get_cpu_info(self, snap):
         try:
             info = {}
-            with open('/proc/cpuinfo', 'r') as f:
-                lines = f.readlines()
-            cpu0_info = {}
-            for line in lines:
-                if line.strip() == '':
-                    break
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    cpu0_info[key.strip()] = value.strip()
+            processors = snap.cpuinfo
+            cpu0_info = processors[0] if processors else {}
             info['model'] = cpu0_info.get('model name', 'Unknown')
             info['vendor'] = cpu0_info.get('vendor_id', 'Unknown')
             info['cache_size'] = cpu0_info.get('cache size', 'Unknown')
             # Физические ядра
-            physical_cores = 0
-            for line in lines:
-                if line.startswith('cpu cores'):
-                    physical_cores = int(line.split(':')[1].strip())
-                    break
-            info['physical_cores'] = physical_cores
+            info['physical_cores'] = int(cpu0_info.get('cpu cores', 0))
             return info
         except Exception:
+            self._probe_failed("_get_cpu_info")
             return {}
-    
-    def _get_process_count(self):
-        """Количество запущенных процессов"""
+
+    def _get_process_count(self, snap):
+        """Количество запущенных процессов (каталоги /proc/<pid>)"""
+        if self.sampling == "subprocess":
+            try:
+                output = subprocess.check_output(["ps", "-A"]).decode().strip().split("\n")
+                return len(output) - 1  # Минус заголовок
+            except Exception:
+                self._probe_failed("_get_process_count")
+                return None
         try:
-            output = subprocess.check_output(["ps", "-A"]).decode().strip().split("\n")
-            return len(output) - 1  # Минус заголовок
+            return sum(map(str.isdigit, self.fs.listdir('/proc')))
         except Exception:
+            self._probe_failed("_get_process_count")
             return None
 
-    def _get_cpu_temperature(self):
+    def _get_cpu_temperature(self, snap):
         """Температура CPU"""
-        try:
-            # Пробуем разные возможные пути к датчикам температуры
-            thermal_paths = [
-                '/sys/class/thermal/thermal_zone0/temp',
-                '/sys/class/hwmon/hwmon0/temp1_input',
-                '/sys/class/hwmon/hwmon1/temp1_input',
-            ]
-            
-            for path in thermal_paths:
-                if os.path.exists(path):
-                    with open(path, 'r') as f:
-                        temp = int(f.read().strip())
-                        return temp / 1000.0  # Преобразуем в градусы Цельсия
-        except Exception:
-            pass
+        # Пробуем разные возможные пути к датчикам температуры
+        thermal_paths = [
+            '/sys/class/thermal/thermal_zone0/temp',
+            '/sys/class/hwmon/hwmon0/temp1_input',
+            '/sys/class/hwmon/hwmon1/temp1_input',
+        ]
+        for path in thermal_paths:
+            try:
+                text = snap.read(path)
+                if text is not None:
+                    return int(text.strip()) / 1000.0  # Преобразуем в градусы Цельсия
+            except Exception:
+                continue
         return None
 
-    def _get_context_switches(self):
+    def _get_context_switches(self, snap):
         """Количество переключений контекста"""
         try:
-            with open('/proc/stat', 'r') as f:
-                for line in f:
-                    if line.startswith('ctxt '):
-                        return int(line.split()[1])
+            return snap.stat["ctxt"][0]
         except Exception:
-            pass
-        return None
\ No newline at end of file
+            self._probe_failed("_get_context_switches")
+            return None
@@ -0,0 +1,453 @@
+import os
+import re
+import json
+import logging
+import time
+import numpy as np
+
+from base.collector_base import AbstractDataCollector, Sample
+from base.stored_collector import StoredCollectorMixin
+from collectors.procfs import Snapshot, open_fs
+from core.data_storage import INT_NA, TieredStore
+from core.downsampling import downsample_frame
+from core.metrics import REGISTRY
+from core.registry import LazyModule
+
+pd = LazyModule("pandas")  # только для чтения истории
+logger = logging.getLogger(__name__)
+
+# Счётчики строки /proc/diskstats (после major, minor, имени) и файла /sys/block/<dev>/stat
+DISKSTAT_FIELDS = ("reads", "reads_merged", "sectors_read", "read_ms", "writes", "writes_merged",
+                   "sectors_written", "write_ms", "in_flight", "io_ms", "weighted_io_ms")
+SECTOR_BYTES = 512  # счётчики секторов в diskstats всегда в 512-байтных секторах
+
+# Атрибуты ATA SMART -> колонки истории: признаки, по которым чаще всего предсказывают отказ диска
+SMART_ATTRIBUTES = {
+    5: "reallocated_sectors",
+    9: "power_on_hours",
+    187: "reported_uncorrect",
+    188: "command_timeout",
+    194: "temperature_c",
+    197: "pending_sectors",
+    198: "offline_uncorrectable",
+    199: "udma_crc_errors",
+}
+SMART_FIELDS = tuple(SMART_ATTRIBUTES.values())
+
+# Виртуальные устройства, которые по умолчанию не собираются
+DEFAULT_EXCLUDE = ("loop", "ram", "zram")
+
+
+def _normalize_id(text):
+    """Модель/серийный номер для сравнения с именем файла smartd: только буквы и цифры"""
+    return re.sub(r"[^0-9a-z]", "", text.lower())
+
+
+# Журналы smartd -A: attrlog.<MODEL>-<SERIAL>.ata.csv, .nvme.csv; у SCSI — attrlog.<VENDOR>-<MODEL>-<SERIAL>.scsi.csv
+ATTRLOG_SUFFIXES = (".ata.csv", ".nvme.csv", ".scsi.csv")
+
+
+def find_attrlog(files, model, serial):
+    """
+    Журнал диска среди files (нормализованное имя без префикса и суффикса -> путь). Имя
+    оканчивается серийным номером; модель из sysfs обрезана до 16 символов (а у SCSI перед ней
+    ещё производитель), поэтому она лишь выбирает среди файлов с тем же серийным номером.
+    """
+    serial = _normalize_id(serial or "")
+    if not serial:
+        return None
+    candidates = [(stem, path) for stem, path in files.items() if stem.endswith(serial)]
+    if len(candidates) > 1:
+        model = _normalize_id(model or "")
+        candidates = [(stem, path) for stem, path in candidates if model in stem[:-len(serial)]] or candidates
+        # Самое короткое имя: номером SN1 оканчивается и журнал диска с номером XSN1
+        candidates.sort(key=lambda c: len(c[0]))
+    return candidates[0][1] if candidates else None
+
+
+def parse_attrlog_line(line):
+    """
+    Строка attrlog smartd ("2024-01-01 12:00:00;\\t5;100;0;\\t194;64;36 (Min/Max 20/45);...")
+    -> {id атрибута: сырое значение}
+    """
+    parts = line.rstrip("\n").split(";")
+    attrs = {}
+    # После даты — тройки id; нормализованное значение; сырое значение
+    for pos in range(1, len(parts) - 2, 3):
+        try:
+            attr_id = int(parts[pos])
+        except ValueError:
+            continue
+        raw = re.match(r"\s*(\d+)", parts[pos + 2])
+        if raw:
+            attrs[attr_id] = int(raw.group(1))
+    return attrs
+
+
+class DriveCollectorLinux(StoredCollectorMixin, AbstractDataCollector):
+    """
+    Сборщик метрик дисков.
+
+    Счётчики всех устройств читаются одним чтением /proc/diskstats (если его
+    нет — /sys/block/<dev>/stat через открытые дескрипторы), IOPS, пропускная
+    способность, задержка и глубина очереди считаются по приращениям сразу
+    для всех дисков. SMART обновляется реже (smart_interval) и между
+    обновлениями берётся из кеша; внешние процессы на каждый диск не запускаются.
+    """
+    # Колонка объекта в истории по дискам (get_history(objects=...))
+    OBJECT_COLUMN = "device"
+    STORES = ("_store", "_device_store", "_smart_store")
+    OBJECT_STORES = ("_device_store", "_smart_store")
+
+    def __init__(self, config=None):
+        self.fs = self._open_fs(config or {})
+        self.update_config(config or {})
+        self._open_storage()
+        self._devices_path = f"{self._data_path}_devices.json"
+        # Метрики по дискам — длинная таблица (timestamp, device, ...), агрегаты по каждому диску
+        self._device_store = self._open_store("_disks", segment_rows=1 << 20, key="device")
+        # SMART пишется раз в smart_interval — минутные агрегаты ему не нужны
+        self._smart_store = TieredStore(f"{self._data_path}_smart", tiers={"1h": 3600, "1d": 86400},
+                                        retention=self.retention, key="device")
+        # Устройство -> {"id", "model", "serial", "size_bytes", "rotational"}; id — ключ в длинных таблицах
+        self._device_info = self._load_devices()
+        self._device_names = {info["id"]: name for name, info in self._device_info.items()}
+        self._all_names = None   # имена всех устройств в последнем чтении счётчиков
+        self._rows = []          # позиции выбранных устройств в этом чтении
+        self._names = ()         # выбранные устройства
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._prev = None        # (имена, счётчики, время) прошлого тика
+        self._temp_sensors = {}  # устройство -> путь к temp1_input его hwmon
+        self._smart = {}         # кеш SMART: устройство -> {колонка: значение}
+        self._smart_at = None    # время последнего обновления кеша
+        self._fields = None
+
+    def _open_fs(self, config):
+        return open_fs(config)
+
+    def update_config(self, config):
+        self.interval = config.get("interval", 1)  # сек между замерами
+        # Какие устройства собирать: явный список имён, иначе все диски из /sys/block, кроме exclude
+        self.devices = config.get("devices")
+        self.exclude = tuple(config.get("exclude", DEFAULT_EXCLUDE))
+        # SMART — раз в smart_interval секунд; источник — журналы атрибутов smartd (smartd -A <префикс>)
+        self.smart_interval = config.get("smart_interval", 600)
+        self.smart_attrlog = config.get("smart_attrlog", "/var/lib/smartmontools/attrlog.")
+        self._update_storage_config(config)
+
+    def _now(self):
+        return self.fs.tick(time.time())
+
+    # --- Устройства ---
+    def _load_devices(self):
+        if os.path.exists(self._devices_path):
+            with open(self._devices_path, "r") as f:
+                return json.load(f)
+        return {}
+
+    def _save_devices(self):
+        with open(self._devices_path, "w") as f:
+            json.dump(self._device_info, f, indent=4)
+
+    def find_objects(self):
+        """Объекты = выбранные диски"""
+        if self._all_names is None:
+            try:
+                self._read_counters(Snapshot(self.fs))
+            except Exception:
+                self._probe_failed("find_objects")
+                return []
+        return list(self._names)
+
+    def _select_devices(self, names):
+        """Набор устройств изменился (первый тик, hotplug): выбрать диски и прочитать их описание"""
+        self._all_names = names
+        if self.devices is not None:
+            wanted = set(self.devices)
+            selected = [n for n in names if n in wanted]
+        else:
+            try:
+                # В /sys/block только целые диски, без разделов
+                disks = set(self.fs.listdir('/sys/block'))
+            except Exception:
+                disks = None
+            selected = [n for n in names if (disks is None or n in disks) and not n.startswith(self.exclude)]
+        positions = {name: pos for pos, name in enumerate(names)}
+        self._rows = [positions[n] for n in selected]
+        self._names = tuple(selected)
+        changed = False
+        for name in selected:
+            info = dict(self._device_info.get(name) or {"id": len(self._device_info)}, **self._get_device_info(name))
+            if info != self._device_info.get(name):
+                self._device_info[name] = info
+                changed = True
+            self._temp_sensors[name] = self._find_temp_sensor(name)
+        if changed:
+            self._device_names = {info["id"]: name for name, info in self._device_info.items()}
+            self._save_devices()
+        self._ids = np.array([self._device_info[n]["id"] for n in selected], dtype=np.int64)
+
+    def _read_attr(self, path):
+        try:
+            return self.fs.read(path).strip()
+        except Exception:
+            return None
+
+    def _get_device_info(self, name):
+        """Модель, серийный номер, размер и тип диска из sysfs (читается при появлении устройства)"""
+        base = f'/sys/block/{name}'
+        serial = self._read_attr(f'{base}/device/serial')
+        if serial is None:
+            # SCSI/SATA: серийный номер в странице VPD 0x80 после 4-байтного заголовка
+            vpd = self._read_attr(f'{base}/device/vpd_pg80')
+            serial = "".join(c for c in vpd[4:] if c.isprintable()).strip() if vpd else None
+        size = self._read_attr(f'{base}/size')
+        rotational = self._read_attr(f'{base}/queue/rotational')
+        return {
+            "model": self._read_attr(f'{base}/device/model'),
+            "serial": serial,
+            "size_bytes": int(size) * SECTOR_BYTES if size and size.isdigit() else None,
+            "rotational": rotational == "1" if rotational is not None else None,
+        }
+
+    def _find_temp_sensor(self, name):
+        """
+        Датчик температуры диска: hwmon драйвера drivetemp (SATA, device/hwmon/hwmonN)
+        или контроллера NVMe (device/hwmonN)
+        """
+        base = f'/sys/block/{name}/device'
+        try:
+            entries = self.fs.listdir(base)
+        except Exception:
+            return None
+        candidates = []
+        for entry in entries:
+            if entry == 'hwmon':
+                try:
+                    candidates += [f'{base}/hwmon/{hw}' for hw in self.fs.listdir(f'{base}/hwmon')]
+                except Exception:
+                    continue
+            elif entry.startswith('hwmon'):
+                candidates.append(f'{base}/{entry}')
+        for hw in sorted(candidates):
+            path = f'{hw}/temp1_input'
+            if self.fs.exists(path):
+                return path
+        return None
+
+    # --- Счётчики ---
+    def _read_counters(self, snap):
+        """Счётчики выбранных устройств одним проходом: (имена, массив len(имён) x DISKSTAT_FIELDS)"""
+        text = snap.read('/proc/diskstats')
+        if text is None:
+            return self._read_sysfs_counters(snap)
+        lines = [line.split() for line in text.splitlines()]
+        lines = [parts for parts in lines if len(parts) >= 3 + len(DISKSTAT_FIELDS)]
+        names = tuple(parts[2] for parts in lines)
+        if names != self._all_names:
+            self._select_devices(names)
+        counters = np.array([lines[pos][3:3 + len(DISKSTAT_FIELDS)] for pos in self._rows], dtype=np.int64)
+        return self._names, counters.reshape(len(self._rows), len(DISKSTAT_FIELDS))
+
+    def _read_sysfs_counters(self, snap):
+        """Запасной путь без /proc/diskstats (например, в контейнере): /sys/block/<dev>/stat"""
+        names = tuple(sorted(self.fs.listdir('/sys/block')))
+        if names != self._all_names:
+            self._select_devices(names)
+        counters = np.zeros((len(self._names), len(DISKSTAT_FIELDS)), dtype=np.int64)
+        for pos, name in enumerate(self._names):
+            text = snap.read(f'/sys/block/{name}/stat')
+            counters[pos] = list(map(int, text.split()[:len(DISKSTAT_FIELDS)])) if text is not None else INT_NA
+        return self._names, counters
+
+    def _get_rates(self, names, counters, timestamp):
+        """
+        Метрики по дискам из приращений счётчиков с прошлого тика; NaN на первом тике,
+        после изменения набора дисков и при сбросе счётчика
+        """
+        prev = self._prev
+        self._prev = (names, counters, timestamp)
+        n = len(names)
+        data = {name: np.full(n, np.nan) for name in (
+            "read_iops", "write_iops", "read_mb_s", "write_mb_s", "read_await_ms", "write_await_ms",
+            "await_ms", "util_percent", "queue_depth")}
+        data["in_flight"] = counters[:, 8].astype(np.float64)
+        if prev is None or prev[0] != names or timestamp <= prev[2]:
+            return data
+        elapsed = timestamp - prev[2]
+        delta = (counters - prev[1]).astype(np.float64)
+        delta[(delta < 0) | (counters == INT_NA) | (prev[1] == INT_NA)] = np.nan
+        reads, writes = delta[:, 0], delta[:, 4]
+        ios = reads + writes
+        with np.errstate(invalid="ignore", divide="ignore"):
+            data["read_iops"] = reads / elapsed
+            data["write_iops"] = writes / elapsed
+            data["read_mb_s"] = delta[:, 2] * SECTOR_BYTES / 1e6 / elapsed
+            data["write_mb_s"] = delta[:, 6] * SECTOR_BYTES / 1e6 / elapsed
+            # Среднее время запроса (как await в iostat), только если запросы были
+            data["read_await_ms"] = np.where(reads > 0, delta[:, 3] / reads, np.nan)
+            data["write_await_ms"] = np.where(writes > 0, delta[:, 7] / writes, np.nan)
+            data["await_ms"] = np.where(ios > 0, (delta[:, 3] + delta[:, 7]) / ios, np.nan)
+            data["util_percent"] = np.minimum(delta[:, 9] / (elapsed * 1000) * 100, 100)
+            # Средняя длина очереди (aqu-sz): взвешенное время в очереди за интервал
+            data["queue_depth"] = delta[:, 10] / (elapsed * 1000)
+        return data
+
+    # --- SMART ---
+    def _attrlog_files(self):
+        """Файлы attrlog smartd: нормализованное имя без префикса и суффикса ("модель-серийный номер") -> путь"""
+        # Через self.fs: с учётом fs_root, и при записи каталог попадает в архив
+        directory, base = os.path.split(self.smart_attrlog)
+        files = {}
+        try:
+            entries = self.fs.listdir(directory)
+        except OSError:
+            return files
+        for entry in entries:
+            suffix = next((s for s in ATTRLOG_SUFFIXES if entry.endswith(s)), None)
+            if entry.startswith(base) and suffix is not None:
+                files[_normalize_id(entry[len(base):-len(suffix)])] = f"{directory}/{entry}"
+        return files
+
+    def _get_smart(self, snap):
+        """
+        SMART по всем выбранным дискам: последние строки журналов атрибутов smartd
+        (сам smartd опрашивает диски по своему расписанию) и температура из hwmon
+        """
+        files = self._attrlog_files()
+        smart = {}
+        for name in self._names:
+            values = dict.fromkeys(SMART_FIELDS)
+            info = self._device_info.get(name, {})
+            path = find_attrlog(files, info.get("model"), info.get("serial"))
+            if path is not None:
+                try:
+                    line = self.fs.read_last_line(path)
+                    attrs = parse_attrlog_line(line) if line else {}
+                    for attr_id, field in SMART_ATTRIBUTES.items():
+                        values[field] = attrs.get(attr_id)
+                except Exception:
+                    self._probe_failed("_get_smart")
+            sensor = self._temp_sensors.get(name)
+            if sensor is not None:
+                text = snap.read(sensor)
+                if text is not None:
+                    try:
+                        values["temperature_c"] = int(text) / 1000.0
+                    except ValueError:
+                        pass
+            smart[name] = values
+        return smart
+
+    def _refresh_smart(self, snap, timestamp):
+        """Обновить кеш SMART, если с прошлого обновления прошло smart_interval секунд"""
+        if self._smart_at is not None and timestamp - self._smart_at < self.smart_interval \
+                and set(self._smart) == set(self._names):
+            return
+        self._smart = self._get_smart(snap)
+        self._smart_at = timestamp
+        if not self._names:
+            return
+        rows = {"timestamp": np.full(len(self._names), timestamp), "device": self._ids}
+        for field in SMART_FIELDS:
+            rows[field] = np.array([np.nan if self._smart[n][field] is None else self._smart[n][field]
+                                    for n in self._names], dtype=np.float64)
+        self._smart_store.append(rows)
+
+    # --- Замер ---
+    def sample(self, objects=None) -> Sample:
+        timestamp = self._now()
+        probe = self._probe
+        snap = Snapshot(self.fs)
+        names, counters = probe(self._read_counters, snap)
+        rates = probe(self._get_rates, names, counters, timestamp)
+        probe(self._refresh_smart, snap, timestamp)
+        temps = np.array([np.nan if self._smart[n]["temperature_c"] is None else self._smart[n]["temperature_c"]
+                          for n in names], dtype=np.float64)
+
+        row = {
+            "timestamp": timestamp,
+            "devices": len(names),
+            "read_iops": _total(rates["read_iops"]),
+            "write_iops": _total(rates["write_iops"]),
+            "read_mb_s": _total(rates["read_mb_s"]),
+            "write_mb_s": _total(rates["write_mb_s"]),
+            "await_ms_max": _max(rates["await_ms"]),
+            "util_percent_max": _max(rates["util_percent"]),
+            "queue_depth_total": _total(rates["queue_depth"]),
+            "in_flight_total": _total(rates["in_flight"]),
+            "temperature_c_max": _max(temps),
+            "reallocated_sectors_total": self._smart_total("reallocated_sectors"),
+            "pending_sectors_total": self._smart_total("pending_sectors"),
+            "smart_age_sec": timestamp - self._smart_at,
+        }
+        self._store.append(row)
+        self._recent.append(row)
+        if len(names):
+            per_disk = dict(timestamp=np.full(len(names), timestamp), device=self._ids, **rates)
+            if objects is not None:
+                mask = np.isin(np.array(names, dtype=object), list(objects))
+                per_disk = {name: values[mask] for name, values in per_disk.items()}
+            # Порог буфера по дискам — в тиках, как у основного хранилища, а не в строках
+            self._device_store.max_rows = self._store.max_rows * max(len(names), 1)
+            self._device_store.append(per_disk)
+        if not self.quiet:
+            print("Собранные данные:", row)
+        logger.debug("sample", extra={"collector": self.__class__.__name__, "sample": row})
+        if self._fields is None:
+            self._fields = tuple(row)
+        return Sample(self._fields, tuple(row.values()))
+
+    def _smart_total(self, field):
+        values = [v[field] for v in self._smart.values() if v[field] is not None]
+        return sum(values) if values else None
+
+    def close(self):
+        super().close()
+        self.fs.close()
+
+    # --- История ---
+    def get_device_info(self):
+        """Описание дисков: {устройство: {"model", "serial", "size_bytes", "rotational"}}"""
+        return {name: {k: v for k, v in info.items() if k != "id"} for name, info in self._device_info.items()}
+
+    def get_history(self, start=None, end=None, max_points=None, columns=None, objects=None):
+        """
+        Загрузить исторические данные из хранилища (параметры — как у CPU-сборщика).
+        objects — история по дискам (["sda", "nvme0n1"]) в длинном формате с колонкой device;
+        колонки SMART читаются из отдельного хранилища со своей (редкой) сеткой времени.
+        """
+        with REGISTRY.timer("collector_history_seconds", collector=self.__class__.__name__):
+            if objects is not None:
+                return self._get_device_history(start, end, max_points, columns, objects)
+            if self._recent.covers(start):
+                df = self._recent.to_frame(start, end, columns)
+            else:
+                df = self._store.query(start, end, columns, max_points=max_points)
+            return downsample_frame(df, max_points) if not df.empty else df
+
+    def _get_device_history(self, start, end, max_points, columns, objects):
+        keys = [self._device_info[obj]["id"] for obj in objects if obj in self._device_info]
+        smart = columns is not None and all(c in SMART_FIELDS for c in columns)
+        store = self._smart_store if smart else self._device_store
+        df = store.query(start, end, columns, max_points=max_points, keys=keys)
+        if df.empty:
+            return df
+        if max_points is not None:
+            # Прореживаем каждый диск отдельно
+            parts = [downsample_frame(group.drop(columns="device"), max_points).assign(device=device)
+                     for device, group in df.groupby("device", sort=True)]
+            df = pd.concat(parts, ignore_index=True)[df.columns]
+        df["device"] = df["device"].map(self._device_names)
+        return df
+
+
+def _total(values):
+    """Сумма по дискам без NaN; None — значений нет (первый тик)"""
+    valid = values[~np.isnan(values)]
+    return float(valid.sum()) if len(valid) else None
+
+
+def _max(values):
+    valid = values[~np.isnan(values)]
+    return float(valid.max()) if len(valid) else None
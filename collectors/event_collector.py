@@ -0,0 +1,300 @@
+import os
+import re
+import json
+import logging
+import time
+from collections import deque
+
+from base.collector_base import AbstractDataCollector, Sample
+from base.stored_collector import StoredCollectorMixin
+from core.downsampling import downsample_frame
+from core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Событие -> регулярное выражение по строке журнала ядра; все собираются в одно выражение
+DEFAULT_PATTERNS = {
+    "mce": r"mce: \[Hardware Error\]|Machine check events logged|Machine Check Exception",
+    "edac": r"EDAC \S+: \d+ (?:CE|UE) |EDAC .*(?:Corrected|Uncorrected) error",
+    "io_error": r"I/O error|Buffer I/O error|blk_update_request: .*error|critical medium error",
+    "ata_error": r" ata\d+(?:\.\d+)?: (?:exception Emask|failed command|hard resetting link|SError:)",
+    "nvme_error": r"nvme\d+\w*: .*(?:timeout|resetting controller|I/O error)",
+    "fs_error": r"EXT4-fs error|XFS \(\S+\): (?:Corruption|metadata I/O error)|BTRFS (?:error|critical)",
+    "thermal_throttle": r"temperature above threshold|cpu clock throttled|thermal throttling",
+    "oom": r"Out of memory: Killed process|oom-kill:",
+}
+
+
+_REGEX_META = set(".^$*+?{}[]|()")
+
+
+def literal_prefixes(pattern):
+    """
+    Начальные литералы ветвей выражения верхнего уровня ("EDAC \\S+|I/O error" -> ["EDAC ", "I/O error"]).
+    None — у какой-то ветви литерала нет, и строки без него тоже могут совпасть.
+    """
+    branches, depth, start, pos = [], 0, 0, 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        if char == "\\":
+            pos += 1
+        elif char == "[":
+            # Класс символов целиком, ] сразу после [ или [^ — литерал
+            pos += 2 if pattern[pos + 1:pos + 2] == "^" else 1
+            pos = pattern.index("]", pos + 1)
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            branches.append(pattern[start:pos])
+            start = pos + 1
+        pos += 1
+    branches.append(pattern[start:])
+    prefixes = []
+    for branch in branches:
+        literal, pos = [], 0
+        while pos < len(branch):
+            char = branch[pos]
+            if char == "\\" and pos + 1 < len(branch) and not branch[pos + 1].isalnum():
+                char = branch[pos + 1]
+                pos += 1
+            elif char in _REGEX_META or char == "\\":
+                # Символ перед квантификатором необязателен
+                if char in "*?{" and literal:
+                    literal.pop()
+                break
+            literal.append(char)
+            pos += 1
+        if len(literal) < 2:
+            return None
+        prefixes.append("".join(literal))
+    return prefixes
+
+
+class LogTail:
+    """
+    Чтение новых строк файла журнала с места, где остановились.
+
+    Положение — (inode, смещение) и сохраняется между запусками. Ротация
+    определяется по смене inode: старый файл дочитывается до конца (если
+    ротация была, пока сборщик не работал, — под одним из имён rotated),
+    новый читается с начала; файл, обрезанный на месте (copytruncate), — тоже.
+    Отдаются только целые строки: незаконченная строка ждёт следующего тика.
+    """
+    def __init__(self, path, state=None, rotated=(".1",), from_start=False):
+        self.path = path
+        self.inode = state.get("inode") if state else None
+        self.offset = state.get("offset", 0) if state else 0
+        self.rotated = rotated
+        self.from_start = from_start
+        self._file = None
+
+    def state(self):
+        return {"inode": self.inode, "offset": self.offset}
+
+    def _open(self, inode, offset, path=None):
+        self._file = open(path or self.path, "rb")
+        self.inode, self.offset = inode, offset
+
+    def _resume(self, st, max_bytes):
+        """Первое открытие: продолжить с сохранённого места; возвращает недочитанный хвост ротированного файла"""
+        if self.inode is None:
+            # Файл раньше не читался — прошлые события не считаем
+            self._open(st.st_ino, 0 if self.from_start else st.st_size)
+            return b""
+        if st.st_ino == self.inode:
+            self._open(st.st_ino, self.offset if self.offset <= st.st_size else 0)
+            return b""
+        tail = b""
+        for suffix in self.rotated:
+            try:
+                if os.stat(self.path + suffix).st_ino == self.inode:
+                    self._open(self.inode, self.offset, self.path + suffix)
+                    tail = self._read_lines(max_bytes, final=True)
+                    self._file.close()
+                    break
+            except OSError:
+                continue
+        self._open(st.st_ino, 0)
+        return tail
+
+    def _read_lines(self, limit, final=False):
+        """Целые строки от текущего смещения, не больше limit байт; final — забрать и незаконченную строку"""
+        if limit <= 0:
+            return b""
+        self._file.seek(self.offset)
+        data = self._file.read(limit)
+        end = data.rfind(b"\n") + 1
+        if not end and (final or len(data) == limit):
+            # Строка длиннее limit (или файл закрыт навсегда) — отдаём как есть
+            end = len(data)
+        self.offset += end
+        return data[:end]
+
+    def read(self, max_bytes):
+        """Новые целые строки (bytes, не больше max_bytes); b"" — нового нет или файла пока нет"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if self._file is None:
+            if st is None:
+                return b""
+            data = self._resume(st, max_bytes)
+        elif st is not None and st.st_ino != self.inode:
+            # Файл ротирован: дочитываем старый (открытый дескриптор держит прежний inode) и переходим к новому
+            data = self._read_lines(max_bytes, final=True)
+            self._file.close()
+            self._open(st.st_ino, 0)
+        else:
+            data = b""
+            if st is not None and st.st_size < self.offset:
+                # Обрезан на месте (copytruncate)
+                self.offset = 0
+        return data + self._read_lines(max_bytes - len(data))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class EventCollector(StoredCollectorMixin, AbstractDataCollector):
+    """
+    Сборщик событий из журналов (kern.log, выгрузки dmesg и journalctl).
+
+    Файлы дочитываются с сохранённых смещений (LogTail), новые строки
+    проверяются одним заранее скомпилированным выражением из всех шаблонов,
+    замер — число событий каждого вида за интервал.
+    """
+    def __init__(self, config=None):
+        self.update_config(config or {})
+        self._open_storage()
+        self._offsets_path = f"{self._data_path}_offsets.json"
+        offsets = self._load_offsets()
+        self._tails = [LogTail(path, offsets.get(path), rotated=self.rotated, from_start=self.from_start)
+                       for path in self.files]
+        self._events = deque(maxlen=self.keep_lines)  # последние совпавшие строки
+        self._fields = None
+
+    def update_config(self, config):
+        self.interval = config.get("interval", 10)  # сек между замерами
+        self.files = list(config.get("files", ["/var/log/kern.log"]))
+        # Имена, под которыми logrotate оставляет прежний файл (для ротации во время остановки)
+        self.rotated = tuple(config.get("rotated", [".1"]))
+        # Файл, который раньше не читался: False — только новые строки, True — с начала
+        self.from_start = config.get("from_start", False)
+        # Не больше стольких байт с файла за тик; остальное — в следующих тиках
+        self.max_read = config.get("max_read", 16 << 20)
+        self.keep_lines = config.get("keep_lines", 100)
+        self.patterns = dict(config.get("patterns", DEFAULT_PATTERNS))
+        for name in self.patterns:
+            if not name.isidentifier():
+                raise ValueError(f"Имя события должно быть идентификатором: {name!r}")
+        # Именованная группа на каждое событие: совпавшее событие — m.lastgroup
+        self._regex = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in self.patterns.items()))
+        # Альтернатива из многих ветвей лишает re поиска по начальному литералу, и выражение проверяется
+        # в каждой позиции текста. Поэтому сначала str.find отбирает строки с начальными литералами
+        # ветвей, а выражение применяется только к ним (если у всех ветвей такие литералы есть)
+        literals = [literal_prefixes(pattern) for pattern in self.patterns.values()]
+        self._literals = None if None in literals else sorted({p for group in literals for p in group})
+        self._update_storage_config(config)
+
+    def _load_offsets(self):
+        if os.path.exists(self._offsets_path):
+            with open(self._offsets_path, "r") as f:
+                return json.load(f)
+        return {}
+
+    def _save_offsets(self):
+        # Через временный файл: оборванная запись не должна сбросить смещения
+        tmp = self._offsets_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({tail.path: tail.state() for tail in self._tails}, f)
+        os.replace(tmp, self._offsets_path)
+
+    def find_objects(self):
+        """Объекты = отслеживаемые файлы журналов"""
+        return list(self.files)
+
+    def _get_counts(self):
+        """Число событий каждого вида в новых строках всех файлов и число прочитанных строк"""
+        counts = dict.fromkeys(self.patterns, 0)
+        lines = 0
+        for tail in self._tails:
+            try:
+                data = tail.read(self.max_read)
+            except Exception:
+                self._probe_failed("_get_counts")
+                logger.debug("Не удалось прочитать %s", tail.path, exc_info=True)
+                continue
+            if not data:
+                continue
+            text = data.decode(errors="replace")
+            lines += text.count("\n")
+            if self._literals is not None:
+                text = self._candidate_lines(text)
+            # Строка считается один раз — по первому совпадению, даже если подходит под несколько
+            # ветвей (mce-строка с "Machine check events logged") или несколько событий
+            match = self._regex.search(text)
+            while match is not None:
+                counts[match.lastgroup] += 1
+                start = text.rfind("\n", 0, match.start()) + 1
+                end = text.find("\n", match.end())
+                if self.keep_lines:
+                    self._events.append((match.lastgroup, tail.path, text[start:end if end >= 0 else None]))
+                match = self._regex.search(text, end + 1) if end >= 0 else None
+        return counts, lines
+
+    def _candidate_lines(self, text):
+        """Строки text, содержащие хотя бы один начальный литерал ветвей (события ищутся только внутри строки)"""
+        starts = set()
+        for literal in self._literals:
+            pos = text.find(literal)
+            while pos >= 0:
+                starts.add(text.rfind("\n", 0, pos) + 1)
+                end = text.find("\n", pos)
+                if end < 0:
+                    break
+                pos = text.find(literal, end + 1)
+        candidates = []
+        for start in sorted(starts):
+            end = text.find("\n", start)
+            candidates.append(text[start:end if end >= 0 else None])
+        return "\n".join(candidates)
+
+    def sample(self, objects=None) -> Sample:
+        timestamp = time.time()
+        counts, lines = self._probe(self._get_counts)
+        row = {"timestamp": timestamp, **counts, "events_total": sum(counts.values()), "lines_read": lines}
+        self._store.append(row)
+        self._recent.append(row)
+        # Смещения — после записи замера в журнал буфера: после падения строки не считаются повторно
+        self._save_offsets()
+        if not self.quiet:
+            print("Собранные данные:", row)
+        logger.debug("sample", extra={"collector": self.__class__.__name__, "sample": row})
+        if self._fields is None:
+            self._fields = tuple(row)
+        return Sample(self._fields, tuple(row.values()))
+
+    def get_recent_events(self):
+        """Последние keep_lines совпавших строк: [(событие, файл, строка)], от старых к новым"""
+        return list(self._events)
+
+    def close(self):
+        super().close()
+        for tail in self._tails:
+            tail.close()
+
+    # --- История ---
+    def get_history(self, start=None, end=None, max_points=None, columns=None, objects=None):
+        """Загрузить исторические данные из хранилища (параметры — как у CPU-сборщика, без objects)"""
+        with REGISTRY.timer("collector_history_seconds", collector=self.__class__.__name__):
+            if self._recent.covers(start):
+                df = self._recent.to_frame(start, end, columns)
+            else:
+                # Замер — число событий за интервал: в корзинах уровней и при прореживании — суммы, не средние
+                df = self._store.query(start, end, columns, max_points=max_points, agg="sum")
+            return downsample_frame(df, max_points, method="sum") if not df.empty else df
@@ -0,0 +1,392 @@
+import gzip
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+
+class ProcFS:
+    """
+    Чтение файлов /proc и /sys через постоянно открытые дескрипторы.
+
+    Файл открывается один раз и дальше перечитывается через pread со
+    смещения 0: procfs и sysfs при чтении с начала заново формируют
+    содержимое, поэтому open/close на каждом тике не нужны.
+
+    Читают из разных потоков (замер в планировщике, find_objects в запросе),
+    поэтому чтение, открытие и вытеснение дескрипторов — под блокировкой:
+    иначе дескриптор мог бы закрыться (а номер — достаться другому файлу)
+    посреди чужого pread.
+    """
+    def __init__(self, root="/", max_open=256):
+        self.root = root
+        self.max_open = max_open
+        self._fds = OrderedDict()  # путь -> дескриптор, в порядке использования
+        self._bufsize = {}
+        self._lock = threading.Lock()
+
+    def path(self, path):
+        """Путь с учётом корня файловой системы"""
+        if self.root == "/":
+            return path
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def read(self, path):
+        """Прочитать файл целиком; при ошибке дескриптор закрывается и исключение пробрасывается"""
+        with self._lock:
+            return self._read(path)
+
+    def _read(self, path):
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = os.open(self.path(path), os.O_RDONLY)
+            self._fds[path] = fd
+            if len(self._fds) > self.max_open:
+                _, old_fd = self._fds.popitem(last=False)
+                os.close(old_fd)
+        else:
+            self._fds.move_to_end(path)
+        try:
+            return self._pread_all(path, fd)
+        except OSError:
+            # Устройство могло исчезнуть (hotplug) — в следующий раз откроем заново
+            self._fds.pop(path, None)
+            os.close(fd)
+            raise
+
+    def _pread_all(self, path, fd):
+        bufsize = self._bufsize.get(path, 4096)
+        chunks = []
+        offset = 0
+        while True:
+            chunk = os.pread(fd, bufsize, offset)
+            chunks.append(chunk)
+            offset += len(chunk)
+            if len(chunk) < bufsize:
+                break
+            bufsize *= 2
+        self._bufsize[path] = max(self._bufsize.get(path, 4096), offset + 1)
+        return b"".join(chunks).decode(errors="replace")
+
+    def exists(self, path):
+        return path in self._fds or os.path.exists(self.path(path))
+
+    def listdir(self, path):
+        return os.listdir(self.path(path))
+
+    def read_last_line(self, path):
+        """Последняя полная строка растущего файла (журнала), без чтения его целиком"""
+        return read_last_line(self.path(path))
+
+    def is_host(self):
+        """Читается ли файловая система самого хоста (тогда доступны и системные вызовы вроде sched_getaffinity)"""
+        return self.root == "/"
+
+    def tick(self, timestamp):
+        """Начало очередного тика сбора; возвращает время замера"""
+        return timestamp
+
+    def close(self):
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+_MISSING = object()
+
+
+class RecordingProcFS:
+    """
+    ProcFS, записывающая всё прочитанное в архив для ReplayProcFS.
+
+    Архив — gzip со строкой JSON на тик: {"t": время, "f": {путь: текст},
+    "d": {каталог: список имён или {"+": [...], "-": [...]}}}. В кадр попадают
+    только файлы и каталоги, изменившиеся с прошлого тика; null — файла нет.
+    Первый кадр сеанса записи полный ("k": 1). Для журналов, читаемых с конца
+    (read_last_line), в кадр пишется только их последняя строка. Сжатый поток
+    сбрасывается на диск каждые FLUSH_EVERY кадров, оборванный хвост при чтении
+    пропускается.
+    """
+    FLUSH_EVERY = 60
+
+    def __init__(self, fs, archive):
+        self.fs = fs
+        self.root = fs.root
+        self.archive = archive
+        self._out = gzip.open(archive, "at", encoding="utf-8")
+        self._files = {}
+        self._dirs = {}
+        self._frame = {"t": None, "k": 1, "f": {}, "d": {}}
+        self._written = 0
+
+    def is_host(self):
+        # При записи всё нужное читается из файлов, чтобы попасть в архив
+        return False
+
+    def read(self, path):
+        try:
+            text = self.fs.read(path)
+        except OSError:
+            self._record(self._files, "f", path, None)
+            raise
+        self._record(self._files, "f", path, text)
+        return text
+
+    def read_last_line(self, path):
+        try:
+            line = self.fs.read_last_line(path)
+        except OSError:
+            self._record(self._files, "f", path, None)
+            raise
+        self._record(self._files, "f", path, line)
+        return line
+
+    def listdir(self, path):
+        try:
+            names = self.fs.listdir(path)
+        except OSError:
+            self._record(self._dirs, "d", path, None)
+            raise
+        prev = self._dirs.get(path, _MISSING)
+        current = set(names)
+        if prev is _MISSING or prev is None:
+            self._frame["d"][path] = names
+        elif prev != current:
+            added, removed = current - prev, prev - current
+            # Для больших каталогов (/proc) пишем только разницу
+            if len(added) + len(removed) < len(current):
+                self._frame["d"][path] = {"+": sorted(added), "-": sorted(removed)}
+            else:
+                self._frame["d"][path] = names
+        self._dirs[path] = current
+        return names
+
+    def _record(self, state, kind, path, value):
+        if state.get(path, _MISSING) != value:
+            state[path] = value
+            self._frame[kind][path] = value
+
+    def exists(self, path):
+        return self.fs.exists(path)
+
+    def path(self, path):
+        return self.fs.path(path)
+
+    def tick(self, timestamp):
+        if self._frame["t"] is None:
+            # Чтения до первого тика (поиск датчиков и т.п.) входят в первый кадр
+            self._frame["t"] = timestamp
+            return timestamp
+        self._write_frame()
+        self._frame = {"t": timestamp, "f": {}, "d": {}}
+        return timestamp
+
+    def _write_frame(self):
+        self._out.write(json.dumps(self._frame, separators=(",", ":")) + "\n")
+        self._written += 1
+        if self._written % self.FLUSH_EVERY == 0:
+            self._out.flush()
+
+    def close(self):
+        if self._out.closed:
+            return
+        if self._frame["t"] is not None:
+            self._write_frame()
+        self._out.close()
+        self.fs.close()
+
+
+class ReplayProcFS:
+    """
+    Файловая система из архива RecordingProcFS: каждый tick() переходит
+    к следующему кадру и возвращает записанное время замера.
+    loop=True — по окончании архив проигрывается заново со сдвигом времени,
+    иначе tick() бросает EOFError.
+    """
+    def __init__(self, archive, loop=False):
+        self.archive = archive
+        self.root = archive
+        self.loop = loop
+        self._files = {}
+        self._dirs = {}
+        self._frames = self._read_frames()
+        self._offset = 0.0
+        self._first = None
+        self._last = None
+        self._count = 0
+
+    def _read_frames(self):
+        with gzip.open(self.archive, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    yield json.loads(line)
+            except (EOFError, zlib.error, ValueError):
+                # Запись оборвалась (процесс остановлен без close) — кадры до обрыва годны
+                return
+
+    def is_host(self):
+        return False
+
+    def tick(self, timestamp=None):
+        frame = next(self._frames, None)
+        if frame is None:
+            if not self.loop or self._count < 2:
+                raise EOFError(f"Запись {self.archive} закончилась")
+            # Следующий круг начинается через средний шаг после последнего кадра
+            step = (self._last - self._first) / (self._count - 1)
+            self._offset += self._last - self._first + step
+            self._frames = self._read_frames()
+            self._first = self._last = None
+            self._count = 0
+            frame = next(self._frames)
+        if frame.get("k"):
+            self._files.clear()
+            self._dirs.clear()
+        self._files.update(frame["f"])
+        for path, names in frame["d"].items():
+            if isinstance(names, dict):
+                self._dirs[path] = (self._dirs.get(path) or set()) - set(names["-"]) | set(names["+"])
+            else:
+                self._dirs[path] = None if names is None else set(names)
+        if self._first is None:
+            self._first = frame["t"]
+        self._last = frame["t"]
+        self._count += 1
+        return frame["t"] + self._offset
+
+    def read(self, path):
+        text = self._files.get(path)
+        if text is None:
+            raise FileNotFoundError(path)
+        return text
+
+    def read_last_line(self, path):
+        lines = self.read(path).rstrip("\n").split("\n")
+        return lines[-1]
+
+    def listdir(self, path):
+        names = self._dirs.get(path)
+        if names is None:
+            raise FileNotFoundError(path)
+        return list(names)
+
+    def exists(self, path):
+        return self._files.get(path) is not None or self._dirs.get(path) is not None
+
+    def close(self):
+        self._frames.close()
+
+
+def read_last_line(path, chunk=8192):
+    """Последняя полная строка файла без чтения всего файла (attrlog smartd растёт всё время работы)"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        offset = size
+        data = b""
+        while offset > 0:
+            offset = max(0, offset - chunk)
+            f.seek(offset)
+            data = f.read(size - offset)
+            lines = data.rstrip(b"\n").split(b"\n")
+            if len(lines) > 1 or offset == 0:
+                return lines[-1].decode(errors="replace")
+        return None
+
+
+def open_fs(config):
+    """
+    Файловая система сборщика по его конфигу: fs_root — корень, относительно
+    которого читаются /proc и /sys (для стендов и бенчмарков); record — путь
+    архива, в который пишется всё прочитанное (см. ReplayCollector)
+    """
+    fs = ProcFS(root=config.get("fs_root", "/"))
+    if config.get("record"):
+        fs = RecordingProcFS(fs, config["record"])
+    return fs
+
+
+class Snapshot:
+    """
+    Снимок источников данных на один тик сбора.
+
+    Каждый файл читается не более одного раза, результаты разбора
+    кешируются, так что все _get_* работают с одними и теми же данными.
+    """
+    def __init__(self, fs):
+        self.fs = fs
+        self._text = {}
+        self._parsed = {}
+
+    def read(self, path):
+        """Содержимое файла или None, если его нет или он не читается"""
+        if path not in self._text:
+            try:
+                self._text[path] = self.fs.read(path)
+            except OSError:
+                self._text[path] = None
+        return self._text[path]
+
+    def parse(self, path, parser):
+        """Разобрать файл функцией parser (результат кешируется на тик)"""
+        key = (path, parser)
+        if key not in self._parsed:
+            text = self.read(path)
+            self._parsed[key] = parser(text) if text is not None else None
+        return self._parsed[key]
+
+    @property
+    def stat(self):
+        return self.parse("/proc/stat", parse_stat)
+
+    @property
+    def cpuinfo(self):
+        return self.parse("/proc/cpuinfo", parse_cpuinfo)
+
+
+def parse_stat(text):
+    """
+    Разбор /proc/stat: строки cpu/cpuN -> списки счётчиков,
+    остальные строки -> списки чисел (ctxt, btime, intr, procs_running, ...)
+    """
+    result = {"cpus": {}}
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        key = parts[0]
+        if key.startswith("cpu"):
+            values = list(map(int, parts[1:]))
+            if key == "cpu":
+                result["cpu"] = values
+            else:
+                result["cpus"][key] = values
+        else:
+            result[key] = [int(x) for x in parts[1:2]] if key == "intr" else list(map(int, parts[1:]))
+    return result
+
+
+def parse_cpuinfo(text):
+    """Разбор /proc/cpuinfo в список словарей — по одному на логический CPU"""
+    processors = []
+    current = {}
+    for line in text.splitlines():
+        if not line.strip():
+            if current:
+                processors.append(current)
+                current = {}
+            continue
+        if ":" in line:
+            key, value = line.split(":", 1)
+            current[key.strip()] = value.strip()
+    if current:
+        processors.append(current)
+    return processors
@@ -0,0 +1,101 @@
+"""
+Воспроизведение записанных сырых чтений /proc и /sys.
+
+Запись: CpuCollectorLinux с параметром конфига "record": "trace.jsonl.gz"
+(или python -m collectors.replay_collector record trace.jsonl.gz --duration 3600).
+Воспроизведение: ReplayCollector пропускает архив через тот же разбор, что и
+CpuCollectorLinux, с ускорением speed — история, агрегаты, поток SSE и модели
+получают данные, как с настоящего хоста.
+
+    python -m collectors.replay_collector replay trace.jsonl.gz --speed 1000
+"""
+import argparse
+import time
+
+from collectors.cpu_collector import CpuCollectorLinux
+from collectors.procfs import ReplayProcFS
+
+
+class ReplayCollector(CpuCollectorLinux):
+    """
+    Сборщик CPU, читающий кадры архива вместо /proc и /sys.
+    Конфиг: trace — путь архива, speed — ускорение относительно записи
+    (0 — без пауз), loop — проигрывать архив по кругу, interval — интервал
+    записи в секундах (по нему планировщик SystemManager задаёт темп).
+    """
+    def _open_fs(self, config):
+        return ReplayProcFS(config["trace"], loop=config.get("loop", False))
+
+    def update_config(self, config):
+        super().update_config(config)
+        self.sampling = "procfs"
+        self.speed = config.get("speed", 1000)
+        # Планировщик тикает в speed раз чаще записи
+        if self.speed:
+            self.interval = max(self.interval / self.speed, 0.001)
+
+    def replay(self, limit=None, on_sample=None):
+        """
+        Прогнать архив через sample() с ускорением speed.
+        Возвращает число замеров; останавливается в конце архива или после limit замеров.
+        """
+        count = 0
+        wall_start = trace_start = None
+        while limit is None or count < limit:
+            try:
+                sample = self.sample()
+            except EOFError:
+                break
+            timestamp = sample["timestamp"]
+            if wall_start is None:
+                wall_start, trace_start = time.monotonic(), timestamp
+            elif self.speed:
+                delay = (timestamp - trace_start) / self.speed - (time.monotonic() - wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+            if on_sample is not None:
+                on_sample(sample)
+            count += 1
+        self.flush()
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    record = sub.add_parser("record", help="записать сырые чтения CpuCollectorLinux")
+    record.add_argument("trace")
+    record.add_argument("--interval", type=float, default=1.0)
+    record.add_argument("--duration", type=float, default=60.0)
+    replay = sub.add_parser("replay", help="воспроизвести архив через ReplayCollector")
+    replay.add_argument("trace")
+    replay.add_argument("--speed", type=float, default=1000)
+    replay.add_argument("--limit", type=int)
+    replay.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        collector = CpuCollectorLinux({"record": args.trace, "interval": args.interval})
+        deadline = time.monotonic() + args.duration
+        count = 0
+        try:
+            while time.monotonic() < deadline:
+                collector.sample()
+                count += 1
+                time.sleep(args.interval)
+        finally:
+            collector.close()
+        print(f"Записано кадров: {count} -> {args.trace}")
+    else:
+        collector = ReplayCollector({"trace": args.trace, "speed": args.speed, "loop": args.loop})
+        started = time.monotonic()
+        try:
+            count = collector.replay(limit=args.limit)
+        finally:
+            collector.close()
+        elapsed = time.monotonic() - started
+        print(f"Воспроизведено замеров: {count} за {elapsed:.2f} с ({count / elapsed if elapsed else 0:.0f} замеров/с)")
+
+
+if __name__ == "__main__":
+    main()
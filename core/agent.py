@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import platform
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zlib
+
+from core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class Spool:
+    """
+    Неотправленные пачки на локальном диске: файл на пачку, имя начинается
+    со времени создания, поэтому пачки уходят в порядке сбора. Суммарный
+    размер ограничен max_bytes: при переполнении удаляются самые старые.
+    """
+    SUFFIX = ".batch"
+
+    def __init__(self, path, max_bytes=256 << 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+        # Недописанные файлы прошлого запуска (процесс остановлен посреди записи)
+        for name in os.listdir(path):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(path, name))
+
+    def put(self, batch_id, payload):
+        name = f"{time.time_ns():020d}-{batch_id.replace(':', '_')}{self.SUFFIX}"
+        tmp = os.path.join(self.path, name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, os.path.join(self.path, name))
+        return self._enforce_limit()
+
+    def _enforce_limit(self):
+        """Удалить самые старые пачки сверх max_bytes; возвращает число удалённых"""
+        pending = self.pending()
+        sizes = [os.path.getsize(os.path.join(self.path, name)) for name in pending]
+        total, dropped = sum(sizes), 0
+        for name, size in zip(pending, sizes):
+            if total <= self.max_bytes or len(pending) - dropped <= 1:
+                break
+            self.remove(name)
+            total -= size
+            dropped += 1
+        return dropped
+
+    def pending(self):
+        return sorted(name for name in os.listdir(self.path) if name.endswith(self.SUFFIX))
+
+    def read(self, name):
+        with open(os.path.join(self.path, name), "rb") as f:
+            return f.read()
+
+    def remove(self, name):
+        try:
+            os.remove(os.path.join(self.path, name))
+        except FileNotFoundError:
+            pass
+
+    def nbytes(self):
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in self.pending())
+
+    def __len__(self):
+        return len(self.pending())
+
+
+class AgentPusher:
+    """
+    Отправка замеров на центральный сервер (POST /api/ingest).
+
+    Замеры всех сборщиков забираются из SampleBroadcaster и раз в
+    batch_interval секунд собираются в пачку: кадр на сборщик (общий список
+    полей и строки значений), JSON сжимается zlib. Каждая пачка сначала
+    ложится в Spool и удаляется только после подтверждения сервера, поэтому
+    при недоступности сервера и при перезапуске агента ничего не теряется.
+    Идентификатор пачки "<host>:<запуск>:<номер>" — сервер отбрасывает повторы.
+    Ответы 429/503 (сервер перегружен) и сетевые ошибки — пауза с учётом
+    Retry-After и экспоненциальным ростом до max_backoff.
+    """
+    def __init__(self, manager, server, host=None, batch_interval=10, spool_dir="storage/spool",
+                 spool_max_bytes=256 << 20, timeout=10, token=None, compress_level=6, max_backoff=300,
+                 queue_size=100000):
+        self.manager = manager
+        self.url = server.rstrip("/") + "/api/ingest"
+        self.host = host or platform.node()
+        self.batch_interval = batch_interval
+        self.spool = Spool(spool_dir, spool_max_bytes)
+        self.timeout = timeout
+        self.token = token
+        self.compress_level = compress_level
+        self.max_backoff = max_backoff
+        self.queue_size = queue_size
+        self.run_id = uuid.uuid4().hex[:12]
+        self.stats = {"batches": 0, "samples": 0, "sent": 0, "duplicates": 0, "rejected": 0,
+                      "retries": 0, "spool_dropped": 0, "queue_dropped": 0, "last_error": None}
+        self._seq = 0
+        self._retry_at = 0.0
+        self._backoff = 0.0
+        self._sub = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Подписка до запуска сбора: первые замеры тоже попадут в пачку
+        self._sub = self.manager.broadcaster.subscribe(maxsize=self.queue_size)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="agent-pusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Остановить отправку: собрать последнюю пачку и один раз попробовать отправить очередь"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._make_batch()
+        self._retry_at = 0.0
+        self.send_pending()
+        if self._sub is not None:
+            self.manager.broadcaster.unsubscribe(self._sub)
+
+    def _loop(self):
+        while not self._stop.wait(self.batch_interval):
+            try:
+                self._make_batch()
+                self.send_pending()
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logger.exception("Ошибка отправки замеров")
+
+    def _make_batch(self):
+        """Забрать накопившиеся замеры и положить пачку в очередь на отправку"""
+        items = self._sub.get(timeout=0) if self._sub is not None else []
+        dropped = self._sub.take_dropped() if self._sub is not None else 0
+        self.stats["queue_dropped"] += dropped
+        if not items:
+            return None
+        frames = []
+        last = {}  # сборщик -> его последний кадр
+        for name, sample in items:
+            fields = list(sample)
+            frame = last.get(name)
+            if frame is None or frame["fields"] != fields:
+                frame = last[name] = {"collector": name, "fields": fields, "rows": []}
+                frames.append(frame)
+            frame["rows"].append(list(sample.values()))
+        self._seq += 1
+        batch_id = f"{self.host}:{self.run_id}:{self._seq}"
+        batch = {"batch_id": batch_id, "host": self.host, "run": self.run_id, "seq": self._seq,
+                 "created": time.time(), "dropped": dropped, "frames": frames}
+        payload = zlib.compress(json.dumps(batch, separators=(",", ":")).encode(), self.compress_level)
+        spool_dropped = self.spool.put(batch_id, payload)
+        if spool_dropped:
+            self.stats["spool_dropped"] += spool_dropped
+            REGISTRY.inc("agent_batches_total", spool_dropped, result="spool_dropped")
+            logger.warning("Очередь отправки переполнена (%d байт): удалено старых пачек: %d",
+                           self.spool.max_bytes, spool_dropped)
+        self.stats["batches"] += 1
+        self.stats["samples"] += len(items)
+        return batch_id
+
+    def send_pending(self):
+        """Отправить пачки из очереди по порядку; при отказе сервера — остановиться до паузы"""
+        sent = 0
+        for name in self.spool.pending():
+            if time.monotonic() < self._retry_at:
+                break
+            try:
+                payload = self.spool.read(name)
+            except FileNotFoundError:
+                continue
+            status, retry_after = self._post(payload)
+            if status in (200, 202):
+                self.spool.remove(name)
+                self._backoff = 0.0
+                sent += 1
+                continue
+            if status in (400, 413):
+                # Пачку сервер не примет никогда (повреждена или слишком большая) — не повторяем
+                self.spool.remove(name)
+                self.stats["rejected"] += 1
+                REGISTRY.inc("agent_batches_total", result="rejected")
+                logger.error("Сервер отклонил пачку %s: HTTP %s", name, status)
+                continue
+            self._schedule_retry(retry_after)
+            break
+        return sent
+
+    def _schedule_retry(self, retry_after):
+        self.stats["retries"] += 1
+        REGISTRY.inc("agent_batches_total", result="retry")
+        self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff)
+        delay = retry_after if retry_after is not None else self._backoff
+        # Случайная добавка: тысячи агентов не должны возвращаться к серверу одновременно
+        self._retry_at = time.monotonic() + delay * random.uniform(1.0, 1.5)
+
+    def _post(self, payload):
+        """POST пачки; (HTTP-статус или None при сетевой ошибке, Retry-After в секундах или None)"""
+        headers = {"Content-Type": "application/json", "Content-Encoding": "deflate"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(self.url, data=payload, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.loads(response.read() or b"{}")
+                if body.get("status") == "duplicate":
+                    # Сервер уже принял эту пачку раньше (ответ на прошлую отправку потерялся)
+                    self.stats["duplicates"] += 1
+                else:
+                    self.stats["sent"] += 1
+                REGISTRY.inc("agent_batches_total", result=body.get("status", "ok"))
+                self.stats["last_error"] = None
+                return response.status, None
+        except urllib.error.HTTPError as e:
+            self.stats["last_error"] = f"HTTP {e.code}"
+            return e.code, _parse_retry_after(e.headers.get("Retry-After"))
+        except (urllib.error.URLError, OSError) as e:
+            self.stats["last_error"] = str(e)
+            logger.warning("Сервер %s недоступен: %s", self.url, e)
+            return None, None
+
+
+def _parse_retry_after(value):
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -4,6 +4,9 @@ import json, os
 from collectors import DICT_COLLECTORS
 from models import DICT_MODELS
 
+# Сборщики, включённые в новом конфиге; остальные (smart, events) читают журналы
+# системы и файлы smartd — их включают явно в enabled_collectors и collectors
+DEFAULT_COLLECTORS = ("cpu",)
 
 def save_config(config, path):
     with open(path, "w") as f:
@@ -14,7 +17,7 @@ def load_config(path):
         with open(path, "r") as f:
             return json.load(f)
     system = platform.system()
-    enabled_collectors = list(DICT_COLLECTORS.get(system, {}).keys())
+    enabled_collectors = [c for c in DICT_COLLECTORS.get(system, {}).keys() if c in DEFAULT_COLLECTORS]
     
     config = {"system": system, "enabled_collectors": enabled_collectors}
     config["collectors"] = {c: {} for c in enabled_collectors}
@@ -38,6 +41,10 @@ class ConfigManager:
         configs = self.get_collectors()
         return configs.get(name, {})
     
+    def get_enabled_collectors(self):
+        """Список включённых сборщиков (None — ключ не задан, включены все)"""
+        return self.config.get("enabled_collectors")
+
     def get_collectors(self):
         return self.config.get("collectors", {})
 
@@ -0,0 +1,1040 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from core.registry import LazyModule
+
+pd = LazyModule("pandas")  # нужен только для чтения в DataFrame и импорта CSV
+logger = logging.getLogger(__name__)
+
+# Значение-пропуск для целочисленных колонок (для float используется NaN)
+INT_NA = np.iinfo(np.int64).min
+
+DTYPES = {"f8": np.float64, "i8": np.int64}
+
+
+class TimeSeriesStore:
+    """
+    Колоночное append-only хранилище временного ряда.
+
+    Данные лежат в каталоге path:
+        index.json            — схема колонок и список сегментов
+        seg_000001/<col>.f8   — значения колонки подряд (raw little-endian)
+
+    Каждый сегмент хранит не более segment_rows строк, отсортированных по
+    timestamp; в индексе для сегмента записаны число строк и ts_min/ts_max,
+    по ним при чтении отбрасываются лишние сегменты, а внутри сегмента
+    границы ищутся бинарным поиском. Файлы колонок читаются через memmap,
+    так что диапазон внутри одного сегмента возвращается без копирования.
+
+    Точка фиксации — число строк в index.json: всё, что записано в файлы
+    колонок сверх него (оборванная запись), обрезается при открытии и после
+    неудачной записи. index.json заменяется атомарно и всегда сбрасывается на
+    диск до замены; файлы колонок — только в sync(), поэтому после сбоя питания
+    сегмент, файлы которого короче индекса, укорачивается до уцелевших строк.
+    """
+    def __init__(self, path, segment_rows=65536, max_maps=256):
+        self.path = path
+        self.segment_rows = segment_rows
+        self.max_maps = max_maps
+        self._lock = threading.RLock()
+        # (id сегмента, колонка) -> memmap закрытого сегмента; каждый держит дескриптор,
+        # поэтому кеш ограничен
+        self._maps = OrderedDict()
+        # Открытые на дозапись файлы колонок текущего сегмента
+        self._handles = {}
+        os.makedirs(path, exist_ok=True)
+        self._index_path = os.path.join(path, "index.json")
+        self._load_index()
+
+    # --- Индекс ---
+    def _load_index(self):
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r") as f:
+                self.index = json.load(f)
+        else:
+            self.index = {"columns": {}, "segments": []}
+        self._repair_tail()
+
+    def _save_index(self):
+        # Данные колонок должны попасть в файлы раньше, чем индекс их зафиксирует
+        for f in self._handles.values():
+            f.flush()
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f)
+            # Без fsync до rename после сбоя питания index.json может оказаться пустым
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._index_path)
+
+    def sync(self):
+        """Сбросить записанное на диск (fsync файлов колонок, индекса и каталогов)"""
+        with self._lock:
+            for f in self._handles.values():
+                f.flush()
+                os.fsync(f.fileno())
+            self._save_index()
+            # Записи каталогов: замена index.json и новые сегменты и файлы колонок
+            dirs = {self.path} | {self._segment_dir(seg_id) for seg_id, _ in self._handles}
+            for path in dirs:
+                _fsync_dir(path)
+
+    def _rollback(self):
+        """Вернуться к последнему зафиксированному индексу после неудачной записи"""
+        for f in self._handles.values():
+            try:
+                f.close()
+            except OSError:
+                pass
+        self._handles.clear()
+        self._maps.clear()
+        self._load_index()
+
+    def close(self):
+        with self._lock:
+            for f in self._handles.values():
+                f.close()
+            self._handles.clear()
+
+    def _repair_tail(self):
+        """
+        Обрезать незафиксированный хвост последнего сегмента. Сегмент, файлы
+        которого короче индекса (индекс пережил сбой питания, данные — нет),
+        укорачивается до строк, которые есть во всех колонках.
+        """
+        changed = False
+        for i, seg in enumerate(self.index["segments"]):
+            last = i == len(self.index["segments"]) - 1
+            rows = seg["rows"]
+            for name in seg["columns"]:
+                path = self._column_path(seg["id"], name)
+                itemsize = np.dtype(self.dtype(name)).itemsize
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                rows = min(rows, size // itemsize)
+                if last and size > seg["rows"] * itemsize:
+                    logger.warning("Обрезан незафиксированный хвост %s", path)
+                    with open(path, "r+b") as f:
+                        f.truncate(seg["rows"] * itemsize)
+            if rows < seg["rows"]:
+                logger.warning("Сегмент %s: в файлах %d строк из %d, остальные потеряны",
+                               self._segment_dir(seg["id"]), rows, seg["rows"])
+                for name in seg["columns"]:
+                    path = self._column_path(seg["id"], name)
+                    with open(path, "ab") as f:
+                        f.truncate(rows * np.dtype(self.dtype(name)).itemsize)
+                seg["rows"] = rows
+                ts = np.fromfile(self._column_path(seg["id"], "timestamp"), dtype=np.float64, count=rows) \
+                    if rows else None
+                seg["ts_min"] = float(ts[0]) if rows else None
+                seg["ts_max"] = float(ts[-1]) if rows else None
+                changed = True
+        if changed:
+            self._save_index()
+
+    @property
+    def columns(self):
+        return list(self.index["columns"])
+
+    def dtype(self, name):
+        return DTYPES[self.index["columns"][name]]
+
+    def __len__(self):
+        return sum(seg["rows"] for seg in self.index["segments"])
+
+    def _segment_dir(self, seg_id):
+        return os.path.join(self.path, f"seg_{seg_id:06d}")
+
+    def _column_path(self, seg_id, name):
+        return os.path.join(self._segment_dir(seg_id), f"{name}.{self.index['columns'][name]}")
+
+    # --- Запись ---
+    def append(self, rows):
+        """
+        Дописать строки. rows — словарь колонка -> значение или список значений
+        (одинаковой длины); обязательна колонка timestamp.
+        """
+        rows = {k: v if isinstance(v, (list, tuple, np.ndarray)) else [v] for k, v in rows.items()}
+        n = len(rows["timestamp"])
+        if n == 0:
+            return
+        with self._lock:
+            try:
+                arrays = {name: self._to_array(name, values) for name, values in rows.items()}
+                order = np.argsort(arrays["timestamp"], kind="stable")
+                if np.any(order != np.arange(n)):
+                    arrays = {name: arr[order] for name, arr in arrays.items()}
+                pos = 0
+                while pos < n:
+                    seg = self._writable_segment(arrays["timestamp"][pos])
+                    take = min(n - pos, self.segment_rows - seg["rows"])
+                    self._write_segment(seg, {name: arr[pos:pos + take] for name, arr in arrays.items()})
+                    pos += take
+                self._save_index()
+            except Exception:
+                # Ни индекс в памяти, ни файлы не должны хранить часть неудавшейся записи:
+                # повторная запись тех же строк (BufferedWriter) иначе легла бы после мусора
+                self._rollback()
+                raise
+
+    def _to_array(self, name, values):
+        if name not in self.index["columns"]:
+            arr = np.asarray([np.nan if v is None else v for v in values] if not isinstance(values, np.ndarray) else values)
+            if arr.dtype.kind in "iub" and name != "timestamp":
+                self.index["columns"][name] = "i8"
+            elif arr.dtype.kind in "iubf":
+                self.index["columns"][name] = "f8"
+            else:
+                raise ValueError(f"Колонка {name}: поддерживаются только числовые значения")
+        dtype = self.dtype(name)
+        if isinstance(values, np.ndarray):
+            if dtype is np.int64 and values.dtype.kind == "f":
+                return np.where(np.isnan(values), INT_NA, values).astype(np.int64)
+            return values.astype(dtype, copy=False)
+        na = INT_NA if dtype is np.int64 else np.nan
+        return np.asarray([na if v is None or v != v else v for v in values], dtype=dtype)
+
+    def _writable_segment(self, first_ts):
+        segments = self.index["segments"]
+        if segments:
+            seg = segments[-1]
+            # Сегмент должен оставаться отсортированным по времени
+            if seg["rows"] < self.segment_rows and (seg["ts_max"] is None or first_ts >= seg["ts_max"]):
+                return seg
+        seg_id = segments[-1]["id"] + 1 if segments else 1
+        seg = {"id": seg_id, "rows": 0, "ts_min": None, "ts_max": None, "columns": []}
+        # Каталог мог остаться от записи, которая не дошла до индекса
+        shutil.rmtree(self._segment_dir(seg_id), ignore_errors=True)
+        os.makedirs(self._segment_dir(seg_id))
+        segments.append(seg)
+        return seg
+
+    def _write_segment(self, seg, arrays):
+        n = len(arrays["timestamp"])
+        for name in self.index["columns"]:
+            dtype = self.dtype(name)
+            if name not in seg["columns"]:
+                if name not in arrays:
+                    continue
+                # Новая колонка: дополняем пропусками уже записанные строки сегмента
+                # (файл от незафиксированной записи начинается заново)
+                open(self._column_path(seg["id"], name), "wb").close()
+                self._write_column(seg["id"], name, _na_array(dtype, seg["rows"]))
+                seg["columns"].append(name)
+            values = arrays.get(name)
+            if values is None:
+                values = _na_array(dtype, n)
+            self._write_column(seg["id"], name, values)
+        ts = arrays["timestamp"]
+        seg["ts_min"] = float(ts[0]) if seg["ts_min"] is None else seg["ts_min"]
+        seg["ts_max"] = float(ts[-1])
+        seg["rows"] += n
+
+    def _write_column(self, seg_id, name, values):
+        if not len(values):
+            return
+        f = self._handles.get((seg_id, name))
+        if f is None:
+            # Дописываем только в последний сегмент: файлы предыдущих больше не нужны
+            for key in [k for k in self._handles if k[0] != seg_id]:
+                self._handles.pop(key).close()
+            f = self._handles[(seg_id, name)] = open(self._column_path(seg_id, name), "ab")
+        f.write(np.ascontiguousarray(values).tobytes())
+
+    # --- Чтение ---
+    def _column(self, seg, name, sealed):
+        """Колонка сегмента как массив (memmap), пропуски — если колонки в сегменте нет"""
+        dtype = self.dtype(name)
+        if name not in seg["columns"] or seg["rows"] == 0:
+            return _na_array(dtype, seg["rows"])
+        key = (seg["id"], name)
+        with self._lock:
+            if sealed and key in self._maps:
+                self._maps.move_to_end(key)
+                return self._maps[key]
+        arr = np.memmap(self._column_path(seg["id"], name), dtype=dtype, mode="r", shape=(seg["rows"],))
+        if sealed:
+            with self._lock:
+                self._maps[key] = arr
+                if len(self._maps) > self.max_maps:
+                    self._maps.popitem(last=False)
+        return arr
+
+    def _segments_snapshot(self, columns):
+        with self._lock:
+            segments = [dict(seg) for seg in self.index["segments"]]
+            columns = self.columns if columns is None else [c for c in columns if c in self.index["columns"]]
+        if "timestamp" not in columns and self.index["columns"]:
+            columns = ["timestamp"] + list(columns)
+        return segments, columns
+
+    def _read_segment(self, seg, sealed, start, end, columns):
+        """Строки одного сегмента в диапазоне [start, end] или None"""
+        if seg["rows"] == 0:
+            return None
+        if start is not None and seg["ts_max"] < start:
+            return None
+        if end is not None and seg["ts_min"] > end:
+            return None
+        try:
+            ts = self._column(seg, "timestamp", sealed)
+            lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+            hi = seg["rows"] if end is None else int(np.searchsorted(ts, end, side="right"))
+            if lo >= hi:
+                return None
+            return {name: self._column(seg, name, sealed)[lo:hi] for name in columns}
+        except FileNotFoundError:
+            # Сегмент удалён политикой хранения во время чтения
+            return None
+
+    def read(self, start=None, end=None, columns=None):
+        """
+        Прочитать строки с start <= timestamp <= end.
+        Возвращает словарь колонка -> numpy-массив; если диапазон попал
+        в один сегмент, массивы — представления memmap без копирования.
+        """
+        segments, columns = self._segments_snapshot(columns)
+        parts = {name: [] for name in columns}
+        for seg in segments:
+            chunk = self._read_segment(seg, seg is not segments[-1], start, end, columns)
+            if chunk is not None:
+                for name in columns:
+                    parts[name].append(chunk[name])
+        return {
+            name: (chunks[0] if len(chunks) == 1 else
+                   np.concatenate(chunks) if chunks else np.empty(0, dtype=self.dtype(name)))
+            for name, chunks in parts.items()
+        }
+
+    def iter_chunks(self, start=None, columns=None):
+        """Чтение по сегментам — для обработки истории, которая не помещается в память"""
+        segments, columns = self._segments_snapshot(columns)
+        for seg in segments:
+            chunk = self._read_segment(seg, seg is not segments[-1], start, None, columns)
+            if chunk is not None:
+                yield chunk
+
+    def to_frame(self, start=None, end=None, columns=None):
+        """То же, что read, но в виде DataFrame; целочисленные пропуски становятся NaN"""
+        data = self.read(start, end, columns)
+        frame = {}
+        for name, arr in data.items():
+            if arr.dtype == np.int64 and np.any(arr == INT_NA):
+                arr = np.where(arr == INT_NA, np.nan, arr)
+            frame[name] = np.asarray(arr)
+        return pd.DataFrame(frame)
+
+    def first_timestamp(self):
+        with self._lock:
+            for seg in self.index["segments"]:
+                if seg["rows"]:
+                    return seg["ts_min"]
+        return None
+
+    def last_timestamp(self):
+        with self._lock:
+            segments = self.index["segments"]
+            return segments[-1]["ts_max"] if segments else None
+
+    # --- Хранение ---
+    def drop_before(self, ts):
+        """Удалить закрытые сегменты, целиком лежащие раньше ts; возвращает число удалённых строк"""
+        with self._lock:
+            segments = self.index["segments"]
+            drop = [seg for seg in segments[:-1] if seg["ts_max"] is not None and seg["ts_max"] < ts]
+            if not drop:
+                return 0
+            ids = {seg["id"] for seg in drop}
+            self.index["segments"] = [seg for seg in segments if seg["id"] not in ids]
+            self._save_index()
+            for key in [k for k in self._maps if k[0] in ids]:
+                del self._maps[key]
+        for seg in drop:
+            shutil.rmtree(self._segment_dir(seg["id"]), ignore_errors=True)
+        return sum(seg["rows"] for seg in drop)
+
+    # --- Импорт ---
+    def import_csv(self, csv_path, chunksize=100000):
+        """Перенести числовые колонки из CSV старого формата"""
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            numeric = chunk.select_dtypes(include="number")
+            if "timestamp" not in numeric.columns:
+                continue
+            self.append({name: numeric[name].to_numpy() for name in numeric.columns})
+
+
+def _fsync_dir(path):
+    """fsync каталога: без него переименование и новые файлы могут не пережить сбой питания"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Windows: каталоги так не открываются
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _na_array(dtype, n):
+    return np.full(n, INT_NA if dtype is np.int64 else np.nan, dtype=dtype)
+
+
+# Уровни агрегатов: имя -> ширина корзины в секундах
+ROLLUP_TIERS = {"1m": 60, "1h": 3600, "1d": 86400}
+ROLLUP_AGGS = ("min", "max", "mean", "sum", "last")
+# Сколько хранить данные каждого уровня (None — без ограничения)
+DEFAULT_RETENTION = {"raw": "30d", "1m": "365d", "1h": None, "1d": None}
+RETENTION_CHECK_INTERVAL = 60
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_duration(value):
+    """Длительность в секундах из числа или строки вида "90s", "15m", "7d" (None — без ограничения)"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    value = value.strip().lower()
+    if value[-1] in _DURATION_UNITS:
+        return float(value[:-1]) * _DURATION_UNITS[value[-1]]
+    return float(value)
+
+
+class RollupTier:
+    """
+    Агрегаты min/max/mean/sum/last/count по корзинам фиксированной ширины
+    (для длинных таблиц — отдельно по каждому значению колонки key).
+
+    Текущая (незакрытая) корзина живёт в памяти и записывается в хранилище
+    уровня, как только приходит отсчёт из более поздней корзины.
+    """
+    def __init__(self, name, resolution, path, key=None, segment_rows=65536):
+        self.name = name
+        self.resolution = resolution
+        self.key = key
+        self.store = TimeSeriesStore(path, segment_rows=segment_rows)
+        self._open = None  # частичные агрегаты текущей корзины (по строке на ключ)
+
+    def add(self, data):
+        """Учесть отсчёты data (колонка -> массив)"""
+        partials = self._partials(data)
+        if partials is None:
+            return
+        if self._open is not None:
+            partials = {k: np.concatenate([self._open.get(k, _nan_like(self._open["timestamp"])),
+                                           partials.get(k, _nan_like(partials["timestamp"]))])
+                        for k in set(self._open) | set(partials)}
+        groups = self._combine(partials)
+        current = groups["timestamp"] == groups["timestamp"][-1]
+        if not current.all():
+            self.store.append(_finalize_groups({k: v[~current] for k, v in groups.items()}))
+        self._open = {k: v[current] for k, v in groups.items()}
+
+    def _partials(self, data):
+        """Каждая строка как частичный агрегат своей корзины"""
+        ts = np.asarray(data["timestamp"], dtype=np.float64)
+        if len(ts) == 0:
+            return None
+        partials = {"timestamp": np.floor(ts / self.resolution) * self.resolution,
+                    "count": np.ones(len(ts))}
+        for name, values in data.items():
+            if name == "timestamp":
+                continue
+            v = np.asarray(values)
+            v = np.where(v == INT_NA, np.nan, v).astype(np.float64) if v.dtype == np.int64 else v.astype(np.float64)
+            if name == self.key:
+                partials[name] = v
+                continue
+            valid = ~np.isnan(v)
+            partials[f"{name}__sum"] = np.where(valid, v, 0.0)
+            partials[f"{name}__n"] = valid.astype(np.float64)
+            partials[f"{name}__min"] = v
+            partials[f"{name}__max"] = v
+            partials[f"{name}__last"] = v
+        return partials
+
+    def _combine(self, partials):
+        """Свести частичные агрегаты с одинаковыми (корзина, ключ) в одну строку"""
+        order_keys = (partials[self.key], partials["timestamp"]) if self.key else (partials["timestamp"],)
+        order = np.lexsort(order_keys)  # устойчивая сортировка: более поздние строки остаются позже
+        partials = {k: v[order] for k, v in partials.items()}
+        change = partials["timestamp"][1:] != partials["timestamp"][:-1]
+        if self.key:
+            change |= partials[self.key][1:] != partials[self.key][:-1]
+        starts = np.flatnonzero(np.r_[True, change])
+        ends = np.r_[starts[1:], len(partials["timestamp"])]
+        groups = {}
+        for k, v in partials.items():
+            if k == "timestamp" or k == self.key:
+                groups[k] = v[starts]
+            elif k == "count" or k.endswith(("__sum", "__n")):
+                groups[k] = np.add.reduceat(np.nan_to_num(v), starts)
+            elif k.endswith("__min"):
+                groups[k] = np.fmin.reduceat(v, starts)
+            elif k.endswith("__max"):
+                groups[k] = np.fmax.reduceat(v, starts)
+            else:  # last
+                groups[k] = v[ends - 1]
+        return groups
+
+    def open_row(self):
+        """Агрегаты текущей незакрытой корзины (или None)"""
+        return _finalize_groups(self._open) if self._open is not None else None
+
+
+def _nan_like(ts):
+    return np.full(len(ts), np.nan)
+
+
+def _finalize_groups(groups):
+    """Внутренние sum/n -> mean и sum (NaN, если в корзине не было значений); остальные агрегаты как есть"""
+    result = {}
+    for key, values in groups.items():
+        if key.endswith("__sum"):
+            name = key[:-len("__sum")]
+            n = groups[f"{name}__n"]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[f"{name}__mean"] = np.where(n > 0, values / n, np.nan)
+            result[key] = np.where(n > 0, values, np.nan)
+        elif not key.endswith("__n"):
+            result[key] = values
+    return result
+
+
+class TieredStore:
+    """
+    Исходный ряд и его агрегаты на нескольких уровнях (1m / 1h / 1d).
+
+    Агрегаты обновляются при каждой записи; у каждого уровня (и у исходных
+    данных, "raw") своя политика хранения. query() сама выбирает самый
+    грубый уровень, которого хватает для запрошенного числа точек.
+
+    key — колонка-идентификатор объекта для длинных таблиц (например, номер
+    ядра): агрегаты считаются отдельно по каждому объекту.
+    """
+    def __init__(self, path, tiers=None, retention=None, segment_rows=65536, key=None):
+        self.key = key
+        self.raw = TimeSeriesStore(path, segment_rows=segment_rows)
+        tiers = ROLLUP_TIERS if tiers is None else tiers
+        self.tiers = [RollupTier(name, parse_duration(res), os.path.join(path, f"rollup_{name}"), key=key)
+                      for name, res in sorted(tiers.items(), key=lambda item: parse_duration(item[1]))]
+        retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self.retention = {name: parse_duration(value) for name, value in retention.items()}
+        self._lock = threading.RLock()
+        self._last_retention_check = 0
+        self._recover_open_buckets()
+
+    def _recover_open_buckets(self):
+        """Восстановить незакрытые корзины (и пропущенные после сбоя) по исходным данным"""
+        for tier in self.tiers:
+            last = tier.store.last_timestamp()
+            start = last + tier.resolution if last is not None else None
+            for chunk in self.raw.iter_chunks(start=start):
+                tier.add(chunk)
+
+    # --- Совместимость с TimeSeriesStore ---
+    @property
+    def columns(self):
+        return self.raw.columns
+
+    def __len__(self):
+        return len(self.raw)
+
+    def read(self, start=None, end=None, columns=None):
+        return self.raw.read(start, end, columns)
+
+    def to_frame(self, start=None, end=None, columns=None):
+        return self.raw.to_frame(start, end, columns)
+
+    def first_timestamp(self):
+        return self.raw.first_timestamp()
+
+    def last_timestamp(self):
+        return self.raw.last_timestamp()
+
+    import_csv = TimeSeriesStore.import_csv
+
+    # --- Запись ---
+    def append(self, rows):
+        with self._lock:
+            self.raw.append(rows)
+            data = {k: v if isinstance(v, (list, tuple, np.ndarray)) else [v] for k, v in rows.items()}
+            data = {k: np.asarray([np.nan if x is None else x for x in v], dtype=np.float64)
+                    if not isinstance(v, np.ndarray) else v for k, v in data.items()}
+            order = np.argsort(data["timestamp"], kind="stable")
+            data = {k: v[order] for k, v in data.items()}
+            for tier in self.tiers:
+                tier.add(data)
+            self.enforce_retention()
+
+    def sync(self):
+        for store in [self.raw] + [tier.store for tier in self.tiers]:
+            store.sync()
+
+    def close(self):
+        for store in [self.raw] + [tier.store for tier in self.tiers]:
+            store.close()
+
+    def enforce_retention(self, now=None, force=False):
+        """Удалить устаревшие данные (проверяется не чаще раза в RETENTION_CHECK_INTERVAL секунд)"""
+        now = time.time() if now is None else now
+        if not force and now - self._last_retention_check < RETENTION_CHECK_INTERVAL:
+            return
+        self._last_retention_check = now
+        stores = [("raw", self.raw)] + [(tier.name, tier.store) for tier in self.tiers]
+        for name, store in stores:
+            keep = self.retention.get(name)
+            if keep is not None:
+                dropped = store.drop_before(now - keep)
+                if dropped:
+                    logger.info("Хранение %s (%s): удалено строк %d", self.raw.path, name, dropped)
+
+    # --- Чтение ---
+    def choose_tier(self, start, end, max_points):
+        """Самый грубый уровень с корзиной не шире (end - start) / max_points, покрывающий start"""
+        first = self.raw.first_timestamp()
+        # Самые старые данные могут остаться только в агрегатах. Начало корзины округлено вниз,
+        # поэтому уровень считается более старым, только если его первая корзина целиком раньше first
+        known = [first] if first is not None else []
+        for tier in self.tiers:
+            tier_first = tier.store.first_timestamp()
+            if tier_first is not None and (first is None or tier_first + tier.resolution <= first):
+                known.append(tier_first)
+        if not known or not max_points:
+            return None
+        start = min(known) if start is None else max(start, min(known))
+        end = self.raw.last_timestamp() if end is None else end
+        if end is None or end <= start:
+            return None
+        needed = (end - start) / max_points
+        candidates = [tier for tier in self.tiers if tier.resolution <= needed]
+        if candidates:
+            return candidates[-1]
+        if first is not None and start < first:
+            # Исходные данные за начало диапазона уже удалены — берём самый подробный из уровней
+            for tier in self.tiers:
+                tier_first = tier.store.first_timestamp()
+                if tier_first is not None and tier_first <= start:
+                    return tier
+        return None
+
+    def query(self, start=None, end=None, columns=None, max_points=None, agg="mean", keys=None):
+        """
+        DataFrame за [start, end]: из исходных данных или из подходящего уровня
+        агрегатов (значения — агрегат agg, timestamp — начало корзины).
+        keys — оставить только строки этих объектов (для хранилища с key).
+        """
+        names = self.raw.columns if columns is None else list(columns)
+        names = [c for c in names if c not in ("timestamp", self.key)]
+        key_columns = [self.key] if self.key else []
+        tier = self.choose_tier(start, end, max_points)
+        if tier is None:
+            df = self.raw.to_frame(start, end, key_columns + names)
+        else:
+            tier_columns = key_columns + [f"{c}__{agg}" for c in names]
+            # Корзина, содержащая start, тоже нужна
+            bucket_start = None if start is None else np.floor(start / tier.resolution) * tier.resolution
+            df = tier.store.to_frame(bucket_start, end, tier_columns)
+            with self._lock:
+                open_row = tier.open_row()
+            if open_row is not None and (end is None or open_row["timestamp"][0] <= end):
+                n = len(open_row["timestamp"])
+                tail = pd.DataFrame({c: open_row.get(c, np.full(n, np.nan)) for c in ["timestamp"] + tier_columns})
+                df = pd.concat([df, tail], ignore_index=True) if not df.empty else tail
+            df = df.rename(columns={f"{c}__{agg}": c for c in names})
+        if self.key and keys is not None and self.key in df.columns:
+            df = df[df[self.key].isin(list(keys))].reset_index(drop=True)
+        return df[[c for c in ["timestamp"] + key_columns + names if c in df.columns]]
+
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class BufferedWriter:
+    """
+    Буфер записи поверх хранилища (group commit).
+
+    Замеры копятся в памяти и записываются одной пачкой, когда набралось
+    max_rows строк или самому старому замеру исполнилось max_delay секунд
+    (проверяется при записи и в flush_due(), который вызывает планировщик).
+    fsync журнала и хранилища: "always" — после каждого замера и каждой пачки,
+    "interval" — не чаще раза в fsync_interval секунд, "never" — на усмотрение ОС.
+
+    Каждый замер сначала дописывается строкой в журнал (journal.jsonl) —
+    одна короткая запись вместо записи всех колонок и индекса; после падения
+    процесса незаписанный хвост восстанавливается из журнала при открытии
+    (кроме строк не новее последней в хранилище: их пачка успела записаться).
+    Журнал очищается только после успешной записи: если хранилище не приняло
+    пачку из-за ошибки ввода-вывода (нет места, EIO), замеры остаются в буфере
+    и журнале до следующей попытки; отбрасываются только замеры, которые
+    хранилище отвергает сами по себе (например, нечисловое значение).
+    Чтение буфер не сбрасывает: к данным хранилища добавляются ещё не
+    записанные замеры из памяти.
+    """
+    def __init__(self, store, max_rows=64, max_delay=5.0, fsync="interval", fsync_interval=30.0, journal=True):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync: ожидается одно из {FSYNC_POLICIES}, получено {fsync!r}")
+        self.store = store
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        self._rows = []
+        self._pending = 0
+        self._first_time = None
+        self._last_sync = self._journal_synced = time.monotonic()
+        self._journal_dirty = False
+        # Прошлая запись упала с ошибкой ввода-вывода: часть пачки могла записаться
+        self._retry = False
+        # Растёт перед каждой записью пачки: по нему чтение узнаёт, что буфер ушёл в хранилище
+        self._version = 0
+        self._journal = None
+        if journal:
+            path = store.raw.path if hasattr(store, "raw") else store.path
+            self._journal_path = os.path.join(path, "journal.jsonl")
+            self._replay_journal()
+            self._journal = open(self._journal_path, "a")
+
+    def _replay_journal(self):
+        if not os.path.exists(self._journal_path):
+            return
+        last = self.store.last_timestamp()
+        skipped = 0
+        with open(self._journal_path, "r") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # Оборванная последняя строка
+                    continue
+                # Процесс упал после записи пачки в хранилище, но до очистки журнала
+                row, dropped = _rows_after(row, last)
+                skipped += dropped
+                if row is not None:
+                    self._rows.append(row)
+        if skipped:
+            logger.info("Журнал %s: пропущено уже записанных замеров: %d", self._journal_path, skipped)
+        if self._rows:
+            logger.info("Восстановлено из журнала %s: %d замеров", self._journal_path, len(self._rows))
+            self._pending = sum(_row_count(r) for r in self._rows)
+            try:
+                self._write_batch()
+            except OSError:
+                # Замеры остаются в буфере и журнале, запись повторится при следующем сбросе
+                logger.exception("Не удалось записать замеры из журнала %s", self._journal_path)
+                return
+            except Exception:
+                # Журнал, который не записывается, не должен мешать открыть хранилище
+                logger.exception("Не удалось восстановить журнал %s, сохранён как .bad", self._journal_path)
+                os.replace(self._journal_path, self._journal_path + ".bad")
+                return
+        os.remove(self._journal_path)
+
+    def append(self, rows):
+        rows = {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in rows.items()}
+        with self._lock:
+            now = time.monotonic()
+            if self._journal is not None:
+                self._journal.write(json.dumps(rows) + "\n")
+                self._journal.flush()
+                self._journal_dirty = True
+                self._sync_journal(now, force=self.fsync == "always")
+            self._rows.append(rows)
+            self._pending += _row_count(rows)
+            if self._first_time is None:
+                self._first_time = now
+            if self._pending >= self.max_rows or now - self._first_time >= self.max_delay:
+                self.flush()
+
+    def flush(self):
+        """Записать накопленные замеры в хранилище"""
+        with self._lock:
+            if not self._rows:
+                return
+            try:
+                self._write_batch()
+            finally:
+                # Журнал очищается, только когда в буфере не осталось незаписанных замеров
+                if not self._rows and self._journal is not None:
+                    self._journal.truncate(0)
+                    self._journal.seek(0)
+                    self._journal_dirty = False
+            now = time.monotonic()
+            if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval):
+                self.store.sync()
+                self._last_sync = now
+
+    def flush_due(self):
+        """
+        Сбросить буфер, если самому старому замеру исполнилось max_delay секунд,
+        и журнал на диск по политике fsync — без ожидания следующего замера
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._first_time is not None and now - self._first_time >= self.max_delay:
+                self.flush()
+            self._sync_journal(now)
+
+    def _sync_journal(self, now, force=False):
+        if self._journal is None or not self._journal_dirty or self.fsync == "never":
+            return
+        if force or now - self._journal_synced >= self.fsync_interval:
+            os.fsync(self._journal.fileno())
+            self._journal_synced = now
+            self._journal_dirty = False
+
+    def _write_batch(self):
+        self._version += 1
+        if self._retry:
+            # Прошлая пачка могла успеть записаться в исходные данные (а упасть на
+            # агрегатах): уже записанные строки не повторяются, как при разборе журнала
+            last = self.store.last_timestamp()
+            self._rows = [r for r in (_rows_after(row, last)[0] for row in self._rows) if r is not None]
+            self._retry = False
+            self._pending = sum(_row_count(r) for r in self._rows)
+            if not self._rows:
+                self._clear()
+                return
+        try:
+            self.store.append(_concat_rows(self._rows))
+        except OSError:
+            # Замеры остаются в буфере, следующая попытка — не раньше чем через max_delay
+            self._first_time = time.monotonic()
+            self._retry = True
+            raise
+        except Exception:
+            if len(self._rows) == 1:
+                self._clear()
+                raise
+            self._write_rows()
+        else:
+            self._clear()
+
+    def _write_rows(self):
+        """
+        Пачку отверг один замер (например, нечисловое значение) — пишем по одному,
+        отбрасывая только те, что не записываются; при ошибке ввода-вывода
+        незаписанные замеры остаются в буфере
+        """
+        rows, failed = self._rows, 0
+        for i, row in enumerate(rows):
+            try:
+                self.store.append(_concat_rows([row]))
+            except OSError:
+                self._rows = rows[i:]
+                self._pending = sum(_row_count(r) for r in self._rows)
+                self._first_time = time.monotonic()
+                self._retry = True
+                raise
+            except Exception:
+                failed += 1
+                logger.exception("Замер %s не записан в хранилище, отброшен", row.get("timestamp"))
+        self._clear()
+        if failed == len(rows):
+            raise ValueError(f"хранилище не приняло ни одного из {failed} замеров")
+
+    def _clear(self):
+        self._rows = []
+        self._pending = 0
+        self._first_time = None
+
+    def close(self):
+        with self._lock:
+            try:
+                self.flush()
+                if self.fsync != "never":
+                    self.store.sync()
+            finally:
+                if self._journal is not None:
+                    if self._journal_dirty and self.fsync != "never":
+                        os.fsync(self._journal.fileno())
+                    self._journal.close()
+                    self._journal = None
+                    # Незаписанные замеры восстановятся из журнала при следующем открытии
+                    if not self._rows:
+                        os.remove(self._journal_path)
+                self.store.close()
+
+    # --- Чтение: хранилище + незаписанные замеры ---
+    def _read(self, fn):
+        """
+        fn(store) и незаписанные строки (колонки-списки или None), согласованные
+        между собой: если пока выполнялась fn буфер записался в хранилище, чтение повторяется.
+        """
+        while True:
+            with self._lock:
+                version, rows = self._version, list(self._rows)
+            result = fn(self.store)
+            if self._version == version:
+                return result, (_concat_rows(rows) if rows else None)
+
+    def _raw_dtype(self, name):
+        raw = getattr(self.store, "raw", self.store)
+        return raw.dtype(name) if name in raw.index["columns"] else np.float64
+
+    @property
+    def columns(self):
+        columns, pending = self._read(lambda store: store.columns)
+        return columns + [c for c in (pending or {}) if c not in columns]
+
+    def __len__(self):
+        n, pending = self._read(len)
+        return n + (len(pending["timestamp"]) if pending else 0)
+
+    def read(self, start=None, end=None, columns=None):
+        data, pending = self._read(lambda store: store.read(start, end, columns))
+        if pending is None:
+            return data
+        names = _merged_names(list(data), columns, pending)
+        mask = _range_mask(pending["timestamp"], start, end)
+        if not mask.any():
+            return data
+        stored = len(next(iter(data.values()))) if data else 0
+        result = {}
+        for name in names:
+            dtype = self._raw_dtype(name)
+            tail = _pending_array(pending, name, dtype)[mask]
+            head = data.get(name)
+            if head is None:
+                head = _na_array(dtype, stored)
+            result[name] = np.concatenate([head, tail.astype(head.dtype, copy=False)])
+        return result
+
+    def to_frame(self, start=None, end=None, columns=None):
+        df, pending = self._read(lambda store: store.to_frame(start, end, columns))
+        if pending is None:
+            return df
+        names = _merged_names(list(df.columns), columns, pending)
+        return _append_frame(df, _pending_frame(pending, names, start, end))
+
+    def query(self, start=None, end=None, columns=None, max_points=None, agg="mean", keys=None):
+        """
+        query хранилища и ещё не записанные замеры. Если ответ собран из агрегатов,
+        незаписанные замеры (последние секунды) добавляются как есть, после последней корзины.
+        """
+        def run(store):
+            return store.query(start, end, columns, max_points=max_points, agg=agg, keys=keys), \
+                store.choose_tier(start, end, max_points)
+
+        (df, tier), pending = self._read(run)
+        if pending is None:
+            return df
+        key = self.store.key
+        names = (self.store.raw.columns or list(pending)) if columns is None else list(columns)
+        names = ["timestamp"] + ([key] if key else []) + [c for c in names if c not in ("timestamp", key)]
+        tail = _pending_frame(pending, names, start, end)
+        if key and key in tail:
+            tail[key] = tail[key].astype(np.int64)
+            if keys is not None:
+                tail = tail[tail[key].isin(list(keys))]
+        if tier is not None and not df.empty:
+            tail = tail[tail["timestamp"] > df["timestamp"].max()]
+        return _append_frame(df, tail[[c for c in df.columns if c in tail]] if not df.empty else tail)
+
+    def first_timestamp(self):
+        first, pending = self._read(lambda store: store.first_timestamp())
+        candidates = [first] if first is not None else []
+        if pending:
+            candidates.append(float(np.min(pending["timestamp"])))
+        return min(candidates) if candidates else None
+
+    def last_timestamp(self):
+        last, pending = self._read(lambda store: store.last_timestamp())
+        candidates = [last] if last is not None else []
+        if pending:
+            candidates.append(float(np.max(pending["timestamp"])))
+        return max(candidates) if candidates else None
+
+    def import_csv(self, *args, **kwargs):
+        # Запись: незаписанные замеры должны лечь в хранилище раньше импортированных
+        self.flush()
+        return self.store.import_csv(*args, **kwargs)
+
+
+def _row_count(rows):
+    ts = rows["timestamp"]
+    return len(ts) if isinstance(ts, (list, tuple)) else 1
+
+
+def _rows_after(row, last):
+    """Замер журнала без строк с timestamp <= last: (замер или None, сколько строк отброшено)"""
+    ts = row["timestamp"]
+    if last is None:
+        return row, 0
+    if not isinstance(ts, (list, tuple)):
+        return (row, 0) if ts > last else (None, 1)
+    keep = [i for i, t in enumerate(ts) if t > last]
+    if len(keep) == len(ts):
+        return row, 0
+    if not keep:
+        return None, len(ts)
+    return {k: [v[i] for i in keep] if isinstance(v, (list, tuple)) else v for k, v in row.items()}, len(ts) - len(keep)
+
+
+def _merged_names(stored, columns, pending):
+    """Колонки ответа: из хранилища и запрошенные, которые пока есть только в незаписанных замерах"""
+    requested = ["timestamp"] + (list(columns) if columns is not None else list(pending))
+    return stored + [c for c in requested if c not in stored and c in pending]
+
+
+def _range_mask(ts, start, end):
+    ts = np.asarray(ts, dtype=np.float64)
+    mask = np.ones(len(ts), dtype=bool)
+    if start is not None:
+        mask &= ts >= start
+    if end is not None:
+        mask &= ts <= end
+    return mask
+
+
+def _pending_array(pending, name, dtype=np.float64):
+    """Колонка незаписанных замеров в типе хранилища (пропуски — NaN или INT_NA)"""
+    values = pending.get(name)
+    n = len(pending["timestamp"])
+    if values is None:
+        return _na_array(dtype, n)
+    arr = np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    if dtype is np.int64:
+        return np.where(np.isnan(arr), INT_NA, arr).astype(np.int64)
+    return arr
+
+
+def _pending_frame(pending, names, start, end):
+    mask = _range_mask(pending["timestamp"], start, end)
+    return pd.DataFrame({name: _pending_array(pending, name)[mask] for name in names})
+
+
+def _append_frame(df, tail):
+    if tail.empty:
+        return df
+    if df.empty:
+        return tail.reset_index(drop=True)
+    return pd.concat([df, tail], ignore_index=True)
+
+
+def _concat_rows(rows):
+    """Список замеров (значения — числа или списки одной длины) -> колонки-списки"""
+    columns = {}
+    total = 0
+    for row in rows:
+        ts = row["timestamp"]
+        n = len(ts) if isinstance(ts, (list, tuple)) else 1
+        for name in row:
+            if name not in columns:
+                columns[name] = [None] * total
+        for name, values in columns.items():
+            value = row.get(name)
+            if isinstance(value, (list, tuple)):
+                values.extend(value)
+            else:
+                values.extend([value] * n)
+        total += n
+    return columns
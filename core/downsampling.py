@@ -0,0 +1,78 @@
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: индексы n_out точек ряда (x, y),
+    лучше всего сохраняющих его форму на графике.
+    Первая и последняя точки сохраняются всегда.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out - 2 корзины между первой и последней точкой
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i == n_out - 3:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            nxt = slice(edges[i + 1], edges[i + 2])
+            avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        # Удвоенная площадь треугольника (выбранная точка, кандидат, среднее следующей корзины)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def minmax_buckets(y, n_out):
+    """Индексы минимума и максимума в каждой из n_out // 2 корзин (сохраняет выбросы)"""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, max(n_out // 2, 1) + 1).astype(np.int64)
+    idx = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if lo < hi:
+            idx.append(lo + int(np.argmin(y[lo:hi])))
+            idx.append(lo + int(np.argmax(y[lo:hi])))
+    return np.unique(idx)
+
+
+def downsample_frame(df, max_points, method="lttb", x="timestamp"):
+    """
+    Сократить DataFrame до max_points строк.
+    Для одной колонки значений — отбор точек (lttb или minmax),
+    для нескольких — средние по равным по числу строк корзинам.
+    method="sum" — суммы по корзинам для всех колонок (счётчики событий), timestamp — начало корзины.
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    if method == "sum":
+        buckets = np.arange(len(df)) * max_points // len(df)
+        numeric = df.select_dtypes(include="number")
+        result = numeric.groupby(buckets).sum(min_count=1)
+        result[x] = numeric[x].groupby(buckets).first()
+        return result.reset_index(drop=True)
+    values = [c for c in df.columns if c != x]
+    if len(values) == 1:
+        col = values[0]
+        valid = df[df[col].notna()]
+        if len(valid) <= max_points:
+            return valid.reset_index(drop=True)
+        if method == "minmax":
+            idx = minmax_buckets(valid[col].to_numpy(), max_points)
+        else:
+            idx = lttb(valid[x].to_numpy(), valid[col].to_numpy(), max_points)
+        return valid.iloc[idx].reset_index(drop=True)
+    buckets = np.arange(len(df)) * max_points // len(df)
+    return df.select_dtypes(include="number").groupby(buckets).mean().reset_index(drop=True)
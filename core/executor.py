@@ -0,0 +1,71 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class CollectorExecutor:
+    """
+    Параллельный запуск операций сборщиков (collect, find_objects) в пуле потоков
+    с жёстким дедлайном на каждую.
+
+    Поток с зависшим вызовом (sysctl, sar, smartctl) прервать нельзя: по дедлайну
+    результат помечается как timeout, а повторный запуск той же операции того же
+    сборщика не ставится в очередь, пока предыдущий не завершится (busy).
+    Так зависший сборщик занимает не больше одного потока на операцию.
+    """
+    def __init__(self, max_workers=None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collector")
+        self._running = {}  # (сборщик, операция) -> future
+        self._lock = threading.Lock()
+
+    def submit(self, name, op, fn):
+        """Future вызова или None, если предыдущий такой же вызов ещё выполняется"""
+        key = (name, op)
+        with self._lock:
+            if key in self._running:
+                return None
+            future = self._pool.submit(self._timed, fn)
+            self._running[key] = future
+        future.add_done_callback(lambda f, key=key: self._release(key, f))
+        return future
+
+    @staticmethod
+    def _timed(fn):
+        started = time.monotonic()
+        return fn(), time.monotonic() - started
+
+    def _release(self, key, future):
+        with self._lock:
+            if self._running.get(key) is future:
+                del self._running[key]
+
+    def run(self, op, calls):
+        """
+        Выполнить calls = {имя: (функция, таймаут)} одновременно.
+        Возвращает {имя: {"status": "ok" | "error" | "timeout" | "busy",
+        "result", "error", "duration"}}; общее время — не больше наибольшего таймаута.
+        """
+        started = time.monotonic()
+        futures = {name: (self.submit(name, op, fn), timeout) for name, (fn, timeout) in calls.items()}
+        results = {}
+        # Ждём в порядке дедлайнов: остальные вызовы тем временем тоже выполняются
+        for name, (future, timeout) in sorted(futures.items(), key=lambda item: item[1][1] or float("inf")):
+            if future is None:
+                results[name] = {"status": "busy", "result": None,
+                                 "error": "предыдущий вызов ещё выполняется", "duration": None}
+                continue
+            remaining = None if timeout is None else max(started + timeout - time.monotonic(), 0)
+            try:
+                result, duration = future.result(timeout=remaining)
+                results[name] = {"status": "ok", "result": result, "error": None, "duration": duration}
+            except FutureTimeoutError:
+                # Ещё не начатый вызов отменяется, уже идущий — досчитается в фоне
+                future.cancel()
+                results[name] = {"status": "timeout", "result": None,
+                                 "error": f"превышен таймаут {timeout} с", "duration": timeout}
+            except Exception as e:
+                results[name] = {"status": "error", "result": None, "error": str(e), "duration": None}
+        return results
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
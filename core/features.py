@@ -0,0 +1,243 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.metrics import REGISTRY
+
+STATS = ("mean", "std", "slope", "max")
+
+
+def rolling_features(df, windows, stats=STATS, by=None):
+    """
+    Скользящие признаки по числовым колонкам истории: для каждой колонки, окна
+    (в замерах) и статистики — колонка "<колонка>_<статистика>_<окно>".
+    slope — наклон линейной регрессии значения по timestamp (единиц в секунду).
+    by — колонка объекта (core, device) в длинной таблице: окна не пересекают объекты.
+    Возвращает timestamp, by (если задана) и признаки в порядке строк df.
+    """
+    key = [by] if by is not None else []
+    columns = [c for c in df.columns
+               if c != "timestamp" and c != by and pd.api.types.is_numeric_dtype(df[c])]
+    values = df[columns].astype(np.float64)
+    t = df["timestamp"].to_numpy(np.float64)
+    # Отсчёт от первого замера: t ** 2 от абсолютного времени теряет точность
+    t = pd.Series(t - t[0] if len(t) else t, index=df.index)
+    valid = values.notna()
+    # Время только там, где есть значение: средние t и t * y по одним и тем же строкам
+    tv = valid.mul(t, axis=0).where(valid)
+    parts = {"__t": tv, "__tt": tv * tv, "__ty": tv * values}
+    out = {c: df[c] for c in ["timestamp"] + key}
+    groups = df[by] if by is not None else None
+    for window in windows:
+        mean = _rolling(values, window, groups).mean()
+        if "mean" in stats:
+            out.update({f"{c}_mean_{window}": mean[c] for c in columns})
+        if "std" in stats:
+            std = _rolling(values, window, groups).std()
+            out.update({f"{c}_std_{window}": std[c] for c in columns})
+        if "max" in stats:
+            high = _rolling(values, window, groups).max()
+            out.update({f"{c}_max_{window}": high[c] for c in columns})
+        if "slope" in stats:
+            m = {name: _rolling(frame, window, groups).mean() for name, frame in parts.items()}
+            var = m["__tt"] - m["__t"] ** 2
+            slope = (m["__ty"] - m["__t"] * mean) / var.where(var > 1e-12)
+            out.update({f"{c}_slope_{window}": slope[c] for c in columns})
+    return pd.DataFrame(out, index=df.index)
+
+
+def counter_rates(df, counters, by=None):
+    """
+    Накопительные счётчики (прерывания, переключения контекста) -> скорость в секунду
+    между соседними замерами объекта, колонка "<счётчик>_rate". Первый замер и сброс
+    счётчика (перезагрузка) — NaN.
+    """
+    groups = df[by].to_numpy() if by is not None else np.zeros(len(df))
+    dt = df["timestamp"].astype(np.float64).groupby(groups).diff()
+    out = df.drop(columns=counters)
+    for c in counters:
+        delta = df[c].astype(np.float64).groupby(groups).diff()
+        out[f"{c}_rate"] = (delta / dt.where(dt > 0)).where(delta >= 0)
+    return out
+
+
+def _rolling(frame, window, groups):
+    if groups is None:
+        return frame.rolling(window, min_periods=1)
+    # groupby().rolling() векторизован по группам; результат возвращаем в порядок исходных строк
+    return _GroupRolling(frame, window, groups)
+
+
+class _GroupRolling:
+    def __init__(self, frame, window, groups):
+        self._rolling = frame.groupby(groups.to_numpy(), sort=False).rolling(window, min_periods=1)
+        self._index = frame.index
+
+    def __getattr__(self, name):
+        method = getattr(self._rolling, name)
+        return lambda: method().reset_index(level=0, drop=True).reindex(self._index)
+
+
+class FeatureBuilder:
+    """
+    Матрица признаков для моделей по истории сборщика: скользящие mean/std/slope/max
+    по нескольким окнам (в замерах) для каждого числового признака, по объектам —
+    отдельно (длинная таблица с колонкой core/device).
+
+    Результат кешируется по (сборщик, объекты, колонки, окна) вместе с
+    timestamp последней строки: при повторном вызове из истории читаются только
+    новые замеры, а к ним добавляется хвост из последних max(windows) строк
+    каждого объекта (окно и ещё одна строка — база скорости счётчика в первой
+    строке окна) — пересчитываются только новые строки.
+    В кеше держится не больше max_rows последних строк на запись; lookback —
+    с какой глубины (секунд) читать историю при первом построении (None — всю).
+
+    Статические характеристики (STATIC_FIELDS) и колонки NON_FEATURE_COLUMNS сборщика
+    в признаки не входят, накопительные счётчики (COUNTER_COLUMNS) заменяются скоростями.
+    """
+    def __init__(self, windows=(6, 30, 120), stats=STATS, max_rows=100000, max_entries=32, lookback=None):
+        self.windows = tuple(sorted(int(w) for w in windows))
+        self.stats = tuple(s for s in STATS if s in stats)
+        self.max_rows = max_rows
+        self.lookback = lookback
+        self.max_entries = max_entries
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def build(self, name, collector, objects=None, columns=None):
+        """
+        Признаки по истории collector (get_history); objects — по объектам
+        (["cpu0", "cpu1"], ["sda"]), columns — исходные колонки (по умолчанию все).
+        """
+        key = (name, tuple(objects) if objects is not None else None,
+               tuple(columns) if columns is not None else None, self.windows, self.stats)
+        with self._lock:
+            entry = self._cache.pop(key, None)
+            # Последняя использованная запись — в конец (вытесняются самые старые)
+            entry = self._cache[key] = self._update(entry, collector, objects, columns)
+            while len(self._cache) > self.max_entries:
+                self._cache.pop(next(iter(self._cache)))
+            return entry["rows"].frame() if entry["rows"] is not None else pd.DataFrame()
+
+    def _update(self, entry, collector, objects, columns):
+        last_ts = entry["last_ts"] if entry is not None else None
+        if last_ts is None and self.lookback is not None:
+            query = {"start": time.time() - self.lookback}
+        else:
+            query = {"start": last_ts}
+        if columns is not None:
+            query["columns"] = ["timestamp"] + [c for c in columns if c != "timestamp"]
+        if objects is not None:
+            query["objects"] = list(objects)
+        static = getattr(collector, "STATIC_FIELDS", None)
+        if static and objects is None:
+            # Статические поля постоянны в пределах загрузки — признаков из них не получить
+            query["static"] = columns is not None and any(c in static for c in columns)
+        history = collector.get_history(**query)
+        if last_ts is not None and not history.empty:
+            # start включительный: строка last_ts уже посчитана
+            history = history[history["timestamp"] > last_ts]
+        if history.empty:
+            if entry is not None:
+                REGISTRY.inc("feature_builds_total", result="cached")
+                return entry
+            return {"last_ts": None, "rows": None, "tail": None}
+
+        # Колонка объекта в длинной таблице (core у CPU, device у дисков)
+        by = getattr(collector, "OBJECT_COLUMN", None) if objects is not None else None
+        with REGISTRY.timer("feature_build_seconds", collector=collector.__class__.__name__):
+            tail = entry["tail"] if entry is not None else None
+            chunk = pd.concat([tail, history], ignore_index=True) if tail is not None else history
+            chunk = chunk.sort_values(([by] if by else []) + ["timestamp"], kind="stable", ignore_index=True)
+            new = chunk["timestamp"] > last_ts if last_ts is not None else np.ones(len(chunk), dtype=bool)
+            features = rolling_features(self._source(chunk, collector, columns, by),
+                                        self.windows, self.stats, by)[new]
+            if by is not None:
+                # Новые строки позже закешированных: сортировать достаточно только их
+                features = features.sort_values(["timestamp", by], kind="stable")
+            rows = entry["rows"] if entry is not None and entry["rows"] is not None else None
+            if rows is not None and rows.columns != list(features.columns):
+                # Набор колонок истории изменился (новая метрика, обновление сборщика): кеш
+                # не согласуется с новыми строками — матрица строится заново по всей истории
+                return self._update(None, collector, objects, columns)
+            if rows is None:
+                rows = FeatureRows(list(features.columns), by, self.max_rows)
+            rows.append(features)
+        REGISTRY.inc("feature_builds_total", result="full" if entry is None else "incremental")
+        return {
+            "last_ts": float(history["timestamp"].max()),
+            "rows": rows,
+            "tail": _tail(chunk, self.windows[-1], by),
+        }
+
+    @staticmethod
+    def _source(chunk, collector, columns, by):
+        """Колонки истории, из которых считаются признаки (хвост в кеше остаётся исходным)"""
+        excluded = [c for c in getattr(collector, "NON_FEATURE_COLUMNS", ())
+                    if c in chunk.columns and (columns is None or c not in columns)]
+        chunk = chunk.drop(columns=excluded)
+        counters = [c for c in getattr(collector, "COUNTER_COLUMNS", ()) if c in chunk.columns]
+        return counter_rates(chunk, counters, by) if counters else chunk
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+class FeatureRows:
+    """
+    Последние max_rows строк признаков: матрица float64 с запасом ёмкости вдвое.
+    Новые строки дописываются в свободное место, накопленные не копируются;
+    когда место кончается, последние max_rows строк переносятся в новый массив
+    (прежний остаётся у выданных ранее видов). frame() — вид только для чтения.
+    """
+    def __init__(self, columns, by, max_rows):
+        self.columns = columns
+        self.by = by
+        self.max_rows = max_rows
+        self._values = [c for c in columns if c != by]
+        self._data = np.empty((0, len(self._values)))
+        self._keys = None
+        self._start = self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def append(self, frame):
+        n = len(frame)
+        if self._end + n > len(self._data):
+            keep = min(len(self), max(self.max_rows - n, 0))
+            data = np.empty((max(2 * self.max_rows, n), len(self._values)))
+            data[:keep] = self._data[self._end - keep:self._end]
+            if self.by is not None:
+                keys = np.empty(len(data), dtype=frame[self.by].dtype)
+                if self._keys is not None:
+                    keys[:keep] = self._keys[self._end - keep:self._end]
+                self._keys = keys
+            self._data, self._start, self._end = data, 0, keep
+        self._data[self._end:self._end + n] = frame[self._values].to_numpy(np.float64)
+        if self.by is not None:
+            self._keys[self._end:self._end + n] = frame[self.by].to_numpy()
+        self._end += n
+        self._start = max(self._start, self._end - self.max_rows)
+
+    def frame(self):
+        view = self._data[self._start:self._end]
+        view.flags.writeable = False
+        df = pd.DataFrame(view, columns=self._values, copy=False)
+        if self.by is not None:
+            keys = self._keys[self._start:self._end]
+            keys.flags.writeable = False
+            df.insert(1, self.by, keys)
+        return df
+
+
+def _tail(chunk, n, by):
+    """Последние n строк каждого объекта — окно для пересчёта следующих строк"""
+    if n <= 0:
+        return None
+    if by is None:
+        return chunk.iloc[-n:]
+    return chunk.groupby(by, sort=False).tail(n)
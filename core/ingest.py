@@ -0,0 +1,267 @@
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from core.data_storage import TieredStore
+from core.downsampling import downsample_frame
+from core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+HOST_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,252}$")
+
+
+class IngestError(Exception):
+    """Пачка не принята: status — HTTP-статус ответа, retry_after — через сколько секунд повторить"""
+    def __init__(self, message, status=400, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class HostStore:
+    """
+    Данные одного узла на центральном сервере: storage/hosts/<host>/<сборщик>/
+    (TieredStore, как у локальных сборщиков) и ingest.json — принятые пачки
+    (последний номер по каждому запуску агента), последние замеры и
+    нечисловые поля (модель CPU и т.п.).
+    """
+    MAX_RUNS = 16  # сколько запусков агента помнить для отсечения повторов
+
+    def __init__(self, path, retention=None):
+        self.path = path
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.closed = False
+        self._stores = {}
+        os.makedirs(path, exist_ok=True)
+        self._meta_path = os.path.join(path, "ingest.json")
+        self.meta = load_meta(self._meta_path)
+
+    def store(self, collector):
+        if collector not in self._stores:
+            self._stores[collector] = TieredStore(os.path.join(self.path, collector), retention=self.retention)
+        return self._stores[collector]
+
+    def is_duplicate(self, run, seq):
+        # Агент отправляет пачки строго по порядку, поэтому достаточно последнего принятого номера
+        return seq <= self.meta["runs"].get(run, 0)
+
+    def write(self, batch):
+        """Записать кадры пачки; возвращает число замеров"""
+        samples = 0
+        for frame in batch["frames"]:
+            collector, fields, rows = frame["collector"], frame["fields"], frame["rows"]
+            if not rows:
+                continue
+            if "timestamp" not in fields or not HOST_NAME.match(collector):
+                raise IngestError(f"Некорректный кадр сборщика {collector!r}")
+            store = self.store(collector)
+            rows = self._new_rows(collector, fields.index("timestamp"), rows, store.last_timestamp())
+            if not rows:
+                store.close()
+                continue
+            columns, static = {}, {}
+            for field, values in zip(fields, zip(*rows)):
+                if all(v is None or isinstance(v, (int, float)) for v in values):
+                    columns[field] = list(values)
+                else:
+                    # Нечисловые поля не меняются между замерами — храним последнее значение
+                    static[field] = next((v for v in reversed(values) if v is not None), None)
+            try:
+                store.append(columns)
+            finally:
+                # Дескрипторы файлов колонок не держим открытыми между пачками: узлов тысячи
+                store.close()
+            self.meta["latest"][collector] = dict(zip(fields, rows[-1]))
+            if static:
+                self.meta["static"].setdefault(collector, {}).update(static)
+            samples += len(rows)
+        runs = self.meta["runs"]
+        runs.pop(batch["run"], None)
+        runs[batch["run"]] = batch["seq"]
+        while len(runs) > self.MAX_RUNS:
+            runs.pop(next(iter(runs)))
+        self.meta["batches"] += 1
+        self.meta["samples"] += samples
+        self.meta["last_batch"] = time.time()
+        self._save_meta()
+        return samples
+
+    @staticmethod
+    def _new_rows(collector, pos, rows, last):
+        """
+        Строки новее last в порядке timestamp. Пачки разных запусков агента могут прийти
+        не по порядку, а хранилище дописывается только в конец: более старые строки дали бы
+        повторные корзины агрегатов и пересекающиеся сегменты — они отбрасываются.
+        """
+        fresh = [row for row in rows if isinstance(row[pos], (int, float)) and (last is None or row[pos] > last)]
+        fresh.sort(key=lambda row: row[pos])
+        if len(fresh) < len(rows):
+            REGISTRY.inc("ingest_rows_dropped_total", len(rows) - len(fresh), collector=collector)
+        return fresh
+
+    def _save_meta(self):
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._meta_path)
+
+    def close(self):
+        for store in self._stores.values():
+            store.close()
+        self._stores.clear()
+        self.closed = True
+
+
+def load_meta(path):
+    meta = {"runs": {}, "batches": 0, "samples": 0, "last_batch": None, "latest": {}, "static": {}}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            meta.update(json.load(f))
+    return meta
+
+
+class IngestManager:
+    """
+    Приём пачек замеров от агентов (core.agent.AgentPusher) в хранилища по узлам.
+
+    Одновременно обрабатывается не больше max_concurrent пачек; остальным
+    сразу отвечаем 503 с Retry-After, и агенты копят пачки у себя (backpressure),
+    вместо того чтобы держать соединения. Повторно присланная пачка (тот же
+    запуск агента и номер не больше принятого) подтверждается без записи.
+    Открытыми держатся хранилища не более max_open_hosts недавно писавших узлов.
+    """
+    def __init__(self, root="storage/hosts", max_concurrent=8, max_open_hosts=1024, max_batch_bytes=64 << 20,
+                 retention=None, token=None, retry_after=5):
+        self.root = root
+        self.max_open_hosts = max_open_hosts
+        self.max_batch_bytes = max_batch_bytes
+        self.retention = retention
+        self.token = token
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._hosts = OrderedDict()  # узел -> HostStore, в порядке использования
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def enabled(self):
+        """Приём включён, только если задан токен: без него писать мог бы любой"""
+        return bool(self.token)
+
+    def check_token(self, authorization):
+        return self.enabled and hmac.compare_digest(str(authorization or ""), f"Bearer {self.token}")
+
+    def ingest(self, payload, encoding=None):
+        """Принять сжатую пачку; {"status": "ok" | "duplicate", "batch_id", "samples"} или IngestError"""
+        if not self._slots.acquire(blocking=False):
+            REGISTRY.inc("ingest_batches_total", result="busy")
+            raise IngestError("Сервер перегружен, повторите позже", 503, self.retry_after)
+        try:
+            with REGISTRY.timer("ingest_batch_seconds"):
+                batch = self._decode(payload, encoding)
+                result = self._write(batch)
+            REGISTRY.inc("ingest_batches_total", result=result["status"])
+            return result
+        except IngestError:
+            REGISTRY.inc("ingest_batches_total", result="rejected")
+            raise
+        finally:
+            self._slots.release()
+
+    def _decode(self, payload, encoding):
+        if encoding in ("deflate", "zlib"):
+            decompressor = zlib.decompressobj()
+            try:
+                data = decompressor.decompress(payload, self.max_batch_bytes)
+            except zlib.error as e:
+                raise IngestError(f"Пачка повреждена: {e}")
+            if decompressor.unconsumed_tail:
+                raise IngestError(f"Пачка больше {self.max_batch_bytes} байт", 413)
+        elif len(payload) > self.max_batch_bytes:
+            raise IngestError(f"Пачка больше {self.max_batch_bytes} байт", 413)
+        else:
+            data = payload
+        try:
+            batch = json.loads(data)
+            host, run, seq = batch["host"], str(batch["run"]), int(batch["seq"])
+            frames = list(batch["frames"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise IngestError(f"Некорректная пачка: {e}")
+        if not isinstance(host, str) or not HOST_NAME.match(host):
+            raise IngestError(f"Некорректное имя узла: {host!r}")
+        return dict(batch, host=host, run=run, seq=seq, frames=frames)
+
+    def _open_host(self, host):
+        with self._lock:
+            store = self._hosts.get(host)
+            if store is None:
+                store = self._hosts[host] = HostStore(os.path.join(self.root, host), retention=self.retention)
+            self._hosts.move_to_end(host)
+            while len(self._hosts) > self.max_open_hosts:
+                _, evicted = self._hosts.popitem(last=False)
+                with evicted.lock:
+                    evicted.close()
+            return store
+
+    def _write(self, batch):
+        while True:
+            host = self._open_host(batch["host"])
+            with host.lock:
+                if host.closed:
+                    # Вытеснен из кеша, пока ждали блокировку — откроется заново
+                    continue
+                result = {"batch_id": batch.get("batch_id"), "samples": 0}
+                if host.is_duplicate(batch["run"], batch["seq"]):
+                    return dict(result, status="duplicate")
+                try:
+                    result["samples"] = host.write(batch)
+                except (ValueError, TypeError) as e:
+                    raise IngestError(f"Некорректные данные: {e}")
+                return dict(result, status="ok")
+
+    # --- Чтение ---
+    def get_hosts(self):
+        """{узел: {"last_batch", "age", "batches", "samples", "collectors", "latest", "static"}}"""
+        now = time.time()
+        result = {}
+        for host in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, host, "ingest.json")
+            if not os.path.exists(path):
+                continue
+            meta = load_meta(path)
+            result[host] = {
+                "last_batch": meta["last_batch"],
+                "age": now - meta["last_batch"] if meta["last_batch"] else None,
+                "batches": meta["batches"],
+                "samples": meta["samples"],
+                "collectors": sorted(meta["latest"]),
+                "latest": meta["latest"],
+                "static": meta["static"],
+            }
+        return result
+
+    def get_history(self, host, collector, start=None, end=None, max_points=None, columns=None):
+        """История сборщика узла (как get_history локального сборщика); None — данных нет"""
+        if not HOST_NAME.match(host) or not HOST_NAME.match(collector):
+            return None
+        if not os.path.isdir(os.path.join(self.root, host, collector)):
+            return None
+        store = self._open_host(host)
+        with store.lock:
+            df = store.store(collector).query(start, end, columns, max_points=max_points)
+        return downsample_frame(df, max_points) if not df.empty else df
+
+    def close(self):
+        with self._lock:
+            for store in self._hosts.values():
+                with store.lock:
+                    store.close()
+            self._hosts.clear()
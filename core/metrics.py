@@ -0,0 +1,141 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограмм времени, сек: от 10 мкс до 10 с
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Счётчики по фиксированным корзинам: observe — O(log числа корзин), без хранения значений"""
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя — +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Оценка квантили по корзинам (верхняя граница корзины)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.max
+
+
+class MetricsRegistry:
+    """
+    Гистограммы и счётчики с метками; выдача в текстовом формате Prometheus.
+    Метрика объявляется через describe, метки задаются при записи.
+    """
+    def __init__(self):
+        self._meta = {}        # имя -> (тип, описание, корзины)
+        self._histograms = {}  # (имя, метки) -> Histogram
+        self._counters = {}    # (имя, метки) -> число
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text, buckets=DEFAULT_BUCKETS):
+        self._meta[name] = (kind, help_text, tuple(buckets))
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(self._meta.get(name, (None, None, DEFAULT_BUCKETS))[2])
+            hist.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus (version 0.0.4)"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        lines = []
+        for name in sorted({key[0] for key in histograms} | {key[0] for key in counters}):
+            kind, help_text, _ = self._meta.get(name, ("untyped", None, None))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (metric, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, n in zip(list(buckets) + ["+Inf"], counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, name, failures=None):
+        """
+        Сводка по гистограмме name для страницы статуса: строка на набор меток
+        (count, mean, p50, p95, max в секундах), failures — имя счётчика ошибок
+        с теми же метками. Отсортирована по убыванию среднего времени.
+        """
+        with self._lock:
+            rows = []
+            for (metric, labels), h in self._histograms.items():
+                if metric != name:
+                    continue
+                rows.append(dict(labels, count=h.count, mean=h.sum / h.count if h.count else None,
+                                 p50=h.quantile(0.5), p95=h.quantile(0.95), max=h.max,
+                                 failures=self._counters.get((failures, labels), 0) if failures else None))
+        return sorted(rows, key=lambda r: r["mean"] or 0, reverse=True)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("collector_probe_seconds", "histogram", "Время одного опроса источника (_get_*) сборщиком")
+REGISTRY.describe("collector_probe_failures_total", "counter", "Опросы источника, завершившиеся исключением")
+REGISTRY.describe("collector_sample_seconds", "histogram", "Время одного замера сборщика целиком")
+REGISTRY.describe("collector_history_seconds", "histogram", "Время чтения истории сборщика (get_history)")
+REGISTRY.describe("http_request_seconds", "histogram", "Время обработки HTTP-запроса")
+REGISTRY.describe("agent_batches_total", "counter", "Пачки замеров агента по результату отправки")
+REGISTRY.describe("ingest_batches_total", "counter", "Пачки замеров, полученные от агентов, по результату приёма")
+REGISTRY.describe("ingest_batch_seconds", "histogram", "Время приёма одной пачки от агента")
+REGISTRY.describe("ingest_rows_dropped_total", "counter",
+                  "Замеры из пачек агентов, отброшенные как не новее уже сохранённых")
+REGISTRY.describe("feature_builds_total", "counter", "Построения матрицы признаков: full, incremental, cached")
+REGISTRY.describe("feature_build_seconds", "histogram", "Время расчёта скользящих признаков по истории")
+REGISTRY.describe("model_fit_seconds", "histogram", "Время обучения модели")
+REGISTRY.describe("model_fits_total", "counter", "Обучения моделей: new, refit, scheduled, partial")
+REGISTRY.describe("model_update_seconds", "histogram", "Время дообучения модели на новых строках (partial_fit)")
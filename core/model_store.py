@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def artifact_key(**parts):
+    """Ключ обученной модели: хеш конфигурации модели и схемы обучающих данных"""
+    blob = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+def lineage(meta):
+    """
+    Линия модели: имя, сборщик, объекты и колонки признаков. Новый ключ той же линии
+    (другие параметры или класс) заменяет прежние, модели других линий живут рядом.
+    """
+    return json.dumps([meta.get("model"), meta.get("collector"), meta.get("objects"), meta.get("columns")],
+                      sort_keys=True, default=str)
+
+
+class ModelStore:
+    """
+    Обученные модели на диске: storage/models/<модель>/<ключ>.pkl (pickle) и
+    <ключ>.json (описание: параметры, сборщик, колонки, когда и на каких данных обучена).
+
+    Ключ — хеш класса и параметров модели, сборщика, объектов и набора колонок
+    признаков: при изменении любого из них модель обучается заново под новым
+    ключом. Загруженные модели держатся в памяти; warm() загружает все
+    сохранённые при старте. Обученная модель устаревает через refit_interval
+    секунд (None — никогда); хранится не больше keep последних моделей каждой линии
+    (модель, сборщик, объекты, колонки). Описания моделей каждого имени читаются
+    с диска один раз и дальше ведутся в памяти: put (и дообучение на каждом
+    прогнозе) не перечитывает каталог.
+    """
+    def __init__(self, path="storage/models", refit_interval=86400, keep=3):
+        self.path = path
+        self.refit_interval = refit_interval
+        self.keep = keep
+        self._models = {}  # ключ -> (модель, описание)
+        self._index = {}   # имя модели -> {ключ: описание} сохранённых моделей
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def key_lock(self, key):
+        """Блокировка обучения по ключу: одну модель не обучают два потока сразу"""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _files(self, name, key):
+        base = os.path.join(self.path, name, key)
+        return base + ".pkl", base + ".json"
+
+    def get(self, name, key):
+        """(модель, описание) или None — модели с таким ключом нет"""
+        with self._lock:
+            entry = self._models.get(key)
+        if entry is not None:
+            return entry
+        model_path, meta_path = self._files(name, key)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            with open(model_path, "rb") as f:
+                model = pickle.load(f)
+        except Exception:
+            logger.exception("Не удалось загрузить модель %s/%s, будет обучена заново", name, key)
+            return None
+        with self._lock:
+            self._models[key] = (model, meta)
+        return model, meta
+
+    def put(self, name, key, model, meta):
+        meta = dict(meta, model=name, key=key)
+        model_path, meta_path = self._files(name, key)
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        # Сначала модель, потом описание: описание без файла модели не появится
+        for path, mode, dump in ((model_path, "wb", lambda f: pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)),
+                                 (meta_path, "w", lambda f: json.dump(meta, f, indent=2))):
+            tmp = path + ".tmp"
+            with open(tmp, mode) as f:
+                dump(f)
+            os.replace(tmp, path)
+        metas = self._metas(name)
+        with self._lock:
+            self._models[key] = (model, meta)
+            metas[key] = meta
+        self._prune(meta)
+        return meta
+
+    def _metas(self, name):
+        """Описания сохранённых моделей name по ключам; каталог читается только в первый раз"""
+        with self._lock:
+            metas = self._index.get(name)
+        if metas is None:
+            metas = {meta["key"]: meta for meta in self.list(name) if "key" in meta}
+            with self._lock:
+                metas = self._index.setdefault(name, metas)
+        return metas
+
+    def is_stale(self, meta):
+        return self.refit_interval is not None and time.time() - meta.get("fitted_at", 0) > self.refit_interval
+
+    def list(self, name=None):
+        """Описания сохранённых моделей (все или одного имени), новые первыми"""
+        names = [name] if name is not None else (os.listdir(self.path) if os.path.isdir(self.path) else [])
+        result = []
+        for n in names:
+            directory = os.path.join(self.path, n)
+            if not os.path.isdir(directory):
+                continue
+            for file in os.listdir(directory):
+                if not file.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(directory, file), "r") as f:
+                        result.append(json.load(f))
+                except Exception:
+                    logger.exception("Повреждено описание модели %s/%s", n, file)
+        return sorted(result, key=lambda meta: meta.get("fitted_at", 0), reverse=True)
+
+    def invalidate(self, name=None, key=None):
+        """Удалить сохранённые модели (все, одного имени или один ключ) — следующий прогноз обучит заново"""
+        removed = 0
+        for meta in self.list(name):
+            if key is not None and meta["key"] != key:
+                continue
+            self._remove(meta["model"], meta["key"])
+            removed += 1
+        return removed
+
+    def _remove(self, name, key):
+        with self._lock:
+            self._models.pop(key, None)
+            self._index.get(name, {}).pop(key, None)
+        for path in self._files(name, key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _prune(self, meta):
+        """Удалить модели линии meta старше keep последних; модели других линий (и в памяти) не трогаются"""
+        metas = self._metas(meta["model"])
+        line = lineage(meta)
+        with self._lock:
+            same = [m for m in metas.values() if lineage(m) == line]
+        same.sort(key=lambda m: m.get("fitted_at", 0), reverse=True)
+        for old in same[self.keep:]:
+            if old["key"] != meta["key"]:
+                self._remove(old["model"], old["key"])
+
+    def stale(self):
+        """Описания загруженных в память моделей, которым пора переобучиться"""
+        with self._lock:
+            metas = [meta for _, meta in self._models.values()]
+        return [meta for meta in metas if self.is_stale(meta)]
+
+    def warm(self):
+        """Загрузить в память все сохранённые модели; возвращает число загруженных"""
+        loaded = 0
+        for meta in self.list():
+            if self.get(meta["model"], meta["key"]) is not None:
+                loaded += 1
+        return loaded
+
+    def warm_async(self):
+        """warm() в фоновом потоке: импорт библиотек моделей и чтение файлов не задерживают старт"""
+        thread = threading.Thread(target=self.warm, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,90 @@
+import importlib
+import logging
+import threading
+from collections.abc import Mapping
+from importlib import metadata
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """
+    Модуль, который импортируется при первом обращении к его атрибуту.
+    Для тяжёлых зависимостей (pandas): процессу, которому они не нужны,
+    не приходится платить за их загрузку при старте.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def load_object(target):
+    """Объект по строке вида "пакет.модуль:Класс" """
+    module_name, _, attr = target.partition(":")
+    obj = importlib.import_module(module_name)
+    for part in attr.split(".") if attr else []:
+        obj = getattr(obj, part)
+    return obj
+
+
+class PluginRegistry(Mapping):
+    """
+    Имя -> класс плагина (сборщика, модели).
+
+    Источники: манифест {имя: "модуль:Класс"} и точки входа установленных
+    пакетов из группы group (манифест важнее). Модуль плагина импортируется
+    при первом обращении к нему по имени; перечисление имён ничего не импортирует.
+    """
+    def __init__(self, manifest, group=None):
+        self.manifest = dict(manifest)
+        self.group = group
+        self._entry_points = None
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def _discover(self):
+        """Точки входа группы (ищутся один раз и только если понадобились)"""
+        if self._entry_points is None:
+            found = {}
+            if self.group:
+                try:
+                    found = {ep.name: ep.value for ep in metadata.entry_points(group=self.group)}
+                except Exception:
+                    logger.exception("Не удалось прочитать точки входа %s", self.group)
+            self._entry_points = found
+        return self._entry_points
+
+    def _target(self, name):
+        if name in self.manifest:
+            return self.manifest[name]
+        return self._discover().get(name)
+
+    def register(self, name, target):
+        """Добавить плагин: строка "модуль:Класс" или сам класс"""
+        with self._lock:
+            self.manifest[name] = target
+            self._loaded.pop(name, None)
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._loaded:
+                target = self._target(name)
+                if target is None:
+                    raise KeyError(name)
+                self._loaded[name] = load_object(target) if isinstance(target, str) else target
+            return self._loaded[name]
+
+    def __contains__(self, name):
+        return self._target(name) is not None
+
+    def __iter__(self):
+        yield from self.manifest
+        yield from (name for name in self._discover() if name not in self.manifest)
+
+    def __len__(self):
+        return len(set(self.manifest) | set(self._discover()))
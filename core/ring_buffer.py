@@ -0,0 +1,101 @@
+import threading
+
+import numpy as np
+
+from core.registry import LazyModule
+
+pd = LazyModule("pandas")
+
+
+class RingBuffer:
+    """
+    Последние capacity замеров в памяти: структурированный массив NumPy
+    фиксированного размера (все поля — float64, пропуск — NaN).
+
+    Каждый замер пишется дважды — в позицию i и i + capacity, поэтому любое окно
+    из последних capacity строк лежит в памяти непрерывно и копируется одним
+    блоком. Схема (имена полей) берётся из первого замера.
+
+    Пишет поток сбора, читают потоки запросов и SSE: запись и чтение — под
+    блокировкой, а наружу отдаются копии окна. Вид на буфер отдавать нельзя:
+    следующий замер перезаписывает самую старую строку окна.
+    """
+    def __init__(self, capacity, x="timestamp"):
+        self.capacity = int(capacity)
+        self.x = x
+        self._data = None
+        self._pos = 0    # куда пишется следующий замер
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def columns(self):
+        return list(self._data.dtype.names) if self._data is not None else []
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes if self._data is not None else 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, row):
+        """Добавить замер (словарь поле -> число или None); поля не из схемы отбрасываются"""
+        if self.capacity <= 0:
+            return
+        if self._data is None:
+            dtype = np.dtype([(name, np.float64) for name in row])
+            self._data = np.full(2 * self.capacity, np.nan, dtype=dtype)
+        record = tuple(np.nan if row.get(name) is None else row[name] for name in self._data.dtype.names)
+        with self._lock:
+            self._data[self._pos] = record
+            self._data[self._pos + self.capacity] = record
+            self._pos = (self._pos + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _view(self):
+        """Все хранимые замеры от старых к новым — вид на внутренний массив (только под блокировкой)"""
+        if self._data is None:
+            return None
+        # Старейший замер в позиции pos (если буфер полон) или 0, последний — перед pos + capacity
+        end = self._pos + self.capacity
+        return self._data[end - self._count:end]
+
+    def view(self):
+        """Все хранимые замеры от старых к новым (копия)"""
+        return self.window()
+
+    def first_timestamp(self):
+        with self._lock:
+            return float(self._view()[self.x][0]) if self._count else None
+
+    def last_timestamp(self):
+        with self._lock:
+            return float(self._view()[self.x][-1]) if self._count else None
+
+    def covers(self, start):
+        """Все замеры новее start есть в буфере"""
+        if start is None:
+            return False
+        first = self.first_timestamp()
+        return first is not None and start >= first
+
+    def window(self, start=None, end=None):
+        """Замеры с start <= x <= end (копия)"""
+        with self._lock:
+            view = self._view()
+            if view is None:
+                return None
+            xs = view[self.x]
+            lo = 0 if start is None else int(np.searchsorted(xs, start, side="left"))
+            hi = len(xs) if end is None else int(np.searchsorted(xs, end, side="right"))
+            return view[lo:hi].copy()
+
+    def to_frame(self, start=None, end=None, columns=None):
+        """Окно в виде DataFrame (x всегда первой колонкой)"""
+        window = self.window(start, end)
+        if window is None:
+            return pd.DataFrame()
+        names = self.columns if columns is None else [self.x] + [c for c in columns if c in self.columns and c != self.x]
+        # Окно уже скопировано — колонки берутся из него без ещё одной копии
+        return pd.DataFrame({name: window[name] for name in names}, copy=False)
@@ -0,0 +1,74 @@
+import threading
+from collections import deque
+
+
+class Subscription:
+    """
+    Очередь новых замеров для одного подписчика.
+
+    Очередь ограничена: если клиент не успевает забирать данные, самые
+    старые замеры вытесняются (drop-oldest), а сборщик никогда не ждёт.
+    """
+    def __init__(self, collectors=None, maxsize=256):
+        self.collectors = set(collectors) if collectors else None
+        self.dropped = 0
+        self.closed = False
+        self._queue = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Забрать все накопившиеся замеры; пустой список — если за timeout ничего не пришло"""
+        with self._cond:
+            if not self._queue and not self.closed:
+                self._cond.wait(timeout)
+            items = list(self._queue)
+            self._queue.clear()
+            return items
+
+    def take_dropped(self):
+        """Сколько замеров вытеснено с прошлого вызова"""
+        with self._cond:
+            dropped, self.dropped = self.dropped, 0
+            return dropped
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class SampleBroadcaster:
+    """Рассылка каждого нового замера всем подписчикам"""
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, collectors=None, maxsize=None):
+        sub = Subscription(collectors, maxsize or self.maxsize)
+        with self._lock:
+            self._subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions.discard(sub)
+        sub.close()
+
+    def publish(self, collector_name, sample):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for sub in subscriptions:
+            if sub.collectors is None or collector_name in sub.collectors:
+                sub.put((collector_name, sample))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscriptions)
@@ -1,31 +1,235 @@
-import pandas as pd
+import copy
+import logging
+import math
+import random
+import threading
+import time
+
 from core.config import ConfigManager
+from core.sample_stream import SampleBroadcaster
+from core.executor import CollectorExecutor
+from core.metrics import REGISTRY
+from core.model_store import ModelStore, artifact_key
 from collectors import DICT_COLLECTORS
+from models import DICT_MODELS
+
+logger = logging.getLogger(__name__)
+
+
+class CollectorJob:
+    """
+    Периодический запуск одного сборщика в отдельном потоке.
+
+    Моменты запуска считаются от общей точки отсчёта (start + k * interval),
+    поэтому время самого сбора не накапливается в дрейф. Если сбор не уложился
+    в интервал, пропущенные тики не догоняются, а учитываются как overrun.
+    clock — источник монотонного времени (в тестах подменяется).
+    """
+    def __init__(self, name, run, interval, jitter=0.0, deadline=None, clock=time.monotonic):
+        self.name = name
+        self.run = run
+        self.interval = interval
+        self.jitter = jitter
+        self.deadline = deadline
+        self.clock = clock
+        self.stats = {
+            "runs": 0, "failures": 0, "overruns": 0, "skipped_ticks": 0,
+            "deadline_misses": 0, "last_run": None, "last_duration": None, "last_error": None,
+        }
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"collector-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self):
+        start = self.clock()
+        tick = 0
+        while not self._stop.is_set():
+            interval = self.interval() if callable(self.interval) else self.interval
+            # Случайный сдвиг в пределах jitter разводит сборщики разных узлов во времени
+            due = start + tick * interval + random.uniform(0, self.jitter)
+            delay = due - self.clock()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            self._run_once(interval)
+            # Следующий тик — первый, который ещё не наступил
+            elapsed = self.clock() - start
+            next_tick = max(tick + 1, math.floor(elapsed / interval) + 1)
+            if next_tick > tick + 1:
+                self.stats["overruns"] += 1
+                self.stats["skipped_ticks"] += next_tick - tick - 1
+                logger.warning("Сборщик %s не уложился в интервал %.2f с, пропущено тиков: %d",
+                               self.name, interval, next_tick - tick - 1)
+            tick = next_tick
+
+    def _run_once(self, interval):
+        started = self.clock()
+        try:
+            self.run()
+            self.stats["last_error"] = None
+        except Exception as e:
+            self.stats["failures"] += 1
+            self.stats["last_error"] = str(e)
+            logger.exception("Ошибка сборщика %s", self.name)
+        duration = self.clock() - started
+        self.stats["runs"] += 1
+        self.stats["last_run"] = time.time()
+        self.stats["last_duration"] = duration
+        deadline = self.deadline if self.deadline is not None else interval
+        if duration > deadline:
+            self.stats["deadline_misses"] += 1
+            logger.warning("Сборщик %s превысил дедлайн %.2f с (%.2f с)", self.name, deadline, duration)
+
+
+class CollectorScheduler:
+    """
+    Фоновый сбор данных всеми включёнными сборщиками с их интервалами и
+    задание HOUSEKEEPING для фоновых задач менеджера (manager.housekeeping)
+    """
+    HOUSEKEEPING = "_housekeeping"
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.jobs = {}
+
+    def start(self):
+        if self.is_running():
+            return
+        self.jobs = {}
+        for name in self.manager.get_enabled_collectors():
+            collector = self.manager.collectors[name]
+            cfg = self.manager.config_manager.get_collector_config(name)
+            self.jobs[name] = CollectorJob(
+                name,
+                run=lambda name=name: self.manager.collect_with_timeout(name),
+                interval=lambda collector=collector: collector.interval,
+                jitter=cfg.get("jitter", 0.0),
+                deadline=cfg.get("deadline"),
+            )
+        self.jobs[self.HOUSEKEEPING] = CollectorJob(self.HOUSEKEEPING, run=self.manager.housekeeping,
+                                                    interval=self.manager.HOUSEKEEPING_INTERVAL)
+        for job in self.jobs.values():
+            job.start()
+
+    def stop(self, timeout=5):
+        for job in self.jobs.values():
+            job._stop.set()
+        for job in self.jobs.values():
+            job.stop(timeout)
+
+    def is_running(self):
+        return any(job.is_alive() for job in self.jobs.values())
+
+    def get_stats(self):
+        return {name: dict(job.stats) for name, job in self.jobs.items()}
+
 
 class SystemManager:
+    STALE_INTERVALS = 3  # замер считается устаревшим, если старше стольких интервалов сбора
+    DEFAULT_TIMEOUT = 10.0  # сек на collect/find_objects одного сборщика (ключ "timeout" в конфиге)
+    HOUSEKEEPING_INTERVAL = 1.0  # сек между фоновыми задачами в планировщике
+    MODEL_CHECK_INTERVAL = 60.0  # сек между проверками устаревших моделей
+
     def __init__(self):
         self.config_manager = ConfigManager()
         self.data = None
         self.predictions = {}
         self.setup_config()
+        self.scheduler = CollectorScheduler(self)
+        # Новые замеры рассылаются подписчикам (SSE) сразу после сбора
+        self.broadcaster = SampleBroadcaster()
+        # Последний замер каждого сборщика — для страниц статуса без синхронного сбора
+        self._latest = {}
+        self._latest_lock = threading.Lock()
+        # Сборщики опрашиваются параллельно: такт длится как самый медленный из них
+        self.executor = CollectorExecutor(max_workers=max(4, 2 * len(self.collectors)))
+        self._features = None
+        # Обученные модели с диска загружаются в фоне, чтобы первый прогноз не ждал обучения
+        self.model_store = ModelStore(**self.config_manager.get_config().get("model_store", {}))
+        self.model_store.warm_async()
+        self._models_checked_at = None
+        self._closed = False
 
     def setup_config(self):
         self.collectors = {}
         self.models = {}
 
         DICT_COLLECT_FOR_OS = DICT_COLLECTORS.get(self.config_manager.get_system())
+        enabled = self.config_manager.get_enabled_collectors()
         for name, config in self.config_manager.get_collectors().items():
-            self.collectors[name] = DICT_COLLECT_FOR_OS.get(name)(config)
+            # Модули выключенных сборщиков не импортируются
+            if enabled is not None and name not in enabled:
+                continue
+            self.collectors[name] = DICT_COLLECT_FOR_OS[name](config)
             # self.register_collector(name, config)
 
-    def find_objects(self):
-        result = {}
+    def get_enabled_collectors(self):
+        enabled = self.config_manager.get_enabled_collectors()
+        return [name for name in self.collectors if enabled is None or name in enabled]
+
+    # --- Фоновый сбор ---
+    def start_sampling(self):
+        self.scheduler.start()
+
+    def get_timeout(self, name):
+        return self.config_manager.get_collector_config(name).get("timeout", self.DEFAULT_TIMEOUT)
+
+    def stop_sampling(self):
+        self.scheduler.stop()
+        # Буферизованные замеры не должны теряться при остановке
+        for collector in self.collectors.values():
+            if hasattr(collector, "flush"):
+                collector.flush()
+
+    def close(self):
+        """
+        Остановить сбор, пул потоков и закрыть хранилища сборщиков (при завершении процесса).
+        Повторный вызов ничего не делает: close может быть и в atexit, и вызван явно.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.stop_sampling()
+        self.executor.shutdown()
+        for collector in self.collectors.values():
+            if hasattr(collector, "close"):
+                collector.close()
+
+    def housekeeping(self):
+        """Фоновые задачи, которые планировщик выполняет каждые HOUSEKEEPING_INTERVAL секунд"""
+        # Буфер записи сбрасывается по max_delay, даже если сборщик больше не присылает замеров
         for name, collector in self.collectors.items():
-            try:
-                objects = collector.find_objects()
-            except Exception as e:
-                objects = []
-            result[name] = {"objects": objects}
+            if hasattr(collector, "flush_due"):
+                try:
+                    collector.flush_due()
+                except Exception:
+                    logger.exception("Не удалось записать буфер сборщика %s", name)
+        now = time.monotonic()
+        if self._models_checked_at is None or now - self._models_checked_at >= self.MODEL_CHECK_INTERVAL:
+            self._models_checked_at = now
+            self.refit_stale_models()
+
+    def find_objects(self, timeout=None):
+        """
+        Объекты всех сборщиков, опрошенных параллельно. Не уложившиеся в таймаут
+        возвращаются с пустым списком и status="timeout".
+        """
+        calls = {name: (collector.find_objects, timeout or self.get_timeout(name))
+                 for name, collector in self.collectors.items()}
+        result = {}
+        for name, r in self.executor.run("find_objects", calls).items():
+            result[name] = {"objects": r["result"] or [], "status": r["status"], "error": r["error"]}
         return result
 
     # # --- Регистрация ---
@@ -41,19 +245,240 @@ class SystemManager:
     def register_model(self, name: str, model_cls):
         self.models[name] = model_cls
 
+    def get_model(self, name):
+        """Класс модели: зарегистрированный через register_model или из реестра DICT_MODELS"""
+        if name not in self.models:
+            self.models[name] = DICT_MODELS[name]
+        return self.models[name]
+
     # --- Работа с данными ---
     def collect_data(self, collector_name: str, objects=None):
         collector = self.collectors[collector_name]
         # objects = objects or collector.discover_objects()
-        self.data = collector.collect()
+        # Замер без DataFrame: кэш последних значений и SSE работают со словарём
+        with REGISTRY.timer("collector_sample_seconds", collector=collector.__class__.__name__):
+            self.data = collector.sample()
+        sample = self.data.as_dict()
+        self._set_latest(collector_name, sample, source="sampler")
+        if len(self.broadcaster):
+            self.broadcaster.publish(collector_name, sample)
         return self.data
 
+    def collect_with_timeout(self, collector_name, timeout=None):
+        """collect_data в пуле с дедлайном; при таймауте — TimeoutError, сбор досчитается в фоне"""
+        r = self.executor.run("collect", {
+            collector_name: (lambda: self.collect_data(collector_name), timeout or self.get_timeout(collector_name)),
+        })[collector_name]
+        if r["status"] == "ok":
+            return r["result"]
+        if r["status"] == "error":
+            raise RuntimeError(r["error"])
+        raise TimeoutError(r["error"])
+
+    def collect_all(self, names=None, timeout=None):
+        """
+        Один такт по всем (или указанным) включённым сборщикам одновременно.
+        {имя: {"status", "result" (Sample или None), "error", "duration"}} —
+        частичный результат: упавшие и зависшие сборщики помечены, остальные собраны.
+        """
+        names = names or self.get_enabled_collectors()
+        calls = {name: (lambda name=name: self.collect_data(name), timeout or self.get_timeout(name))
+                 for name in names}
+        return self.executor.run("collect", calls)
+
+    # --- Последние замеры ---
+    def _set_latest(self, collector_name, sample, source):
+        entry = {"sample": sample, "collected_at": sample.get("timestamp") or time.time(), "source": source}
+        with self._latest_lock:
+            self._latest[collector_name] = entry
+
+    def _seed_latest(self, collector_name):
+        """Если сбор ещё не выполнялся — взять последнюю строку из истории"""
+        collector = self.collectors[collector_name]
+        if not hasattr(collector, "get_last_sample"):
+            return
+        try:
+            sample = collector.get_last_sample()
+            if sample is not None:
+                self._set_latest(collector_name, sample.as_dict(), source="history")
+        except Exception:
+            logger.exception("Не удалось прочитать последний замер %s из истории", collector_name)
+
+    def get_latest(self, collector_name=None):
+        """
+        Последние замеры без обращения к оборудованию: {имя: {"sample", "collected_at",
+        "age", "interval", "stale", "source", "error"}}. stale — замер старше
+        STALE_INTERVALS интервалов сбора (сбор остановлен или не успевает).
+        """
+        names = [collector_name] if collector_name is not None else list(self.collectors)
+        stats = self.scheduler.get_stats()
+        now = time.time()
+        result = {}
+        for name in names:
+            if name not in self._latest:
+                self._seed_latest(name)
+            with self._latest_lock:
+                entry = dict(self._latest.get(name) or {"sample": None, "collected_at": None, "source": None})
+            interval = float(getattr(self.collectors[name], "interval", 1))
+            collected_at = entry["collected_at"]
+            entry["age"] = now - collected_at if collected_at is not None else None
+            entry["interval"] = interval
+            entry["stale"] = entry["age"] is None or entry["age"] > self.STALE_INTERVALS * interval
+            entry["error"] = stats.get(name, {}).get("last_error")
+            result[name] = entry
+        return result
+
     # --- Работа с моделями ---
-    def apply_model(self, model_name: str):
-        if self.data is None:
-            raise ValueError("Нет данных для применения модели")
-        model = self.models[model_name]()
-        model.fit(self.data)  # если модель обучаемая
-        preds = model.predict(self.data)
+    @property
+    def features(self):
+        """Построитель признаков по истории (раздел "features" конфига); pandas — при первом обращении"""
+        if self._features is None:
+            from core.features import FeatureBuilder
+            self._features = FeatureBuilder(**self.config_manager.get_config().get("features", {}))
+        return self._features
+
+    def build_features(self, collector_name, objects=None, columns=None):
+        """Скользящие признаки по истории сборщика (см. core.features.FeatureBuilder)"""
+        return self.features.build(collector_name, self.collectors[collector_name], objects, columns)
+
+    def get_model_params(self, name):
+        """Параметры модели из конфига: "models" — список имён или словарь имя -> параметры"""
+        models = self.config_manager.get_config().get("models", [])
+        params = models.get(name) if isinstance(models, dict) else None
+        return params if isinstance(params, dict) else {}
+
+    def apply_model(self, model_name: str, collector_name=None, objects=None, refit=False):
+        """
+        Прогноз модели. С collector_name — по матрице скользящих признаков из истории
+        сборщика (objects — по объектам) моделью, обученной раньше и сохранённой в
+        model_store; обучается она только при первом вызове, при refit=True или
+        (в фоне) по истечении refit_interval. Модели с supports_partial_fit вместо
+        этого дообучаются на строках, появившихся после прошлого вызова.
+        Без collector_name — обучение и прогноз по последнему замеру.
+        """
+        if collector_name is None:
+            if self.data is None:
+                raise ValueError("Нет данных для применения модели")
+            data = self.data.to_frame()
+            model = self.get_model(model_name)(**self.get_model_params(model_name))
+            model.fit(data)  # если модель обучаемая
+        else:
+            data = self.build_features(collector_name, objects)
+            if data.empty:
+                raise ValueError(f"Нет истории {collector_name} для применения модели")
+            model = self.get_fitted_model(model_name, collector_name, objects, data, refit)
+        preds = model.predict(data)
         self.predictions[model_name] = preds
         return preds
+
+    def get_fitted_model(self, model_name, collector_name, objects, data, refit=False):
+        """Обученная модель для признаков data: из model_store или обученная сейчас"""
+        model_cls = self.get_model(model_name)
+        params = self.get_model_params(model_name)
+        key = artifact_key(model=f"{model_cls.__module__}.{model_cls.__qualname__}", params=params,
+                           collector=collector_name, objects=objects, columns=list(data.columns))
+        entry = None if refit else self.model_store.get(model_name, key)
+        if entry is None:
+            with self.model_store.key_lock(key):
+                # Пока ждали блокировку, модель мог обучить другой поток
+                entry = None if refit else self.model_store.get(model_name, key)
+                if entry is None:
+                    entry = self._fit_model(model_name, key, collector_name, objects, data,
+                                            reason="refit" if refit else "new")
+        elif getattr(model_cls, "supports_partial_fit", False):
+            entry = self._update_model(model_name, key, data, entry)
+        elif self.model_store.is_stale(entry[1]):
+            self._refit_in_background(model_name, key, collector_name, objects)
+        return entry[0]
+
+    def _update_model(self, model_name, key, data, entry):
+        """Дообучить модель (partial_fit) только на строках новее тех, на которых она уже обучена"""
+        if "timestamp" not in data or data["timestamp"].iloc[-1] <= (entry[1].get("last_ts") or 0):
+            return entry
+        with self.model_store.key_lock(key):
+            # Другой поток мог дообучить модель, пока ждали блокировку
+            model, meta = self.model_store.get(model_name, key) or entry
+            new = data[data["timestamp"] > (meta.get("last_ts") or 0)]
+            if new.empty:
+                return model, meta
+            # Дообучается копия: прогнозы в других потоках продолжают идти по прежней модели,
+            # пока put не заменит её целиком
+            model = copy.deepcopy(model)
+            with REGISTRY.timer("model_update_seconds", model=model_name):
+                model.partial_fit(new)
+            REGISTRY.inc("model_fits_total", model=model_name, reason="partial")
+            meta = self.model_store.put(model_name, key, model, dict(
+                meta, rows=meta.get("rows", 0) + len(new), last_ts=float(new["timestamp"].iloc[-1]),
+                updated_at=time.time()))
+            return model, meta
+
+    def _fit_model(self, model_name, key, collector_name, objects, data, reason):
+        model_cls = self.get_model(model_name)
+        params = self.get_model_params(model_name)
+        model = model_cls(**params)
+        started = time.perf_counter()
+        with REGISTRY.timer("model_fit_seconds", model=model_name):
+            model.fit(data)
+        REGISTRY.inc("model_fits_total", model=model_name, reason=reason)
+        timestamps = data["timestamp"] if "timestamp" in data else None
+        meta = self.model_store.put(model_name, key, model, {
+            "class": f"{model_cls.__module__}.{model_cls.__qualname__}",
+            "params": params,
+            "collector": collector_name,
+            "objects": objects,
+            "columns": list(data.columns),
+            "fitted_at": time.time(),
+            "fit_seconds": time.perf_counter() - started,
+            "rows": len(data),
+            "first_ts": float(timestamps.iloc[0]) if timestamps is not None else None,
+            "last_ts": float(timestamps.iloc[-1]) if timestamps is not None else None,
+        })
+        return model, meta
+
+    def refit_stale_models(self):
+        """
+        Переобучить в фоне устаревшие (старше refit_interval) модели текущей конфигурации,
+        не дожидаясь прогноза; дообучаемые (supports_partial_fit) пропускаются.
+        Возвращает число запущенных переобучений.
+        """
+        models = self.config_manager.get_config().get("models", [])
+        started = 0
+        for meta in self.model_store.stale():
+            name, collector_name = meta.get("model"), meta.get("collector")
+            if name not in models or collector_name not in self.collectors:
+                continue
+            try:
+                model_cls = self.get_model(name)
+            except Exception:
+                logger.exception("Не удалось загрузить класс модели %s", name)
+                continue
+            # Модели прежних параметров и классов (другие ключи той же линии) не переобучаются
+            if getattr(model_cls, "supports_partial_fit", False) \
+                    or meta.get("class") != f"{model_cls.__module__}.{model_cls.__qualname__}" \
+                    or meta.get("params") != self.get_model_params(name):
+                continue
+            if self._refit_in_background(name, meta["key"], collector_name, meta.get("objects")):
+                started += 1
+        return started
+
+    def _refit_in_background(self, model_name, key, collector_name, objects):
+        """Переобучить устаревшую модель в фоне; до замены прогнозы делает прежняя. False — уже обучается"""
+        lock = self.model_store.key_lock(key)
+        if not lock.acquire(blocking=False):
+            return False
+
+        def refit():
+            try:
+                data = self.build_features(collector_name, objects)
+                self._fit_model(model_name, key, collector_name, objects, data, reason="scheduled")
+            except Exception:
+                logger.exception("Не удалось переобучить модель %s", model_name)
+            finally:
+                lock.release()
+
+        threading.Thread(target=refit, name=f"refit-{model_name}", daemon=True).start()
+        return True
+
+    def invalidate_models(self, model_name=None):
+        """Удалить обученные модели (все или одного имени): следующий прогноз обучит их заново"""
+        return self.model_store.invalidate(model_name)
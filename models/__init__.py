@@ -1,5 +1,8 @@
-from .tree_model import DummyTreeModel
+from core.registry import PluginRegistry
 
-DICT_MODELS = {
-    "tree": DummyTreeModel,
-}
\ No newline at end of file
+# Манифест моделей: имя -> "модуль:Класс" (импорт — при первом использовании модели).
+# Сторонние пакеты добавляют модели через точки входа группы predict_failure.models.
+DICT_MODELS = PluginRegistry({
+    "tree": "models.tree_model:DummyTreeModel",
+    "zscore": "models.zscore_model:ZScoreModel",
+}, group="predict_failure.models")
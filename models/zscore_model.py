@@ -0,0 +1,57 @@
+from base.model_base import AbstractModel
+import pandas as pd
+import numpy as np
+
+
+class ZScoreModel(AbstractModel):
+    """
+    Отклонение от нормы: по каждому признаку копятся число значений, среднее и
+    сумма квадратов отклонений (формула Чана для объединения пачек), прогноз —
+    наибольший по признакам |z| строки. Дообучается на новых строках за время,
+    пропорциональное их числу.
+    """
+    supports_partial_fit = True
+
+    def __init__(self, min_count=2):
+        self.min_count = min_count
+        self.columns = None
+        self.count = self.mean = self.m2 = None
+
+    def _matrix(self, data):
+        if self.columns is None:
+            # Признаки — вещественные колонки; timestamp и номер объекта (core) не признаки
+            self.columns = [c for c in data.columns
+                            if c != "timestamp" and pd.api.types.is_float_dtype(data[c])]
+        return data.reindex(columns=self.columns).to_numpy(np.float64)
+
+    def fit(self, data: pd.DataFrame):
+        self.columns = None
+        self.count = self.mean = self.m2 = None
+        self.partial_fit(data)
+
+    def partial_fit(self, data: pd.DataFrame):
+        x = self._matrix(data)
+        valid = ~np.isnan(x)
+        n = valid.sum(axis=0).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, np.nansum(x, axis=0) / n, 0.0)
+            m2 = np.nansum((x - mean) ** 2, axis=0)
+        if self.count is None:
+            self.count, self.mean, self.m2 = n, mean, m2
+            return
+        total = self.count + n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * n / total, 0.0)
+            self.m2 = self.m2 + m2 + np.where(total > 0, delta ** 2 * self.count * n / total, 0.0)
+        self.count = total
+
+    def predict(self, data: pd.DataFrame):
+        x = self._matrix(data)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.m2 / (self.count - 1))
+            z = np.abs(x - self.mean) / np.where((self.count >= self.min_count) & (std > 0), std, np.nan)
+        # Строки без единого сравнимого признака — 0
+        score = np.zeros(len(x)) if z.shape[1] == 0 else np.nan_to_num(
+            np.max(np.where(np.isnan(z), -np.inf, z), axis=1), neginf=0.0)
+        return pd.Series(score, index=data.index)
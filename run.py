@@ -1,72 +1,291 @@
+import atexit
+import json
 import os
+import threading
+import time
 from flask import Flask, render_template, redirect, send_file
 from flask import request, session
 from flask import url_for, jsonify
+from flask import Response, stream_with_context, g
 
 from core.system_manager import SystemManager
-
-import pandas as pd
+from core.config import ConfigManager
+from core.metrics import REGISTRY
 
 app = Flask(__name__)
 app.config["SESSION_PERMANENT"] = False
 app.secret_key = 'your_secret_key'  # Для работы сессии
+# Предельный размер тела запроса (пачки агентов); get_ingest() берёт его из ingest.max_batch_bytes
+app.config["MAX_CONTENT_LENGTH"] = 64 << 20
+
+_manager = None
+_manager_lock = threading.Lock()
+_ingest = None
+
+def get_manager():
+    """
+    SystemManager создаётся при первом обращении, а не при импорте модуля:
+    процесс-наблюдатель перезагрузчика Flask и утилиты, импортирующие run,
+    не создают сборщики и хранилища. Вместе с ним запускается фоновый сбор —
+    при любом способе запуска (python run.py, flask run, gunicorn); "sampling": false
+    в конфиге — без сбора.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = SystemManager()
+            if _manager.config_manager.get_config().get("sampling", True):
+                _manager.start_sampling()
+            atexit.register(_manager.close)
+        return _manager
+
+def get_ingest():
+    """Приём замеров от агентов (раздел "ingest" конфига); создаётся при первой пачке или запросе узлов"""
+    global _ingest
+    # numpy и хранилища нужны только центральному серверу — импорт при первом обращении
+    from core.ingest import IngestManager
+    with _manager_lock:
+        if _ingest is None:
+            _ingest = IngestManager(**ConfigManager().get_config().get("ingest", {}))
+            # Сжатая пачка не больше распакованной: большее тело отклоняется (413) до чтения
+            app.config["MAX_CONTENT_LENGTH"] = _ingest.max_batch_bytes
+            atexit.register(_ingest.close)
+        return _ingest
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def ensure_sampling():
+    # Первый запрос любого вида запускает сбор, даже если он не обращается к сборщикам
+    get_manager()
+
+@app.after_request
+def observe_request_time(response):
+    # Для потоковых ответов (SSE) учитывается время до начала передачи
+    if request.endpoint is not None:
+        REGISTRY.observe("http_request_seconds", time.perf_counter() - g.request_started,
+                         endpoint=request.endpoint, method=request.method)
+    return response
 
-manager = SystemManager()
+@app.template_filter('format_ts')
+def format_ts(ts):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if ts is not None else ""
 
 @app.route('/')
 def main():
     # return render_template('index.html', header={})
-    result = manager.find_objects()
-    print(result)
-    data = manager.collect_data('cpu')
+    result = get_manager().find_objects()
     return render_template('index.html', collectors=result)
 
 @app.route('/find_objects')
 def find_objects():
-    result = manager.find_objects()
+    result = get_manager().find_objects()
     return render_template('index.html', collectors=result)
 
 @app.route('/system_status')
 def system_status():
-    status = {}
-    for name, collector in manager.collectors.items():
-        try:
-            df = collector.collect()
-            if not df.empty:
-                status[name] = df.iloc[0].to_dict()
-        except Exception as e:
-            status[name] = {"error": str(e)}
-    return render_template('system_status.html', status=status)
+    # Значения берутся из кэша последних замеров фонового сбора — страница не ждёт оборудование
+    return render_template('system_status.html', status=get_manager().get_latest(),
+                           probes=REGISTRY.summary("collector_probe_seconds", failures="collector_probe_failures_total"))
+
+@app.route('/metrics')
+def metrics():
+    """Метрики времени опросов, замеров, чтения истории и запросов в формате Prometheus"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/status')
+def api_status():
+    """Последние замеры всех сборщиков (или одного: ?collector=cpu) со сведениями о свежести"""
+    name = request.args.get('collector')
+    if name is not None and name not in get_manager().collectors:
+        return jsonify({"error": "not found"}), 404
+    return jsonify(get_manager().get_latest(name))
+
+# Пресеты диапазона для графиков: имя -> длительность в секундах (None — вся история)
+TIME_RANGES = {
+    "15m": 15 * 60,
+    "1h": 3600,
+    "6h": 6 * 3600,
+    "24h": 24 * 3600,
+    "7d": 7 * 24 * 3600,
+    "30d": 30 * 24 * 3600,
+    "all": None,
+}
+DEFAULT_MAX_POINTS = 1000
+MAX_POINTS_LIMIT = 10000
+
+def parse_time_range():
+    """Диапазон выборки из параметров запроса: пресет range или явные start/end (Unix-время)"""
+    start = request.args.get('start', type=float)
+    end = request.args.get('end', type=float)
+    selected_range = request.args.get('range', 'custom' if start is not None or end is not None else 'all')
+    if selected_range in TIME_RANGES:
+        duration = TIME_RANGES[selected_range]
+        start = time.time() - duration if duration is not None else None
+        end = None
+    return selected_range, start, end
+
+def parse_max_points():
+    max_points = request.args.get('max_points', DEFAULT_MAX_POINTS, type=int)
+    return min(max(max_points, 10), MAX_POINTS_LIMIT)
 
 @app.route('/feature_monitor', methods=['GET'])
 def feature_monitor():
-    collectors = list(manager.collectors.keys())
+    collectors = list(get_manager().collectors.keys())
     selected_collector = request.args.get('collector', collectors[0] if collectors else '')
+    selected_object = request.args.get('object', '')
+    selected_range, start, end = parse_time_range()
+    max_points = parse_max_points()
+    objects = []
     features = []
-    df = None
+    collector_obj = None
 
     if selected_collector:
-        collector_obj = manager.collectors[selected_collector]
-        df = collector_obj.get_history()
-        features = [col for col in df.columns if col != "timestamp"]
+        collector_obj = get_manager().collectors[selected_collector]
+        objects = collector_obj.find_objects()
+        if selected_object not in objects:
+            selected_object = ''
+        features = collector_obj.get_features(objects=bool(selected_object))
 
     selected_feature = request.args.get('feature', features[0] if features else '')
     chart_data = None
 
-    if df is not None and selected_feature and not df.empty:
-        chart_data = {
-            "timestamps": df["timestamp"].tolist(),
-            "values": df[selected_feature].tolist(),
-        }
+    if collector_obj is not None and selected_feature in features:
+        df = collector_obj.get_history(start=start, end=end, max_points=max_points, columns=[selected_feature],
+                                       objects=[selected_object] if selected_object else None)
+        chart_data = series_to_json(df, selected_feature)
+        # Дальше график дополняется через /api/history с этой точки (если конец диапазона открыт)
+        chart_data["cursor"] = history_cursor(df) if end is None else None
+        chart_data["poll_interval"] = max(float(getattr(collector_obj, "interval", 1)), 1.0)
+        chart_data["window"] = TIME_RANGES.get(selected_range)
+        # Не больше max_points точек и на графике: дописанные старые точки отбрасываются
+        chart_data["max_points"] = max_points
+        chart_data["url"] = url_for('api_history', collector=selected_collector, feature=selected_feature,
+                                    object=selected_object or None, max_points=max_points)
+        # В потоке SSE только агрегированные замеры — графики по ядрам обновляются опросом
+        chart_data["stream_url"] = None if selected_object else url_for('api_stream', collector=selected_collector)
+        chart_data["feature"] = selected_feature
 
     return render_template(
         'feature_monitor.html',
         collectors=collectors,
+        objects=objects,
         features=features,
         selected_collector=selected_collector,
+        selected_object=selected_object,
         selected_feature=selected_feature,
+        time_ranges=list(TIME_RANGES),
+        selected_range=selected_range,
+        start=start,
+        end=end,
         chart_data=chart_data
     )
 
+def series_to_json(df, feature):
+    """Ряд для Chart.js: пропуски (NaN) -> null, чтобы ответ оставался корректным JSON"""
+    if df.empty:
+        return {"timestamps": [], "values": []}
+    values = df[feature].astype(object).where(df[feature].notna(), None)
+    return {"timestamps": df["timestamp"].tolist(), "values": values.tolist()}
+
+def history_cursor(df, since=None):
+    """
+    Курсор для следующего опроса — timestamp последней отданной точки. Не
+    get_last_timestamp(): замер, записанный после запроса истории, клиент бы пропустил.
+    """
+    return float(df["timestamp"].iloc[-1]) if not df.empty else since
+
+@app.route('/api/history/<collector>/<feature>')
+def api_history(collector, feature):
+    """
+    Точки ряда новее since (Unix-время) без прореживания: их дописывают к уже
+    показанному графику, и точки с другим шагом исказили бы его. Если новых точек
+    больше max_points, они не отдаются, а truncated=true — клиенту проще загрузить
+    диапазон заново. Без since — весь ряд, не более max_points точек.
+    object=cpu3 — ряд отдельного объекта (ядра).
+    """
+    collector_obj = get_manager().collectors.get(collector)
+    selected_object = request.args.get('object')
+    if collector_obj is None or feature not in collector_obj.get_features(objects=bool(selected_object)):
+        return jsonify({"error": "not found"}), 404
+    since = request.args.get('since', type=float)
+    max_points = parse_max_points()
+    df = collector_obj.get_history(start=since, max_points=max_points if since is None else None,
+                                   columns=[feature], objects=[selected_object] if selected_object else None)
+    if since is not None and not df.empty:
+        df = df[df["timestamp"] > since]
+    if since is not None and len(df) > max_points:
+        return jsonify({"timestamps": [], "values": [], "cursor": since, "truncated": True})
+    result = series_to_json(df, feature)
+    result["cursor"] = history_cursor(df, since)
+    result["truncated"] = False
+    return jsonify(result)
+
+SSE_KEEPALIVE = 15  # сек, комментарий-пинг, чтобы прокси не закрывали соединение
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events: каждый новый замер (можно ограничить ?collector=cpu&collector=...)"""
+    sub = get_manager().broadcaster.subscribe(request.args.getlist('collector') or None)
+
+    def events():
+        try:
+            yield "retry: 3000\n\n"
+            while not sub.closed:
+                items = sub.get(timeout=SSE_KEEPALIVE)
+                dropped = sub.take_dropped()
+                if dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'count': dropped})}\n\n"
+                if not items:
+                    yield ": keep-alive\n\n"
+                for name, sample in items:
+                    yield f"event: sample\ndata: {json.dumps({'collector': name, 'sample': sample})}\n\n"
+        finally:
+            get_manager().broadcaster.unsubscribe(sub)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/ingest', methods=['POST'])
+def api_ingest():
+    """Пачка замеров от агента (agent.py): JSON, сжатый zlib (Content-Encoding: deflate)"""
+    from core.ingest import IngestError
+    ingest = get_ingest()
+    if not ingest.enabled:
+        return jsonify({"error": "ingest disabled: set ingest.token in config"}), 403
+    if not ingest.check_token(request.headers.get('Authorization')):
+        return jsonify({"error": "unauthorized"}), 401
+    try:
+        result = ingest.ingest(request.get_data(), request.headers.get('Content-Encoding'))
+    except IngestError as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after is not None else {}
+        return jsonify({"error": str(e)}), e.status, headers
+    return jsonify(result)
+
+@app.route('/hosts')
+def hosts():
+    return render_template('hosts.html', hosts=get_ingest().get_hosts())
+
+@app.route('/api/hosts')
+def api_hosts():
+    """Узлы, присылающие замеры: время последней пачки, число замеров, последние значения"""
+    return jsonify(get_ingest().get_hosts())
+
+@app.route('/api/hosts/<host>/history/<collector>/<feature>')
+def api_host_history(host, collector, feature):
+    """Ряд признака сборщика узла (как /api/history для локальных сборщиков)"""
+    _, start, end = parse_time_range()
+    df = get_ingest().get_history(host, collector, start=start, end=end, max_points=parse_max_points(),
+                                  columns=[feature])
+    if df is None or (not df.empty and feature not in df.columns):
+        return jsonify({"error": "not found"}), 404
+    return jsonify(series_to_json(df, feature))
+
 if __name__ == '__main__':
-    app.run(debug=True, threaded=False, host='0.0.0.0', port=11111)
\ No newline at end of file
+    # Сбор — сразу, не дожидаясь первого запроса; в debug-режиме модуль выполняется ещё
+    # и в процессе-наблюдателе перезагрузчика, там менеджер не создаём
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        get_manager()
+    app.run(debug=True, threaded=True, host='0.0.0.0', port=11111)
\ No newline at end of file
@@ -1,11 +1,10 @@
+const formatTimestamp = ts => new Date(ts * 1000).toLocaleString();
+
 function createFeatureChart(chartData, selectedFeature){
     if (chartData) {
         const ctx = document.getElementById('featureChart').getContext('2d');
         const data = {
-            labels: chartData.timestamps.map(ts => {
-                const d = new Date(ts * 1000);
-                return d.toLocaleString();
-            }),
+            labels: chartData.timestamps.map(formatTimestamp),
             datasets: [{
                 label: selectedFeature,
                 data: chartData.values,
@@ -15,7 +14,7 @@ function createFeatureChart(chartData, selectedFeature){
                 pointRadius: 2,
             }]
         };
-        new Chart(ctx, {
+        const chart = new Chart(ctx, {
             type: 'line',
             data: data,
             options: {
@@ -29,10 +28,135 @@ function createFeatureChart(chartData, selectedFeature){
                 }
             }
         });
+        // Исходные отметки времени нужны, чтобы отрезать точки, вышедшие за окно
+        chart.timestamps = chartData.timestamps.slice();
+        return chart;
+    }
+    return null;
+}
+
+// Дописать новые точки в конец графика без его пересоздания
+function appendPoints(chart, timestamps, values, windowSeconds, maxPoints) {
+    if (!timestamps.length) return;
+    chart.timestamps.push(...timestamps);
+    chart.data.labels.push(...timestamps.map(formatTimestamp));
+    chart.data.datasets[0].data.push(...values);
+    let drop = 0;
+    if (windowSeconds) {
+        // Скользящее окно: убираем точки старше последней на windowSeconds
+        const border = timestamps[timestamps.length - 1] - windowSeconds;
+        while (drop < chart.timestamps.length && chart.timestamps[drop] < border) drop++;
+    }
+    // Без окна (весь период) график иначе рос бы без предела
+    if (maxPoints) drop = Math.max(drop, chart.timestamps.length - maxPoints);
+    if (drop) {
+        chart.timestamps.splice(0, drop);
+        chart.data.labels.splice(0, drop);
+        chart.data.datasets[0].data.splice(0, drop);
     }
+    chart.update('none');
+}
+
+// Запрос точек новее курсора. truncated — новых точек больше, чем помещается
+// на графике (вкладка долго была скрыта): страница загружает диапазон заново
+async function fetchHistory(chartData, cursor) {
+    const url = new URL(chartData.url, window.location.href);
+    if (cursor !== null) url.searchParams.set('since', cursor);
+    const response = await fetch(url);
+    if (!response.ok) return null;
+    const update = await response.json();
+    if (update.truncated) {
+        window.location.reload();
+        return null;
+    }
+    return update;
+}
+
+// Периодически запрашивать только точки новее курсора и дописывать их в график
+function startHistoryPolling(chart, chartData) {
+    let cursor = chartData.cursor;
+    let busy = false;
+    setInterval(async () => {
+        if (busy || document.hidden) return;
+        busy = true;
+        try {
+            const update = await fetchHistory(chartData, cursor);
+            if (update) {
+                appendPoints(chart, update.timestamps, update.values, chartData.window, chartData.max_points);
+                if (update.cursor !== null) cursor = update.cursor;
+            }
+        } finally {
+            busy = false;
+        }
+    }, chartData.poll_interval * 1000);
+}
+
+// Получать новые замеры через Server-Sent Events; после каждого (пере)подключения
+// догружаем пропущенное через /api/history
+function startLiveStream(chart, chartData) {
+    let cursor = chartData.cursor;
+    const append = (timestamps, values) => {
+        const fresh = timestamps.findIndex(ts => cursor === null || ts > cursor);
+        if (fresh === -1) return;
+        appendPoints(chart, timestamps.slice(fresh), values.slice(fresh), chartData.window, chartData.max_points);
+        cursor = timestamps[timestamps.length - 1];
+    };
+    const source = new EventSource(chartData.stream_url);
+    source.addEventListener('open', async () => {
+        const update = await fetchHistory(chartData, cursor);
+        if (update) append(update.timestamps, update.values);
+    });
+    source.addEventListener('sample', event => {
+        const message = JSON.parse(event.data);
+        const sample = message.sample;
+        if (sample && sample.timestamp !== undefined && chartData.feature in sample) {
+            append([sample.timestamp], [sample[chartData.feature]]);
+        }
+    });
+    window.addEventListener('beforeunload', () => source.close());
 }
 
 // Автоматически строим график при загрузке страницы
 if (typeof chartData !== 'undefined' && typeof selectedFeature !== 'undefined') {
-    createFeatureChart(chartData, selectedFeature);
-}
\ No newline at end of file
+    const featureChart = createFeatureChart(chartData, selectedFeature);
+    // Для диапазона с фиксированным концом (cursor === null) новых точек не будет
+    if (featureChart && chartData.url && chartData.cursor !== null) {
+        if (window.EventSource && chartData.stream_url) {
+            startLiveStream(featureChart, chartData);
+        } else {
+            startHistoryPolling(featureChart, chartData);
+        }
+    }
+}
+
+// Форма выбора периода: перевод "своего" диапазона в Unix-время и число точек по ширине графика
+function setupMonitorForm(form) {
+    const toInput = ts => {
+        const d = new Date(ts * 1000);
+        return new Date(d.getTime() - d.getTimezoneOffset() * 60000).toISOString().slice(0, 16);
+    };
+    const start = document.getElementById('start');
+    const end = document.getElementById('end');
+    const from = document.getElementById('range-from');
+    const to = document.getElementById('range-to');
+    if (start.value) from.value = toInput(parseFloat(start.value));
+    if (end.value) to.value = toInput(parseFloat(end.value));
+
+    form.addEventListener('submit', () => {
+        const range = document.getElementById('range');
+        if ((from.value || to.value) && document.activeElement && document.activeElement.type === 'submit') {
+            range.value = 'custom';
+        }
+        start.value = range.value === 'custom' && from.value ? new Date(from.value).getTime() / 1000 : '';
+        end.value = range.value === 'custom' && to.value ? new Date(to.value).getTime() / 1000 : '';
+        [start, end].forEach(input => { input.disabled = !input.value; });
+        // Точек не больше, чем пикселей по ширине графика
+        const container = document.querySelector('.chart-container');
+        document.getElementById('max_points').value = Math.round(container ? container.clientWidth : 1000);
+    });
+}
+
+const monitorForm = document.getElementById('monitor-form');
+if (monitorForm) {
+    setupMonitorForm(monitorForm);
+}
@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Модули проекта импортируются от корня репозитория (core.*, collectors.*), как в run.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """SystemManager со сборщиком CPU по синтетическому дереву /proc и несколькими замерами в истории"""
+    from benchmarks.procfs_fixture import FakeProcFS
+    from core.system_manager import SystemManager
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / "root")
+    fake = FakeProcFS(root, cores=2).build()
+    os.makedirs("storage/configs")
+    with open("storage/configs/config.json", "w") as f:
+        json.dump({"system": "Linux", "enabled_collectors": ["cpu"],
+                   "collectors": {"cpu": {"fs_root": root}}, "models": {"tree": {}, "zscore": {}}}, f)
+    manager = SystemManager()
+    for _ in range(5):
+        manager.collect_data("cpu")
+        fake.tick()
+    manager.collectors["cpu"].flush()
+    manager.fake = fake
+    yield manager
+    manager.close()
@@ -0,0 +1,48 @@
+import pytest
+
+import run
+
+
+@pytest.fixture
+def client(manager, monkeypatch):
+    monkeypatch.setattr(run, "_manager", manager)
+    return run.app.test_client()
+
+
+def sample(manager, count):
+    for _ in range(count):
+        manager.collect_data("cpu")
+        manager.fake.tick()
+    manager.collectors["cpu"].flush()
+
+
+def test_since_returns_raw_points(client, manager):
+    url = "/api/history/cpu/load_1m?max_points=10"
+    full = client.get(url).get_json()
+    assert len(full["timestamps"]) == 5
+    assert full["cursor"] == full["timestamps"][-1]
+
+    sample(manager, 8)
+    # Новые точки отдаются все, без прореживания
+    update = client.get(f"{url}&since={full['cursor']}").get_json()
+    history = manager.collectors["cpu"].get_history(start=full["cursor"] + 1e-6)
+    assert update["timestamps"] == history["timestamp"].tolist()
+    assert len(update["timestamps"]) == 8
+    assert update["truncated"] is False
+    assert update["timestamps"][0] > full["cursor"]
+    assert update["cursor"] == update["timestamps"][-1]
+
+
+def test_since_over_limit_is_truncated(client, manager):
+    url = "/api/history/cpu/load_1m?max_points=10"
+    cursor = client.get(url).get_json()["cursor"]
+    sample(manager, 11)
+    update = client.get(f"{url}&since={cursor}").get_json()
+    # Точек больше, чем на графике: клиент загружает диапазон заново
+    assert update == {"timestamps": [], "values": [], "cursor": cursor, "truncated": True}
+    # Без since ряд прореживается до max_points
+    assert len(client.get(url).get_json()["timestamps"]) == 10
+
+
+def test_unknown_feature(client):
+    assert client.get("/api/history/cpu/nope").status_code == 404
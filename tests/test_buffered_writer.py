@@ -0,0 +1,142 @@
+import errno
+import os
+
+import numpy as np
+import pytest
+
+from core.data_storage import BufferedWriter, TieredStore
+
+
+def test_journal_replay_after_crash(tmp_path):
+    path = str(tmp_path / "store")
+    writer = BufferedWriter(TieredStore(path), max_rows=1000, max_delay=3600)
+    for i in range(5):
+        writer.append({"timestamp": float(i), "value": i * 2.0})
+    # Падение: буфер в памяти потерян, журнал остался
+    writer._journal.close()
+
+    writer = BufferedWriter(TieredStore(path), max_rows=1000, max_delay=3600)
+    data = writer.store.read()
+    np.testing.assert_array_equal(data["timestamp"], np.arange(5))
+    np.testing.assert_array_equal(data["value"], np.arange(5) * 2.0)
+    # Восстановленные замеры записаны, журнал начат заново
+    assert os.path.getsize(os.path.join(path, "journal.jsonl")) == 0
+    writer.close()
+
+
+def test_journal_replay_skips_rows_already_written(tmp_path):
+    path = str(tmp_path / "store")
+    journal = os.path.join(path, "journal.jsonl")
+    writer = BufferedWriter(TieredStore(path), max_rows=1000, max_delay=3600)
+    for i in range(3):
+        writer.append({"timestamp": float(i), "value": float(i)})
+    with open(journal) as f:
+        lines = f.read()
+    writer.flush()
+    writer.append({"timestamp": 3.0, "value": 3.0})
+    writer._journal.close()
+    # Падение после записи пачки в хранилище, но до очистки журнала
+    with open(journal, "w") as f:
+        f.write(lines + '{"timestamp": 3.0, "value": 3.0}\n')
+
+    writer = BufferedWriter(TieredStore(path), max_rows=1000, max_delay=3600)
+    np.testing.assert_array_equal(writer.store.read()["timestamp"], [0, 1, 2, 3])
+    writer.close()
+
+
+def test_store_error_keeps_rows_in_journal(tmp_path, monkeypatch):
+    path = str(tmp_path / "store")
+    journal = os.path.join(path, "journal.jsonl")
+    writer = BufferedWriter(TieredStore(path), max_rows=1000, max_delay=3600)
+    for i in range(3):
+        writer.append({"timestamp": float(i), "value": float(i)})
+
+    def no_space(rows):
+        raise OSError(errno.ENOSPC, "No space left on device")
+    monkeypatch.setattr(writer.store, "append", no_space)
+    with pytest.raises(OSError):
+        writer.flush()
+    # Замеры не потеряны: остались и в буфере, и в журнале
+    assert len(writer) == 3
+    with open(journal) as f:
+        assert len(f.readlines()) == 3
+
+    monkeypatch.undo()
+    writer.flush()
+    np.testing.assert_array_equal(writer.store.read()["timestamp"], [0, 1, 2])
+    assert os.path.getsize(journal) == 0
+    writer.close()
+
+
+def test_close_keeps_journal_when_store_fails(tmp_path, monkeypatch):
+    path = str(tmp_path / "store")
+    writer = BufferedWriter(TieredStore(path), max_rows=1000, max_delay=3600)
+    writer.append({"timestamp": 1.0, "value": 1.0})
+
+    def io_error(rows):
+        raise OSError(errno.EIO, "Input/output error")
+    monkeypatch.setattr(writer.store, "append", io_error)
+    with pytest.raises(OSError):
+        writer.close()
+    monkeypatch.undo()
+
+    writer = BufferedWriter(TieredStore(path), max_rows=1000, max_delay=3600)
+    np.testing.assert_array_equal(writer.store.read()["timestamp"], [1])
+    writer.close()
+
+
+def test_retry_skips_rows_already_in_raw(tmp_path, monkeypatch):
+    path = str(tmp_path / "store")
+    store = TieredStore(path)
+    writer = BufferedWriter(store, max_rows=1000, max_delay=3600)
+    for i in range(3):
+        writer.append({"timestamp": float(i), "value": float(i)})
+    # Исходные данные записались, агрегаты — нет
+    tier_add = store.tiers[0].add
+
+    def tier_fails(*args, **kwargs):
+        raise OSError(errno.ENOSPC, "No space left on device")
+    monkeypatch.setattr(store.tiers[0], "add", tier_fails)
+    with pytest.raises(OSError):
+        writer.flush()
+    monkeypatch.setattr(store.tiers[0], "add", tier_add)
+    writer.append({"timestamp": 3.0, "value": 3.0})
+    writer.flush()
+    np.testing.assert_array_equal(store.raw.read()["timestamp"], [0, 1, 2, 3])
+    writer.close()
+
+
+def test_flush_due_without_new_rows(tmp_path):
+    path = str(tmp_path / "store")
+    writer = BufferedWriter(TieredStore(path), max_rows=1000, max_delay=3600)
+    writer.append({"timestamp": 1.0, "value": 1.0})
+    writer.flush_due()
+    assert len(writer.store) == 0
+    # Самый старый замер ждёт дольше max_delay — сбрасывается без следующего append
+    writer.max_delay = 0
+    writer.flush_due()
+    assert len(writer.store) == 1
+    writer.close()
+
+
+@pytest.mark.parametrize("policy, expected", [("always", 3), ("interval", 0), ("never", 0)])
+def test_journal_fsync_policy(tmp_path, monkeypatch, policy, expected):
+    path = str(tmp_path / "store")
+    writer = BufferedWriter(TieredStore(path), max_rows=1000, max_delay=3600, fsync=policy, fsync_interval=3600)
+    synced = []
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        if fd == writer._journal.fileno():
+            synced.append(fd)
+        real_fsync(fd)
+    monkeypatch.setattr(os, "fsync", fsync)
+    for i in range(3):
+        writer.append({"timestamp": float(i), "value": float(i)})
+    assert len(synced) == expected
+    if policy == "interval":
+        writer.fsync_interval = 0
+        writer.flush_due()
+        assert len(synced) == 1
+    monkeypatch.undo()
+    writer.close()
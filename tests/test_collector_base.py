@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from base.collector_base import AbstractDataCollector, Sample
+
+
+class LegacyCollector(AbstractDataCollector):
+    """Сборщик в прежнем стиле: реализует только collect()"""
+    def update_config(self, config):
+        pass
+
+    def find_objects(self):
+        return []
+
+    def collect(self, objects=None):
+        return pd.DataFrame({"timestamp": [1.5], "load": [0.25], "model": ["x"]})
+
+
+class SampleCollector(AbstractDataCollector):
+    def update_config(self, config):
+        pass
+
+    def find_objects(self):
+        return []
+
+    def sample(self, objects=None):
+        return Sample(("timestamp", "load"), (2.0, 0.5))
+
+
+class EmptyCollector(AbstractDataCollector):
+    def update_config(self, config):
+        pass
+
+    def find_objects(self):
+        return []
+
+
+def test_collect_only_collector_still_works():
+    sample = LegacyCollector().sample()
+    assert sample.fields == ("timestamp", "load", "model")
+    assert sample.as_dict() == {"timestamp": 1.5, "load": 0.25, "model": "x"}
+    assert type(sample["load"]) is float
+
+
+def test_collect_wraps_sample():
+    frame = SampleCollector().collect()
+    assert frame.to_dict("list") == {"timestamp": [2.0], "load": [0.5]}
+
+
+def test_collector_without_either_method():
+    collector = EmptyCollector()
+    with pytest.raises(NotImplementedError):
+        collector.sample()
+    with pytest.raises(NotImplementedError):
+        collector.collect()
@@ -0,0 +1,172 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.procfs_fixture import FakeProcFS
+from collectors.cpu_collector import CpuCollectorLinux
+from core.metrics import REGISTRY
+
+
+def write(root, path, text):
+    full = os.path.join(root, path.lstrip("/"))
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "w") as f:
+        f.write(text)
+
+
+def write_stat(root, cpus):
+    """/proc/stat по строкам счётчиков ядер; строка cpu — их сумма"""
+    total = np.sum(cpus, axis=0)
+    lines = ["cpu  " + " ".join(map(str, total))]
+    lines += [f"cpu{i} " + " ".join(map(str, row)) for i, row in enumerate(cpus)]
+    lines += ["intr 1000 0 0", "ctxt 5000", "btime 1700000000", "procs_running 1", "procs_blocked 0"]
+    write(root, "/proc/stat", "\n".join(lines) + "\n")
+
+
+@pytest.fixture
+def collector(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / "root")
+    write(root, "/sys/devices/system/cpu/online", "0-1\n")
+    collector = CpuCollectorLinux({"fs_root": root})
+    collector.root = root
+    yield collector
+    collector.close()
+
+
+def test_guest_time_not_counted_twice(collector):
+    #                user nice sys idle iowait irq softirq steal guest guest_nice
+    write_stat(collector.root, [[100, 0, 50, 800, 50, 0, 0, 0, 0, 0],
+                                [100, 0, 50, 800, 50, 0, 0, 0, 0, 0]])
+    assert collector._cpu_times_delta(collector._snapshot()) is None
+    collector._per_core_deltas(*_core_times(collector))
+    # Виртуальная машина заняла ядро 0 на 100 тиков: guest растёт вместе с user
+    write_stat(collector.root, [[200, 0, 50, 850, 50, 0, 0, 0, 100, 0],
+                                [100, 0, 50, 950, 50, 0, 0, 0, 0, 0]])
+    snap = collector._snapshot()
+    assert collector._cpu_times_delta(snap) == (300, 200, 0)
+    assert collector._get_cpu_usage(snap) == pytest.approx(100 / 3)
+
+    usage, idle = collector._per_core_deltas(*_core_times(collector))
+    np.testing.assert_allclose(usage, [100 * 2 / 3, 0])
+    np.testing.assert_allclose(idle, [100 / 3, 100])
+
+
+def _core_times(collector):
+    cpus = collector._snapshot().stat["cpus"]
+    ids = np.array(sorted(int(name[3:]) for name in cpus), dtype=np.int64)
+    return ids, np.array([cpus[f"cpu{i}"] for i in ids], dtype=np.int64)
+
+
+def test_sample_from_procfs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / "root")
+    fake = FakeProcFS(root, cores=4, btime=1700000000).build()
+    collector = CpuCollectorLinux({"fs_root": root})
+    try:
+        first = collector.sample().as_dict()
+        # Загрузка считается по приращениям: на первом тике её ещё нет
+        assert first["cpu_usage_percent"] is None
+        assert (first["load_1m"], first["load_5m"], first["load_15m"]) == (0.52, 0.58, 0.59)
+        assert first["boot_time"] == 1700000000
+        assert first["processes_total"] == 100
+        assert first["cores"] == 4 and first["physical_cores"] == 2
+        assert first["cpu_model"] == "Synthetic CPU @ 2.40GHz"
+        assert (first["cpu_freq_min_ghz"], first["cpu_freq_max_ghz"]) == (0.8, 3.5)
+        assert collector.find_objects() == ["cpu0", "cpu1", "cpu2", "cpu3"]
+
+        fake.tick()
+        second = collector.sample().as_dict()
+        assert 0 <= second["cpu_usage_percent"] <= 100
+        assert second["cpu_usage_percent"] + second["cpu_idle_percent"] == pytest.approx(100)
+        assert second["context_switches"] > first["context_switches"]
+    finally:
+        collector.close()
+
+
+def test_per_core_metrics(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / "root")
+    fake = FakeProcFS(root, cores=4).build()
+    collector = CpuCollectorLinux({"fs_root": root})
+    try:
+        first = collector._get_per_core(collector._snapshot())
+        np.testing.assert_array_equal(first["core"], [0, 1, 2, 3])
+        assert np.isnan(first["cpu_usage_percent"]).all()
+        np.testing.assert_allclose(first["cpu_freq_current_ghz"], [2.4, 2.5, 2.6, 2.7])
+        # coretemp: по два логических CPU на физическое ядро
+        np.testing.assert_allclose(first["cpu_temp_celsius"], [40, 41, 40, 41])
+
+        before = fake._times.copy()
+        fake.tick()
+        delta = fake._times - before
+        data = collector._get_per_core(collector._snapshot(), objects=["cpu1", "cpu3"])
+        np.testing.assert_array_equal(data["core"], [1, 3])
+        busy = delta[:, 0] + delta[:, 2]
+        np.testing.assert_allclose(data["cpu_usage_percent"], busy[[1, 3]] / delta[[1, 3]].sum(axis=1) * 100)
+        np.testing.assert_allclose(data["cpu_usage_percent"] + data["cpu_idle_percent"], 100)
+    finally:
+        collector.close()
+
+
+def test_per_core_resets_on_hotplug(collector):
+    ids, times = np.array([0, 1]), np.array([[10, 0, 0, 90, 0], [10, 0, 0, 90, 0]])
+    collector._per_core_deltas(ids, times)
+    usage, _ = collector._per_core_deltas(ids, times + [[50, 0, 0, 50, 0], [0, 0, 0, 100, 0]])
+    np.testing.assert_allclose(usage, [50, 0])
+    # Набор ядер изменился — приращения не считаются до следующего тика
+    usage, idle = collector._per_core_deltas(np.array([0, 1, 2]), np.zeros((3, 5), dtype=np.int64))
+    assert np.isnan(usage).all() and np.isnan(idle).all()
+
+
+def test_core_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / "root")
+    fake = FakeProcFS(root, cores=2).build()
+    collector = CpuCollectorLinux({"fs_root": root})
+    try:
+        for _ in range(3):
+            collector.sample()
+            fake.tick()
+        collector.flush()
+        df = collector.get_history(objects=["cpu1"])
+        assert list(df["core"].unique()) == [1]
+        assert len(df) == 3
+        assert collector.get_features(objects=True) == [
+            "cpu_usage_percent", "cpu_idle_percent", "cpu_freq_current_ghz", "cpu_temp_celsius"]
+    finally:
+        collector.close()
+
+
+def test_swallowed_probe_failure_is_counted(collector):
+    key = ("collector_probe_failures_total", (("collector", "CpuCollectorLinux"), ("probe", "_get_loadavg")))
+    before = REGISTRY._counters.get(key, 0)
+    # /proc/loadavg в дереве нет: опрос возвращает нули и учитывается как сбой
+    assert collector._get_loadavg(collector._snapshot()) == (0.0, 0.0, 0.0)
+    assert REGISTRY._counters[key] == before + 1
+
+
+def test_static_join_on_rollups(collector):
+    # Сто минут замеров раз в 10 с, на середине — перезагрузка с другим числом ядер
+    ts = 1700003000.0 + np.arange(600) * 10.0
+    boot = np.where(np.arange(600) < 300, 1700000000, 1700002000)
+    collector._store.append({"timestamp": ts, "boot_time": boot, "load_1m": np.ones(600)})
+    collector.flush()
+    collector._static = {"cores": 2, "cpu_model": "old"}
+    collector._save_static(1700000000)
+    collector._static = {"cores": 4, "cpu_model": "new"}
+    collector._save_static(1700002000)
+
+    # Из минутных агрегатов: boot_time — среднее по корзине
+    df = collector.get_history(max_points=20)
+    assert len(df) == 20
+    assert df["cores"].notna().all()
+    assert set(df["cores"]) == {2, 4}
+    assert (df["cpu_model"] == np.where(df["cores"] == 2, "old", "new")).all()
+    assert df["cores"].is_monotonic_increasing
+
+    raw = collector.get_history()
+    assert raw["cores"].tolist() == [2] * 300 + [4] * 300
+    only = collector.get_history(columns=["load_1m", "cpu_model"], max_points=20)
+    assert list(only.columns) == ["timestamp", "load_1m", "cpu_model"]
@@ -0,0 +1,98 @@
+import errno
+import os
+
+import numpy as np
+import pytest
+
+from core.data_storage import INT_NA, TimeSeriesStore
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / "store")
+    store = TimeSeriesStore(path, segment_rows=4)
+    ts = np.arange(10, dtype=np.float64)
+    store.append({"timestamp": ts, "value": ts * 1.5})
+    # Новая колонка дополняет прежние строки пропусками; None в целой колонке — INT_NA
+    store.append({"timestamp": [10.0, 11.0], "value": [15.0, None], "count": [7, 8]})
+    store.append({"timestamp": [12.0], "value": [18.0], "count": [None]})
+    store.close()
+
+    store = TimeSeriesStore(path, segment_rows=4)
+    assert len(store) == 13
+    assert len(store.index["segments"]) == 4
+    data = store.read()
+    np.testing.assert_array_equal(data["timestamp"], np.arange(13))
+    assert np.isnan(data["value"][11])
+    np.testing.assert_array_equal(np.delete(data["value"], 11), np.delete(np.arange(13) * 1.5, 11))
+    assert data["count"].dtype == np.int64
+    np.testing.assert_array_equal(data["count"], [INT_NA] * 10 + [7, 8, INT_NA])
+
+    part = store.read(start=3, end=8, columns=["value"])
+    np.testing.assert_array_equal(part["timestamp"], np.arange(3, 9))
+    np.testing.assert_array_equal(part["value"], np.arange(3, 9) * 1.5)
+    store.close()
+
+
+def test_store_repairs_uncommitted_tail(tmp_path):
+    path = str(tmp_path / "store")
+    store = TimeSeriesStore(path)
+    store.append({"timestamp": [1.0, 2.0, 3.0], "value": [10.0, 20.0, 30.0]})
+    seg = store.index["segments"][-1]
+    files = [store._column_path(seg["id"], name) for name in seg["columns"]]
+    store.close()
+    # Процесс упал после записи колонок, но до сохранения index.json
+    for file in files:
+        with open(file, "ab") as f:
+            f.write(np.array([4.0, 5.0]).tobytes())
+
+    store = TimeSeriesStore(path)
+    assert all(os.path.getsize(file) == 3 * 8 for file in files)
+    store.append({"timestamp": [6.0], "value": [60.0]})
+    data = store.read()
+    np.testing.assert_array_equal(data["timestamp"], [1, 2, 3, 6])
+    np.testing.assert_array_equal(data["value"], [10, 20, 30, 60])
+    store.close()
+
+
+def test_store_truncates_segment_to_surviving_rows(tmp_path):
+    path = str(tmp_path / "store")
+    store = TimeSeriesStore(path)
+    store.append({"timestamp": [1.0, 2.0, 3.0], "value": [10.0, 20.0, 30.0]})
+    seg = store.index["segments"][-1]
+    value_file = store._column_path(seg["id"], "value")
+    store.close()
+    # Сбой питания: index.json сброшен на диск, а последняя строка колонки — нет
+    with open(value_file, "r+b") as f:
+        f.truncate(2 * 8)
+
+    store = TimeSeriesStore(path)
+    assert len(store) == 2
+    assert store.last_timestamp() == 2.0
+    store.append({"timestamp": [4.0], "value": [40.0]})
+    data = store.read()
+    np.testing.assert_array_equal(data["timestamp"], [1, 2, 4])
+    np.testing.assert_array_equal(data["value"], [10, 20, 40])
+    store.close()
+
+
+def test_store_rolls_back_failed_append(tmp_path, monkeypatch):
+    path = str(tmp_path / "store")
+    store = TimeSeriesStore(path, segment_rows=4)
+    store.append({"timestamp": [1.0, 2.0, 3.0], "value": [10.0, 20.0, 30.0]})
+    save_index = store._save_index
+
+    def no_space():
+        raise OSError(errno.ENOSPC, "No space left on device")
+    monkeypatch.setattr(store, "_save_index", no_space)
+    # Запись займёт и новый сегмент: ни он, ни хвост прежнего не должны остаться
+    with pytest.raises(OSError):
+        store.append({"timestamp": [4.0, 5.0, 6.0], "value": [40.0, 50.0, 60.0], "count": [1, 2, 3]})
+    assert len(store) == 3
+    assert len(store.index["segments"]) == 1
+
+    monkeypatch.setattr(store, "_save_index", save_index)
+    store.append({"timestamp": [4.0, 5.0, 6.0], "value": [40.0, 50.0, 60.0], "count": [1, 2, 3]})
+    data = store.read()
+    np.testing.assert_array_equal(data["timestamp"], [1, 2, 3, 4, 5, 6])
+    np.testing.assert_array_equal(data["count"], [INT_NA] * 3 + [1, 2, 3])
+    store.close()
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from core.downsampling import downsample_frame, lttb
+
+
+def test_lttb_keeps_endpoints_and_count():
+    rng = np.random.default_rng(1)
+    x = np.arange(1000, dtype=np.float64)
+    y = rng.normal(size=len(x)).cumsum()
+    for n_out in (3, 10, 100, 999):
+        idx = lttb(x, y, n_out)
+        assert len(idx) == n_out
+        assert idx[0] == 0 and idx[-1] == len(x) - 1
+        assert (np.diff(idx) > 0).all()
+
+
+def test_lttb_small_outputs():
+    x = np.arange(10, dtype=np.float64)
+    np.testing.assert_array_equal(lttb(x, x, 20), np.arange(10))
+    np.testing.assert_array_equal(lttb(x, x, 2), [0, 9])
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(500, dtype=np.float64)
+    y = np.zeros(len(x))
+    y[237] = 100.0
+    assert 237 in lttb(x, y, 20)
+
+
+def test_downsample_sum_preserves_totals():
+    df = pd.DataFrame({"timestamp": np.arange(100, dtype=np.float64), "events": np.ones(100)})
+    result = downsample_frame(df, 7, method="sum")
+    assert len(result) == 7
+    assert result["events"].sum() == 100
+    assert result["timestamp"].iloc[0] == 0
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from benchmarks.procfs_fixture import FakeProcFS
+from collectors.drive_collector import DriveCollectorLinux, find_attrlog, parse_attrlog_line
+from collectors.procfs import ReplayProcFS
+
+
+class ReplayDriveCollector(DriveCollectorLinux):
+    def _open_fs(self, config):
+        return ReplayProcFS(config["trace"])
+
+
+def test_smart_is_recorded_and_replayed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / "root")
+    trace = str(tmp_path / "trace.jsonl.gz")
+    fake = FakeProcFS(root, cores=1, disks=2).build()
+    collector = DriveCollectorLinux({"fs_root": root, "record": trace})
+    samples = []
+    for _ in range(3):
+        samples.append(collector.sample().as_dict())
+        fake.tick()
+    smart = collector._smart
+    collector.close()
+    # Журналы smartd читаются через fs: с учётом fs_root
+    assert smart["sdb"]["reallocated_sectors"] == 1
+    assert smart["sdb"]["power_on_hours"] == 20001
+
+    monkeypatch.chdir(tmp_path / "root")
+    replay = ReplayDriveCollector({"trace": trace})
+    try:
+        assert [replay.sample().as_dict() for _ in samples] == samples
+        assert replay._smart == smart
+    finally:
+        replay.close()
+
+
+@pytest.fixture
+def drive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / "root")
+    FakeProcFS(root, cores=1, disks=2).build()
+    collector = DriveCollectorLinux({"fs_root": root})
+    yield collector
+    collector.close()
+
+
+def test_selects_whole_disks(drive):
+    # Разделы и loop-устройства из diskstats не собираются
+    assert drive.find_objects() == ["sda", "sdb"]
+    assert drive._device_info["sdb"]["serial"] == "SN000001"
+    assert drive._device_info["sda"]["size_bytes"] == 7814037168 * 512
+
+
+def test_diskstats_rates(drive):
+    names = ("sda",)
+    #                    reads merged sectors ms  writes merged sectors ms  in_flight io_ms weighted
+    first = np.array([[100, 0, 800, 400, 50, 0, 800, 100, 1, 1000, 2000]])
+    second = np.array([[300, 0, 2400, 1400, 150, 0, 1600, 300, 3, 1500, 3000]])
+    data = drive._get_rates(names, first, 10.0)
+    assert np.isnan(data["read_iops"]).all()
+    data = drive._get_rates(names, second, 12.0)
+    assert data["read_iops"][0] == 100
+    assert data["write_iops"][0] == 50
+    assert data["read_mb_s"][0] == pytest.approx(1600 * 512 / 1e6 / 2)
+    assert data["write_mb_s"][0] == pytest.approx(800 * 512 / 1e6 / 2)
+    assert data["read_await_ms"][0] == 5
+    assert data["write_await_ms"][0] == 2
+    assert data["await_ms"][0] == pytest.approx(1200 / 300)
+    assert data["util_percent"][0] == 25
+    assert data["queue_depth"][0] == 0.5
+    assert data["in_flight"][0] == 3
+
+    # Счётчик сбросился (переподключение диска) — приращение не считается
+    data = drive._get_rates(names, second - 100, 13.0)
+    assert np.isnan(data["read_iops"]).all()
+    # Набор дисков изменился — тоже
+    data = drive._get_rates(("sda", "sdb"), np.vstack([second, second]), 14.0)
+    assert np.isnan(data["write_iops"]).all()
+
+
+def test_find_attrlog_by_serial():
+    files = {
+        "synthhdd4tb7200rpmsn1": "a",
+        "synthhdd4tb7200rpmxsn1": "b",
+        "othermodelsn2": "c",
+        "vendorsynthssd512gsn2": "d",
+    }
+    # Модель в sysfs обрезана до 16 символов
+    assert find_attrlog(files, "SYNTH HDD 4TB 72", "SN1") == "a"
+    # Несколько журналов с тем же номером: выбирает модель
+    assert find_attrlog(files, "SYNTH SSD 512G", "SN2") == "d"
+    assert find_attrlog(files, "SYNTH HDD", "SN3") is None
+    assert find_attrlog(files, "SYNTH HDD", None) is None
+
+
+def test_parse_attrlog_line():
+    line = "2024-01-01 00:00:00;\t5;100;3;\t9;90;20000;\t194;64;36 (Min/Max 20/45);\n"
+    assert parse_attrlog_line(line) == {5: 3, 9: 20000, 194: 36}
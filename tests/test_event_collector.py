@@ -0,0 +1,87 @@
+import os
+
+from collectors.event_collector import EventCollector, LogTail, literal_prefixes
+
+
+def _append(path, text):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+def test_reads_only_whole_lines(tmp_path):
+    path = str(tmp_path / "kern.log")
+    _append(path, "old\n")
+    tail = LogTail(path)
+    assert tail.read(1 << 20) == b""  # файл раньше не читался: только новые строки
+    _append(path, "a\npart")
+    assert tail.read(1 << 20) == b"a\n"
+    _append(path, "ial\n")
+    assert tail.read(1 << 20) == b"partial\n"
+    tail.close()
+
+
+def test_rotation_reads_rest_of_old_file(tmp_path):
+    path = str(tmp_path / "kern.log")
+    _append(path, "")
+    tail = LogTail(path, from_start=True)
+    _append(path, "a\n")
+    assert tail.read(1 << 20) == b"a\n"
+    _append(path, "b\n")
+    os.rename(path, path + ".1")
+    _append(path, "c\n")
+    assert tail.read(1 << 20) == b"b\nc\n"
+    _append(path, "d\n")
+    assert tail.read(1 << 20) == b"d\n"
+    tail.close()
+
+
+def test_rotation_while_stopped(tmp_path):
+    path = str(tmp_path / "kern.log")
+    _append(path, "a\n")
+    tail = LogTail(path, from_start=True)
+    assert tail.read(1 << 20) == b"a\n"
+    state = tail.state()
+    tail.close()
+    # Пока сборщик не работал: дописали строку и ротировали
+    _append(path, "b\n")
+    os.rename(path, path + ".1")
+    _append(path, "c\n")
+
+    tail = LogTail(path, state)
+    assert tail.read(1 << 20) == b"b\nc\n"
+    tail.close()
+
+
+def test_copytruncate(tmp_path):
+    path = str(tmp_path / "kern.log")
+    _append(path, "")
+    tail = LogTail(path, from_start=True)
+    _append(path, "first\nsecond\n")
+    assert tail.read(1 << 20) == b"first\nsecond\n"
+    # logrotate copytruncate: тот же inode, файл обрезан до нуля
+    with open(path, "w") as f:
+        f.write("new\n")
+    assert tail.read(1 << 20) == b"new\n"
+    tail.close()
+
+
+def test_line_counts_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "kern.log")
+    _append(path, "")
+    collector = EventCollector({"files": [path], "from_start": True})
+    _append(path, "mce: [Hardware Error]: Machine check events logged\n"
+                  "EXT4-fs error (device sda1): I/O error\n"
+                  "nothing here\n"
+                  "Buffer I/O error on dev sdb\n")
+    counts, lines = collector._get_counts()
+    assert lines == 4
+    assert counts["mce"] == 1 and counts["fs_error"] == 1 and counts["io_error"] == 1
+    assert sum(counts.values()) == 3
+    assert [event for event, _, _ in collector.get_recent_events()] == ["mce", "fs_error", "io_error"]
+    collector.close()
+
+
+def test_literal_prefixes():
+    assert literal_prefixes(r"EDAC \S+|I/O error") == ["EDAC ", "I/O error"]
+    assert literal_prefixes(r"(?i:oom)") is None
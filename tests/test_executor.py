@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from core.executor import CollectorExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = CollectorExecutor(max_workers=4)
+    yield executor
+    executor.shutdown()
+
+
+def test_calls_run_concurrently(executor):
+    # Оба вызова ждут друг друга: последовательно они не уложились бы в таймаут
+    barrier = threading.Barrier(2, timeout=5)
+    results = executor.run("collect", {
+        "a": (lambda: barrier.wait() or "a", 5),
+        "b": (lambda: barrier.wait() or "b", 5),
+    })
+    assert {name: r["status"] for name, r in results.items()} == {"a": "ok", "b": "ok"}
+    assert results["a"]["result"] == "a"
+    assert results["a"]["duration"] is not None
+
+
+def test_error_is_reported(executor):
+    def fail():
+        raise OSError("нет устройства")
+
+    results = executor.run("collect", {"a": (fail, 5), "b": (lambda: 1, 5)})
+    assert results["a"]["status"] == "error"
+    assert "нет устройства" in results["a"]["error"]
+    assert results["b"] == {"status": "ok", "result": 1, "error": None, "duration": results["b"]["duration"]}
+
+
+def test_hung_call_times_out_and_blocks_repeats(executor):
+    release = threading.Event()
+    done = threading.Event()
+
+    def hang():
+        release.wait(5)
+        done.set()
+        return "late"
+
+    results = executor.run("collect", {"hung": (hang, 0.05), "fast": (lambda: "ok", 5)})
+    assert results["hung"]["status"] == "timeout"
+    assert results["hung"]["duration"] == 0.05
+    assert results["fast"]["status"] == "ok"
+
+    # Пока зависший вызов не завершился, повтор не ставится в очередь
+    assert executor.run("collect", {"hung": (lambda: "again", 5)})["hung"]["status"] == "busy"
+    # Другая операция того же сборщика — отдельный ключ
+    assert executor.run("find_objects", {"hung": (lambda: [], 5)})["hung"]["status"] == "ok"
+
+    release.set()
+    assert done.wait(5)
+    # Освобождение ключа — в done-callback, он может выполниться чуть позже
+    for _ in range(100):
+        r = executor.run("collect", {"hung": (lambda: "again", 5)})["hung"]
+        if r["status"] != "busy":
+            break
+        time.sleep(0.01)
+    assert r["status"] == "ok" and r["result"] == "again"
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.features import FeatureBuilder
+
+
+class FakeCollector:
+    """История в памяти с тем же интерфейсом get_history, что у сборщиков"""
+    STATIC_FIELDS = ["cores"]
+    NON_FEATURE_COLUMNS = ["boot_time", "uptime_sec"]
+    COUNTER_COLUMNS = ["context_switches"]
+    OBJECT_COLUMN = "core"
+
+    def __init__(self, rows, cores=2, seed=0):
+        rng = np.random.default_rng(seed)
+        ts = 1000.0 + np.arange(rows)
+        self.history = pd.DataFrame({
+            "timestamp": ts,
+            "boot_time": 900,
+            "uptime_sec": ts - 900,
+            "load": rng.random(rows),
+            "context_switches": np.cumsum(rng.integers(100, 200, rows)),
+        })
+        self.cores = pd.DataFrame({
+            "timestamp": np.repeat(ts, cores),
+            "core": np.tile(np.arange(cores), rows),
+            "usage": rng.random(rows * cores) * 100,
+        })
+        self.calls = []
+
+    def get_history(self, start=None, end=None, max_points=None, columns=None, static=True, objects=None):
+        self.calls.append({"start": start, "static": static})
+        if objects is not None:
+            df = self.cores[self.cores["core"].isin([int(o[3:]) for o in objects])]
+        else:
+            df = self.history.copy()
+            if static:
+                df["cores"] = 2
+        if start is not None:
+            df = df[df["timestamp"] >= start]
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df.reset_index(drop=True)
+
+
+def test_static_and_counters_excluded():
+    collector = FakeCollector(20)
+    df = FeatureBuilder(windows=(3,)).build("cpu", collector)
+    assert collector.calls[0]["static"] is False
+    sources = {c.rsplit("_", 2)[0] for c in df.columns if c != "timestamp"}
+    assert sources == {"load", "context_switches_rate"}
+    # Скорость счётчика — приращение за секунду между соседними замерами
+    rate = collector.history["context_switches"].diff()
+    np.testing.assert_allclose(df["context_switches_rate_mean_3"][2:],
+                               rate.rolling(3, min_periods=1).mean()[2:])
+
+
+@pytest.mark.parametrize("objects", [None, ["cpu0", "cpu1"]])
+def test_incremental_matches_full_build(objects):
+    collector = FakeCollector(200)
+    history, cores = collector.history, collector.cores
+    builder = FeatureBuilder(windows=(5, 30))
+    # История прирастает порциями: каждая сборка досчитывает только новые строки
+    for end in (40, 41, 90, 200):
+        collector.history = history[history["timestamp"] < 1000 + end]
+        collector.cores = cores[cores["timestamp"] < 1000 + end]
+        incremental = builder.build("cpu", collector, objects)
+    assert [c["start"] for c in collector.calls] == [None, 1039.0, 1040.0, 1089.0]
+
+    full = FeatureBuilder(windows=(5, 30)).build("cpu", FakeCollector(200), objects)
+    assert len(incremental) == len(full) == (200 if objects is None else 400)
+    pd.testing.assert_frame_equal(incremental.reset_index(drop=True), full.reset_index(drop=True))
+
+
+def test_column_change_rebuilds():
+    collector = FakeCollector(50)
+    history = collector.history
+    collector.history = history[:40]
+    builder = FeatureBuilder(windows=(5,))
+    builder.build("cpu", collector)
+    # В новых замерах появилась метрика: кеш перестраивается по всей истории
+    collector.history = history.assign(temp=np.where(history["timestamp"] >= 1040, 40.0, np.nan))
+    df = builder.build("cpu", collector)
+    assert "temp_mean_5" in df.columns
+    assert len(df) == 50
+    assert df["temp_mean_5"].iloc[-1] == 40.0
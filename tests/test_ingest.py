@@ -0,0 +1,63 @@
+import json
+import zlib
+
+import pytest
+
+from core.ingest import IngestError, IngestManager
+
+
+def _payload(run, seq, rows, host="node1"):
+    batch = {"host": host, "run": run, "seq": seq, "batch_id": f"{host}:{run}:{seq}",
+             "frames": [{"collector": "cpu", "fields": ["timestamp", "load"], "rows": rows}]}
+    return zlib.compress(json.dumps(batch).encode())
+
+
+@pytest.fixture
+def ingest(tmp_path):
+    manager = IngestManager(root=str(tmp_path / "hosts"), token="secret")
+    yield manager
+    manager.close()
+
+
+def test_duplicate_batch_is_acknowledged_without_writing(ingest):
+    payload = _payload("r1", 1, [[1.0, 0.5], [2.0, 0.6]])
+    assert ingest.ingest(payload, "deflate")["status"] == "ok"
+    result = ingest.ingest(payload, "deflate")
+    assert result == {"batch_id": "node1:r1:1", "samples": 0, "status": "duplicate"}
+    # Более старый номер того же запуска — тоже повтор
+    assert ingest.ingest(_payload("r1", 2, [[3.0, 0.7]]), "deflate")["status"] == "ok"
+    assert ingest.ingest(_payload("r1", 1, [[1.0, 0.5]]), "deflate")["status"] == "duplicate"
+
+    history = ingest.get_history("node1", "cpu")
+    assert history["timestamp"].tolist() == [1.0, 2.0, 3.0]
+    assert ingest.get_hosts()["node1"]["samples"] == 3
+
+
+def test_new_agent_run_starts_its_own_sequence(ingest):
+    ingest.ingest(_payload("r1", 5, [[1.0, 0.5]]), "deflate")
+    assert ingest.ingest(_payload("r2", 1, [[2.0, 0.6]]), "deflate")["status"] == "ok"
+    assert ingest.get_history("node1", "cpu")["timestamp"].tolist() == [1.0, 2.0]
+
+
+def test_out_of_order_rows_are_sorted_and_stale_rows_dropped(ingest):
+    ingest.ingest(_payload("r1", 1, [[3.0, 0.3], [1.0, 0.1], [2.0, 0.2]]), "deflate")
+    result = ingest.ingest(_payload("r2", 1, [[2.5, 0.25], [4.0, 0.4]]), "deflate")
+    assert result["samples"] == 1
+    history = ingest.get_history("node1", "cpu")
+    assert history["timestamp"].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert history["load"].tolist() == [0.1, 0.2, 0.3, 0.4]
+
+
+def test_token_required(tmp_path):
+    manager = IngestManager(root=str(tmp_path / "hosts"))
+    assert not manager.enabled and not manager.check_token(None)
+    manager = IngestManager(root=str(tmp_path / "hosts"), token="secret")
+    assert manager.check_token("Bearer secret")
+    assert not manager.check_token("Bearer other") and not manager.check_token(None)
+
+
+def test_oversized_batch_rejected(tmp_path):
+    manager = IngestManager(root=str(tmp_path / "hosts"), token="secret", max_batch_bytes=64)
+    with pytest.raises(IngestError) as error:
+        manager.ingest(_payload("r1", 1, [[float(i), 0.5] for i in range(100)]), "deflate")
+    assert error.value.status == 413
@@ -0,0 +1,86 @@
+import json
+import os
+
+from core.model_store import ModelStore, artifact_key
+
+
+def meta_for(params, fitted_at, collector="CpuCollectorLinux", columns=("timestamp", "load")):
+    return {"params": params, "collector": collector, "objects": None, "columns": list(columns),
+            "fitted_at": fitted_at}
+
+
+def test_put_get_and_reload(tmp_path):
+    store = ModelStore(path=str(tmp_path))
+    key = artifact_key(model="tree", params={"depth": 3}, collector="cpu", objects=None, columns=["a"])
+    meta = store.put("tree", key, {"weights": [1, 2]}, meta_for({"depth": 3}, 100.0))
+    assert meta["key"] == key and meta["model"] == "tree"
+    assert store.get("tree", key) == ({"weights": [1, 2]}, meta)
+    with open(tmp_path / "tree" / f"{key}.json") as f:
+        assert json.load(f) == meta
+
+    # Новый процесс: модели читаются с диска
+    fresh = ModelStore(path=str(tmp_path))
+    assert fresh.get("tree", key) == ({"weights": [1, 2]}, meta)
+    assert fresh.get("tree", "missing") is None
+    assert ModelStore(path=str(tmp_path)).warm() == 1
+
+
+def test_artifact_key_tracks_config_and_schema():
+    base = dict(model="tree", params={"depth": 3}, collector="cpu", objects=None, columns=["a", "b"])
+    key = artifact_key(**base)
+    assert artifact_key(**dict(base, params={"depth": 3})) == key
+    # Порядок ключей параметров не важен, а любое изменение конфигурации или схемы — важно
+    assert artifact_key(**dict(reversed(list(base.items())))) == key
+    for change in ({"params": {"depth": 4}}, {"columns": ["a", "b", "c"]}, {"objects": ["cpu0"]},
+                   {"collector": "drive"}, {"model": "rsf"}):
+        assert artifact_key(**dict(base, **change)) != key
+
+
+def test_prune_keeps_newest_of_lineage(tmp_path):
+    store = ModelStore(path=str(tmp_path), keep=2)
+    for i in range(4):
+        store.put("tree", f"k{i}", i, meta_for({"depth": i}, 100.0 + i))
+    # Другая линия (другие колонки) не вытесняется
+    store.put("tree", "other", "x", meta_for({}, 50.0, columns=("timestamp", "temp")))
+    assert [m["key"] for m in store.list("tree")] == ["k3", "k2", "other"]
+    assert store.get("tree", "k0") is None
+    assert not os.path.exists(tmp_path / "tree" / "k1.pkl")
+
+
+def test_invalidate(tmp_path):
+    store = ModelStore(path=str(tmp_path))
+    store.put("tree", "a", 1, meta_for({}, 1.0))
+    store.put("rsf", "b", 2, meta_for({}, 2.0))
+    assert store.invalidate("tree") == 1
+    assert store.get("tree", "a") is None
+    assert store.get("rsf", "b") is not None
+    assert store.invalidate() == 1
+    assert store.list() == []
+
+
+def test_is_stale(tmp_path):
+    assert not ModelStore(path=str(tmp_path), refit_interval=None).is_stale({"fitted_at": 0})
+    store = ModelStore(path=str(tmp_path), refit_interval=60)
+    assert store.is_stale({"fitted_at": 0})
+    assert not store.is_stale({"fitted_at": 1e12})
+
+
+def test_put_does_not_rescan_directory(tmp_path, monkeypatch):
+    ModelStore(path=str(tmp_path)).put("tree", "old", 0, meta_for({"depth": 1}, 1.0))
+    store = ModelStore(path=str(tmp_path), keep=1)
+    scans = []
+    list_models = store.list
+    monkeypatch.setattr(store, "list", lambda name=None: scans.append(name) or list_models(name))
+    for i in range(5):
+        store.put("tree", "k", i, meta_for({"depth": 2}, 10.0 + i))
+    # Каталог читается один раз; модель с диска, сохранённая другим процессом, тоже вытесняется
+    assert scans == ["tree"]
+    assert [m["key"] for m in list_models("tree")] == ["k"]
+    assert store.get("tree", "k")[0] == 4
+
+
+def test_stale_lists_loaded_models(tmp_path):
+    store = ModelStore(path=str(tmp_path), refit_interval=60)
+    store.put("tree", "old", 0, meta_for({}, 0.0))
+    store.put("rsf", "new", 1, meta_for({}, 1e12))
+    assert [m["key"] for m in store.stale()] == ["old"]
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from collectors.procfs import ProcFS, Snapshot, parse_cpuinfo, parse_stat
+
+
+def write(root, path, text):
+    full = os.path.join(root, path.lstrip("/"))
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "w") as f:
+        f.write(text)
+
+
+def test_parse_stat():
+    stat = parse_stat("cpu  10 1 5 100 2 0 1 0 0 0\n"
+                      "cpu0 6 1 3 50 1 0 1 0 0 0\n"
+                      "cpu1 4 0 2 50 1 0 0 0 0 0\n"
+                      "intr 12345 1 2 3 4\n"
+                      "ctxt 999\n"
+                      "btime 1700000000\n")
+    assert stat["cpu"] == [10, 1, 5, 100, 2, 0, 1, 0, 0, 0]
+    assert sorted(stat["cpus"]) == ["cpu0", "cpu1"]
+    assert stat["cpus"]["cpu1"][3] == 50
+    # Из intr нужен только общий счётчик
+    assert stat["intr"] == [12345]
+    assert stat["ctxt"] == [999]
+    assert stat["btime"] == [1700000000]
+
+
+def test_parse_cpuinfo():
+    text = ("processor\t: 0\nmodel name\t: Test CPU\ncpu MHz\t\t: 2400.000\n\n"
+            "processor\t: 1\nmodel name\t: Test CPU\ncpu MHz\t\t: 2500.000\n")
+    cpus = parse_cpuinfo(text)
+    assert [cpu["processor"] for cpu in cpus] == ["0", "1"]
+    assert cpus[1]["cpu MHz"] == "2500.000"
+    assert cpus[0]["model name"] == "Test CPU"
+
+
+class CountingFS(ProcFS):
+    def __init__(self, root):
+        super().__init__(root)
+        self.reads = []
+
+    def read(self, path):
+        self.reads.append(path)
+        return super().read(path)
+
+
+def test_snapshot_reads_each_file_once(tmp_path):
+    root = str(tmp_path)
+    write(root, "/proc/stat", "cpu  1 2 3 4\nctxt 5\n")
+    fs = CountingFS(root)
+    snap = Snapshot(fs)
+    assert snap.stat["ctxt"] == [5]
+    assert snap.stat is snap.stat
+    assert snap.read("/proc/stat").startswith("cpu")
+    # Нет файла — None, повторное чтение тоже из снимка
+    assert snap.read("/proc/missing") is None
+    assert snap.parse("/proc/missing", parse_stat) is None
+    assert fs.reads == ["/proc/stat", "/proc/missing"]
+    fs.close()
+
+
+def test_procfs_rereads_open_descriptor(tmp_path):
+    root = str(tmp_path)
+    write(root, "/proc/loadavg", "0.1 0.2 0.3\n")
+    fs = ProcFS(root, max_open=1)
+    assert fs.read("/proc/loadavg") == "0.1 0.2 0.3\n"
+    # Файл перезаписан на месте: тот же дескриптор видит новое содержимое
+    big = "x" * 10000 + "\n"
+    write(root, "/proc/loadavg", big)
+    assert fs.read("/proc/loadavg") == big
+    assert len(fs._fds) == 1
+
+    write(root, "/proc/uptime", "5.0 1.0\n")
+    assert fs.read("/proc/uptime") == "5.0 1.0\n"
+    # Лимит дескрипторов: самый давний закрыт
+    assert list(fs._fds) == ["/proc/uptime"]
+    assert fs.exists("/proc/loadavg") and not fs.exists("/proc/none")
+    with pytest.raises(OSError):
+        fs.read("/proc/none")
+    fs.close()
+    assert not fs._fds
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from benchmarks.procfs_fixture import FakeProcFS
+from collectors.cpu_collector import CpuCollectorLinux
+from collectors.procfs import ReplayProcFS
+from collectors.replay_collector import ReplayCollector
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    """Пять замеров CpuCollectorLinux по синтетическому дереву с записью в архив"""
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / "root")
+    trace = str(tmp_path / "trace.jsonl.gz")
+    fake = FakeProcFS(root, cores=2, processes=20).build()
+    collector = CpuCollectorLinux({"fs_root": root, "record": trace})
+    samples = []
+    for i in range(5):
+        samples.append(collector.sample().as_dict())
+        fake.tick()
+        # Процессы появляются и завершаются: каталог /proc пишется разницей
+        os.rmdir(os.path.join(root, "proc", str(i + 1)))
+        os.makedirs(os.path.join(root, "proc", str(100 + i)))
+    collector.close()
+    return trace, samples
+
+
+def test_replay_reproduces_samples(recording):
+    trace, samples = recording
+    collector = ReplayCollector({"trace": trace, "speed": 0})
+    replayed = []
+    try:
+        assert collector.replay(on_sample=lambda s: replayed.append(s.as_dict())) == len(samples)
+    finally:
+        collector.close()
+    assert replayed == samples
+
+
+def test_replay_loop_shifts_time(recording):
+    trace, samples = recording
+    fs = ReplayProcFS(trace, loop=True)
+    times = [fs.tick() for _ in range(len(samples) + 1)]
+    assert times[:len(samples)] == [s["timestamp"] for s in samples]
+    # Второй круг начинается через средний шаг после последнего кадра
+    step = (samples[-1]["timestamp"] - samples[0]["timestamp"]) / (len(samples) - 1)
+    assert times[-1] == pytest.approx(samples[-1]["timestamp"] + step)
+    fs.close()
+
+    fs = ReplayProcFS(trace)
+    for _ in samples:
+        fs.tick()
+    with pytest.raises(EOFError):
+        fs.tick()
+    fs.close()
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from core.data_storage import TieredStore
+
+
+def test_rollup_matches_pandas_resample(tmp_path):
+    rng = np.random.default_rng(0)
+    ts = np.sort(rng.uniform(0, 1800, 500)) + 1700000000
+    values = rng.normal(50, 10, len(ts))
+    values[rng.random(len(ts)) < 0.1] = np.nan
+    store = TieredStore(str(tmp_path / "store"), tiers={"1m": 60})
+    # Несколькими пачками: корзины на границах пачек собираются из частей
+    for chunk in np.array_split(np.arange(len(ts)), 7):
+        store.append({"timestamp": ts[chunk], "value": values[chunk]})
+
+    tier = store.tiers[0]
+    closed = pd.DataFrame(tier.store.read())
+    rollup = pd.concat([closed, pd.DataFrame(tier.open_row())], ignore_index=True).set_index("timestamp")
+
+    series = pd.Series(values, index=pd.to_datetime(ts, unit="s"))
+    resampled = series.resample("60s", origin="epoch")
+    expected = pd.DataFrame({
+        "mean": resampled.mean(), "min": resampled.min(), "max": resampled.max(),
+        "sum": resampled.sum(min_count=1), "last": resampled.apply(lambda s: s.iloc[-1]),
+        "count": resampled.size(),
+    })
+    expected = expected[expected["count"] > 0]
+    expected.index = expected.index.astype("int64") / 1e9
+
+    np.testing.assert_array_equal(rollup.index, expected.index)
+    for agg in ("mean", "min", "max", "sum", "last"):
+        np.testing.assert_allclose(rollup[f"value__{agg}"], expected[agg], equal_nan=True, err_msg=agg)
+    np.testing.assert_array_equal(rollup["count"], expected["count"])
+    store.close()
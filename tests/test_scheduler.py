@@ -0,0 +1,131 @@
+import threading
+import time
+
+from core.system_manager import CollectorJob, CollectorScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeStop:
+    """Вместо threading.Event: ожидание сдвигает часы, а не спит"""
+    def __init__(self, clock):
+        self.clock = clock
+        self.flag = False
+
+    def is_set(self):
+        return self.flag
+
+    def set(self):
+        self.flag = True
+
+    def clear(self):
+        self.flag = False
+
+    def wait(self, delay):
+        self.clock.now += delay
+        return self.flag
+
+
+def make_job(durations, **kwargs):
+    """Задание, у которого i-й запуск длится durations[i]; цикл идёт в текущем потоке"""
+    clock = FakeClock()
+    started = []
+
+    def run():
+        started.append(clock.now)
+        duration = durations[len(started) - 1]
+        if isinstance(duration, Exception):
+            raise duration
+        clock.now += duration
+        if len(started) == len(durations):
+            job._stop.set()
+
+    job = CollectorJob("fake", run, clock=clock, **kwargs)
+    job._stop = FakeStop(clock)
+    return job, started
+
+
+def test_ticks_do_not_drift():
+    job, started = make_job([0.25] * 5, interval=1.0)
+    job._loop()
+    # Время сбора не сдвигает расписание: запуски ровно на k * interval
+    assert started == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert job.stats["runs"] == 5
+    assert job.stats["overruns"] == job.stats["skipped_ticks"] == job.stats["deadline_misses"] == 0
+    assert job.stats["last_duration"] == 0.25
+
+
+def test_overrun_skips_missed_ticks():
+    job, started = make_job([0.1, 0.2, 2.5, 0.1], interval=1.0)
+    job._loop()
+    # Третий сбор закончился в 4.5: тики 3 и 4 пропущены, следующий — в 5
+    assert started == [0.0, 1.0, 2.0, 5.0]
+    assert job.stats["overruns"] == 1
+    assert job.stats["skipped_ticks"] == 2
+    assert job.stats["deadline_misses"] == 1
+
+
+def test_deadline_and_failures():
+    job, started = make_job([0.3, RuntimeError("нет доступа"), 0.6], interval=1.0, deadline=0.5)
+    job._loop()
+    assert started == [0.0, 1.0, 2.0]
+    assert job.stats["runs"] == 3
+    assert job.stats["failures"] == 1
+    assert job.stats["deadline_misses"] == 1
+    assert job.stats["overruns"] == 0
+    # Ошибка сбрасывается следующим успешным запуском
+    assert job.stats["last_error"] is None
+
+
+def test_callable_interval():
+    intervals = iter([1.0, 1.0, 2.0, 2.0])
+    job, started = make_job([0.1] * 4, interval=lambda: next(intervals))
+    job._loop()
+    assert started == [0.0, 1.0, 4.0, 6.0]
+
+
+class FakeConfig:
+    def get_collector_config(self, name):
+        return {"deadline": 5.0}
+
+
+class FakeManager:
+    HOUSEKEEPING_INTERVAL = 0.01
+
+    def __init__(self):
+        self.collectors = {"a": type("C", (), {"interval": 0.01})()}
+        self.config_manager = FakeConfig()
+        self.calls = 0
+        self.housekeeping_calls = 0
+
+    def housekeeping(self):
+        self.housekeeping_calls += 1
+
+    def get_enabled_collectors(self):
+        return list(self.collectors)
+
+    def collect_with_timeout(self, name):
+        self.calls += 1
+
+
+def test_scheduler_runs_enabled_collectors():
+    manager = FakeManager()
+    scheduler = CollectorScheduler(manager)
+    scheduler.start()
+    try:
+        assert scheduler.jobs["a"].deadline == 5.0
+        deadline = time.monotonic() + 5
+        while (manager.calls < 3 or manager.housekeeping_calls < 3) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+    assert not scheduler.is_running()
+    assert scheduler.get_stats()["a"]["runs"] >= 3
+    assert scheduler.get_stats()["a"]["failures"] == 0
+    assert scheduler.get_stats()[CollectorScheduler.HOUSEKEEPING]["runs"] >= 3
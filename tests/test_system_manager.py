@@ -0,0 +1,37 @@
+import os
+
+
+def test_stale_models_refit_without_prediction(manager):
+    manager.apply_model("tree", "cpu")
+    manager.apply_model("zscore", "cpu")
+    (tree,) = manager.model_store.list("tree")
+    assert manager.refit_stale_models() == 0
+
+    manager.model_store.refit_interval = -1
+    # Дообучаемая модель (zscore) переобучением по расписанию не заменяется
+    assert manager.refit_stale_models() == 1
+    # Блокировку ключа держит фоновое обучение — дождаться его конца
+    with manager.model_store.key_lock(tree["key"]):
+        pass
+    (refit,) = manager.model_store.list("tree")
+    assert refit["key"] == tree["key"]
+    assert refit["fitted_at"] > tree["fitted_at"]
+
+
+def test_housekeeping_checks_models_periodically(manager, monkeypatch):
+    calls = []
+    monkeypatch.setattr(manager, "refit_stale_models", lambda: calls.append(1))
+    manager.housekeeping()
+    manager.housekeeping()
+    assert len(calls) == 1
+    manager._models_checked_at -= manager.MODEL_CHECK_INTERVAL
+    manager.housekeeping()
+    assert len(calls) == 2
+
+
+def test_close_is_idempotent(manager, tmp_path, monkeypatch):
+    manager.close()
+    # Повторное закрытие (atexit после явного close) уже в другом каталоге не трогает хранилища
+    monkeypatch.chdir(tmp_path / "root")
+    manager.close()
+    assert not os.path.exists(tmp_path / "root" / "storage")
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from models.zscore_model import ZScoreModel
+
+
+def _frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "timestamp": np.arange(rows, dtype=np.float64),
+        "core": np.arange(rows) % 4,
+        "usage": rng.normal(40, 5, rows),
+        "temp": rng.normal(60, 3, rows),
+    })
+    df.loc[rng.random(rows) < 0.1, "temp"] = np.nan
+    return df
+
+
+def test_partial_fit_equals_fit_on_concatenation():
+    data = _frame(1000)
+    full = ZScoreModel()
+    full.fit(data)
+
+    incremental = ZScoreModel()
+    for chunk in (data.iloc[:1], data.iloc[1:300], data.iloc[300:301], data.iloc[301:]):
+        incremental.partial_fit(chunk)
+
+    assert incremental.columns == full.columns == ["usage", "temp"]
+    np.testing.assert_array_equal(incremental.count, full.count)
+    np.testing.assert_allclose(incremental.mean, full.mean)
+    np.testing.assert_allclose(incremental.m2, full.m2)
+    probe = _frame(50, seed=1)
+    np.testing.assert_allclose(incremental.predict(probe), full.predict(probe))
+
+
+def test_statistics_match_numpy():
+    data = _frame(500)
+    model = ZScoreModel()
+    model.fit(data)
+    for pos, column in enumerate(model.columns):
+        values = data[column].dropna().to_numpy()
+        assert model.count[pos] == len(values)
+        np.testing.assert_allclose(model.mean[pos], values.mean())
+        np.testing.assert_allclose(model.m2[pos] / (model.count[pos] - 1), values.var(ddof=1))